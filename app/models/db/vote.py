@@ -1,5 +1,5 @@
-from pydantic import BaseModel, field_validator
-from typing import List
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, List
 
 class ActivityVote(BaseModel):
     """Individual vote for a single activity."""
@@ -31,3 +31,13 @@ class Vote(BaseModel):
         if len(activity_ids) != len(set(activity_ids)):
             raise ValueError('Cannot vote for the same activity multiple times')
         return v
+
+
+class VoteBatch(BaseModel):
+    """
+    Bulk voting, e.g. offline ballots synced by a mobile client.
+    Items are validated one by one so a bad item does not reject the batch;
+    each one is checked like an ActivityVote (items that are not objects
+    are rejected the same way).
+    """
+    votes: List[Any] = Field(..., min_length=1)
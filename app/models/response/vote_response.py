@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import datetime
+
+class CondorcetResultResponse(BaseModel):
+    """Schulze ranking of the voted activities, winner first."""
+    ranking: List[int]
+    version: int
+    computed_at: datetime
+    stale: bool = False
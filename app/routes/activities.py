@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+import json
 from datetime import date, datetime
 from app.models.db.activity import Activity
 from app.models.db.user import User, UserRole
@@ -8,6 +10,8 @@ from app.services.ticketmaster_service import (
     fetch_activities as fetch_ticketmaster_activities,
 )
 from app.services.weather_service import fetch_weather
+from app.services import user_service, vote_service
+from app.services.config_service import get_config
 
 router = APIRouter()
 from app.routes.admin import admin_activities
@@ -15,9 +19,12 @@ from app.services.activities_service import (
     fetch_activities_by_weather,
     fetch_activities_by_weather_ordered_by_votes,
     get_weather_recommendation,
-    suggest_personalized_activities
+    suggest_personalized_activities,
+    suggest_personalized_activities_batch
 )
 
+MAX_BATCH_USERS = get_config().get("recommendations.batch.max_users", 1000)
+
 @router.post("/activities/personalized", response_model=List[Activity])
 async def get_personalized_activities(
     city: str,
@@ -82,6 +89,59 @@ async def get_recommended_activities(
     
     return recommended
 
+@router.post("/activities/recommended/batch")
+async def get_recommended_activities_batch(
+    city: str,
+    countryCode: str,
+    date: str,
+    user_ids: List[int] = Body(..., embed=True),
+    weather_preference: Optional[str] = "auto",
+    max_results: Optional[int] = 5
+):
+    """
+    Get recommendations for many users of one city/date in a single call.
+
+    The weather and activities are fetched once and similar users are found for
+    all users together. Results are streamed as newline-delimited JSON, one line
+    per user as soon as it is ready:
+    {"user_id": 1, "activities": [...]} or {"user_id": 99, "error": "User not found"}
+
+    Example body:
+    {"user_ids": [1, 2, 3]}
+    """
+    if len(user_ids) > MAX_BATCH_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_USERS} users per batch",
+        )
+
+    users = []
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        record = user_service.get_user_by_id(user_id)
+        if record:
+            users.append(User(**record))
+        else:
+            missing.append(user_id)
+
+    async def lines():
+        for user_id in missing:
+            yield json.dumps({"user_id": user_id, "error": "User not found"}) + "\n"
+        async for user, activities in suggest_personalized_activities_batch(
+            city=city,
+            countryCode=countryCode,
+            date=date,
+            users=users,
+            weather_preference=weather_preference,
+            max_results=max_results
+        ):
+            yield json.dumps({
+                "user_id": user.id,
+                "activities": [activity.model_dump(mode="json") for activity in activities],
+            }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/activities/by-votes", response_model=List[Activity])
 async def get_activities_by_votes(
     city: str,
@@ -140,6 +200,19 @@ async def get_activities_by_weather(
     
     return activities
 
+@router.get("/activities/{activity_id}/similar")
+def get_similar_activities(
+    activity_id: int,
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Get the activities most similar to this one: people who liked it also liked...
+
+    Similarity comes from users who voted on both activities and scored them
+    alike; it is kept up to date as votes arrive.
+    """
+    return vote_service.get_similar_activities(activity_id, limit)
+
 @router.get("/weather-recommendation")
 async def get_weather_recommendation_endpoint(city: str, date: str):
     """
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional
 from pathlib import Path
 import json
 from app.models.db.activity import Activity
@@ -7,6 +9,8 @@ from app.services.ticketmaster_service import (
     fetch_activities as fetch_ticketmaster_activities,
 )
 from app.services import user_service
+from app.services.user_bulk import UserImporter, export_users
+from app.services.user_index import query_user_ids
 from app.models.db.user import UserRole
 from app.services.config_service import get_config
 
@@ -14,19 +18,22 @@ from app.services.config_service import get_config
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 admin_activities: List[Activity] = []
+# Bumped whenever admin_activities changes, so cached results can tell they are stale.
+admin_activities_version = 0
 
 ACTIVITIES_FILE = Path(__file__).resolve().parents[1] / "data" / "activities.json"
 
 
 def _load_activities_from_file():
     """Load activities from JSON file if it exists."""
-    global admin_activities
+    global admin_activities, admin_activities_version
     if ACTIVITIES_FILE.exists():
         with open(ACTIVITIES_FILE, "r", encoding="utf-8") as f:
             activities_data = json.load(f)
             admin_activities.clear()
             for activity_dict in activities_data:
                 admin_activities.append(Activity(**activity_dict))
+            admin_activities_version += 1
 
 
 _load_activities_from_file()
@@ -34,7 +41,9 @@ _load_activities_from_file()
 
 @router.post("/activity", response_model=Activity)
 def add_activity(activity: Activity):
+    global admin_activities_version
     admin_activities.append(activity)
+    admin_activities_version += 1
     return activity
 
 
@@ -104,3 +113,84 @@ def get_configuration(admin_user_id: int):
         "recommendations": config.get_recommendation_config(),
         "activities": config.get("activities", {}),
     }
+
+
+@router.get("/users/audience", response_model=Dict[str, Any])
+def get_audience(
+    admin_user_id: int,
+    city: Optional[str] = None,
+    interests: Optional[List[str]] = Query(None),
+    match: str = Query("all", pattern="^(all|any)$"),
+    limit: int = Query(100, ge=0, le=1000),
+):
+    """Count the users in a city with all (or any) of the given interests.
+
+    Requires administrator privileges. The audience comes from set operations
+    on the user index by city and interest, not from a scan of every user.
+    Returns the count and up to `limit` user ids.
+    """
+    user_record = user_service.get_user_by_id(admin_user_id)
+    if not user_record or user_record.get("role") != UserRole.administrator.value:
+        raise HTTPException(status_code=403, detail="Administrator privileges required")
+
+    user_service.ensure_loaded()
+    user_ids = sorted(query_user_ids(city, interests, match_all=match == "all"))
+    return {
+        "city": city,
+        "interests": interests or [],
+        "match": match,
+        "count": len(user_ids),
+        "user_ids": user_ids[:limit],
+    }
+
+
+@router.get("/users/cache", response_model=Dict[str, Any])
+def get_user_cache_stats(admin_user_id: int):
+    """Hit, miss and eviction counters of the in-memory user cache.
+
+    Requires administrator privileges.
+    """
+    user_record = user_service.get_user_by_id(admin_user_id)
+    if not user_record or user_record.get("role") != UserRole.administrator.value:
+        raise HTTPException(status_code=403, detail="Administrator privileges required")
+
+    return user_service.get_cache_stats()
+
+
+@router.post("/users/import", response_model=Dict[str, Any])
+async def import_users(request: Request, admin_user_id: int):
+    """Import users from an NDJSON request body (one `UserCreate` object per line).
+
+    Requires administrator privileges. The body is read as a stream and users
+    are created in batches with new ids, so memory does not grow with the
+    upload. Invalid lines are skipped; the response counts them and lists the
+    first errors with their line numbers.
+    """
+    user_record = user_service.get_user_by_id(admin_user_id)
+    if not user_record or user_record.get("role") != UserRole.administrator.value:
+        raise HTTPException(status_code=403, detail="Administrator privileges required")
+
+    importer = UserImporter()
+    pending = b""
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        if lines:
+            await run_in_threadpool(importer.add_lines, lines)
+    if pending:
+        await run_in_threadpool(importer.add_lines, [pending])
+    await run_in_threadpool(importer.flush)
+    return importer.summary()
+
+
+@router.get("/users/export")
+def export_users_ndjson(admin_user_id: int):
+    """Stream every user as NDJSON, sorted by id, from one consistent snapshot.
+
+    Requires administrator privileges.
+    """
+    user_record = user_service.get_user_by_id(admin_user_id)
+    if not user_record or user_record.get("role") != UserRole.administrator.value:
+        raise HTTPException(status_code=403, detail="Administrator privileges required")
+
+    return StreamingResponse(export_users(), media_type="application/x-ndjson")
@@ -54,10 +54,10 @@ RESET_TOKEN = os.getenv("RESET_TOKEN")
 
 @router.post("/reset", status_code=204)
 def reset_users(x_reset_token: Optional[str] = Header(None)):
-    """Reset the in-memory users store from `app/data/users.json`.
+    """Reset the users store from `app/data/users.json`.
 
     - If RESET_TOKEN env var is set, request must include header `x-reset-token` with that value.
-    - This does not modify the JSON file on disk; it only resets the in-memory session store.
+    - This does not modify the JSON file on disk; it replaces the in-memory store and the user database.
     """
     if RESET_TOKEN:
         if x_reset_token != RESET_TOKEN:
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Body, HTTPException
-from typing import List, Dict
-from app.models.db.vote import Vote, ActivityVote
+from fastapi import APIRouter, Body, HTTPException, Query
+from pydantic import ValidationError
+from typing import Any, List, Dict, Optional
+from app.models.db.vote import Vote, ActivityVote, VoteBatch
+from app.models.response.vote_response import CondorcetResultResponse
 from app.services import vote_service
+from app.services import vote_result_service
+from app.services import trending_service
 from app.services import activity_lookup_service
+from app.services.config_service import get_config
 
 router = APIRouter(prefix="/vote", tags=["vote"])
 
+MAX_BATCH_SIZE = get_config().get("votes.max_batch_size", 1000)
+
 
 @router.post("/", status_code=201)
 def submit_vote(vote: Vote = Body(...)):
@@ -27,19 +34,78 @@ def submit_vote(vote: Vote = Body(...)):
     if not vote.votes:
         raise HTTPException(status_code=400, detail="votes list cannot be empty")
     
-    for activity_vote in vote.votes:
-        if not activity_lookup_service.activity_exists(activity_vote.activity_id):
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Activity with id {activity_vote.activity_id} does not exist"
-            )
+    missing = activity_lookup_service.find_missing_activity_ids(
+        activity_vote.activity_id for activity_vote in vote.votes
+    )
+    if missing:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Activity with id {missing[0]} does not exist"
+        )
     
-    for activity_vote in vote.votes:
-        vote_service.add_vote(activity_vote.model_dump())
+    vote_service.add_votes([activity_vote.model_dump() for activity_vote in vote.votes])
     
     return {"status": "ok", "votes_recorded": len(vote.votes)}
 
 
+@router.post("/batch", status_code=201)
+def submit_vote_batch(batch: VoteBatch = Body(...)):
+    """
+    Submit many votes at once, possibly from several users (e.g. offline sync).
+    
+    Example:
+    {
+      "votes": [
+        {"user_id": 1, "activity_id": 5, "score": 9},
+        {"user_id": 2, "activity_id": 3, "score": 7}
+      ]
+    }
+    
+    Each item is validated on its own and gets a result in `results`, in request order:
+    "recorded", or "rejected" with an `error`. Valid items are recorded even if others are rejected.
+    A user cannot vote for the same activity twice in one batch.
+    """
+    if len(batch.votes) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.votes)} votes (max {MAX_BATCH_SIZE})"
+        )
+    
+    results: List[Dict[str, Any]] = [{"index": i, "status": "recorded"} for i in range(len(batch.votes))]
+    parsed: Dict[int, ActivityVote] = {}
+    seen = set()
+    for i, item in enumerate(batch.votes):
+        try:
+            activity_vote = ActivityVote.model_validate(item)
+        except ValidationError as e:
+            results[i] = {"index": i, "status": "rejected", "error": e.errors()[0]["msg"]}
+            continue
+        key = (activity_vote.user_id, activity_vote.activity_id)
+        if key in seen:
+            results[i] = {"index": i, "status": "rejected", "error": "Cannot vote for the same activity multiple times"}
+            continue
+        seen.add(key)
+        parsed[i] = activity_vote
+    
+    missing = set(activity_lookup_service.find_missing_activity_ids(
+        activity_vote.activity_id for activity_vote in parsed.values()
+    ))
+    accepted = []
+    for i, activity_vote in parsed.items():
+        if activity_vote.activity_id in missing:
+            results[i] = {"index": i, "status": "rejected", "error": f"Activity with id {activity_vote.activity_id} does not exist"}
+        else:
+            accepted.append(activity_vote.model_dump())
+    
+    recorded = vote_service.add_votes(accepted)
+    return {
+        "status": "ok",
+        "votes_recorded": recorded,
+        "votes_rejected": len(batch.votes) - recorded,
+        "results": results,
+    }
+
+
 @router.get("/", response_model=List[Dict])
 def list_votes():
     """List all recorded votes."""
@@ -69,6 +135,46 @@ def get_activity_votes(activity_id: int):
 
 
 @router.get("/ranking")
-def get_activity_ranking():
-    """Get activities ranked by average score."""
-    return vote_service.get_activity_ranking()
+def get_activity_ranking(
+    limit: Optional[int] = Query(None, ge=1),
+    min_votes: Optional[int] = Query(None, ge=1),
+):
+    """
+    Get activities ranked by Bayesian-smoothed average score.
+    
+    `score` pulls each activity's average towards the overall mean until it has enough
+    votes (see `votes.ranking` in config.yaml); `average_score` is the raw average.
+    Use `limit` for the top-K and `min_votes` to hide activities with too few votes.
+    """
+    return vote_service.get_activity_ranking(limit=limit, min_votes=min_votes)
+
+
+@router.get("/result", response_model=CondorcetResultResponse)
+def get_condorcet_result():
+    """
+    Get the Condorcet (Schulze) ranking of all voted activities.
+    
+    Each user's scores form a ranked ballot (higher score first, equal scores tied).
+    The result is cached and refreshed in the background after new votes, so it can
+    lag the latest votes by a moment; `stale` is true while a refresh is pending.
+    """
+    return vote_result_service.get_condorcet_result()
+
+
+@router.get("/trending")
+def get_trending_activities(
+    window: str = Query(trending_service.DEFAULT_WINDOW),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Get the activities with the most votes in a recent time window.
+    
+    `window` is e.g. `15m`, `1h`, `24h` or `7d` (at most 7 days). `trend_score` decays
+    older votes so the newest weigh most; `votes` is the raw number of votes in the
+    window. The windows of `votes.trending.tracked_windows` are kept ranked as votes
+    arrive; other windows scan the per-minute and per-hour buckets of every activity.
+    """
+    try:
+        return trending_service.get_trending_activities(window=window, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -9,7 +9,7 @@ from app.services.ticketmaster_service import (
 from app.services.weather_service import fetch_weather
 
 # get activities based on weather
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 from datetime import date as date_class
 
 from app.models.db.activity import Activity, ActivityType
@@ -19,7 +19,15 @@ from app.services.ticketmaster_service import (
 )
 from app.services.weather_service import fetch_weather
 from app.services.config_service import get_config
-from app.services.vote_service import list_votes
+from app.services.vote_service import get_vote_snapshot
+from app.services.user_features import features_for
+from app.services.activity_scoring import ScoringPlan
+from app.services.recommendation_cache import (
+    RESULT_CACHE_ENABLED,
+    get_recommendation_cache,
+    recommendation_dependencies,
+    recommendation_key,
+)
 
 config = get_config()
 rec_config = config.get_recommendation_config()
@@ -41,7 +49,11 @@ def get_admin_activities() -> List[Activity]:
     return admin_activities
 
 
-from app.services.recommendation_service import get_collaborative_recommendations
+from app.services.recommendation_service import (
+    find_similar_users_many,
+    get_collaborative_recommendations,
+)
+from app.services.factor_model import get_model
 
 OUTDOOR_WEATHER_CONDITIONS = ["clear", "sunny", "partly cloudy", "fair"]
 INDOOR_WEATHER_CONDITIONS = [
@@ -84,6 +96,24 @@ async def fetch_activities_by_weather(
     Returns:
         List of filtered activities
     """
+    weather, activities = await _fetch_weather_and_activities(city, countryCode, date)
+    return _filter_activities_for_user(
+        activities,
+        weather,
+        city,
+        user=user,
+        weather_preference=weather_preference,
+        activity_types=activity_types,
+        max_results=max_results,
+        custom_weather_mapping=custom_weather_mapping,
+        temperature_range=temperature_range,
+    )
+
+
+async def _fetch_weather_and_activities(
+    city: str, countryCode: str, date: str
+) -> Tuple[Any, List[Activity]]:
+    """Fetch the weather and all candidate activities (Ticketmaster + admin) for a city/date."""
     weather = await fetch_weather(city, date)
     activities = await fetch_ticketmaster_activities(city, countryCode, date)
 
@@ -94,7 +124,25 @@ async def fetch_activities_by_weather(
         if getattr(a, "location", None) == city and getattr(a, "date", None) == date
     ]
     activities.extend(custom_acts)
+    return weather, activities
 
+
+def _filter_activities_for_user(
+    activities: List[Activity],
+    weather,
+    city: str,
+    user: Optional[User] = None,
+    weather_preference: Optional[str] = "auto",
+    activity_types: Optional[List[ActivityType]] = None,
+    max_results: Optional[int] = None,
+    custom_weather_mapping: Optional[Dict[str, str]] = None,
+    temperature_range: Optional[tuple] = None,
+) -> List[Activity]:
+    """
+    Filter and order already fetched activities for one user (see fetch_activities_by_weather).
+
+    Does not modify `activities`, so one fetch can be filtered for many users.
+    """
     print("activities: ", activities)
     print("user: ", user)
     if temperature_range and hasattr(weather, "temperature"):
@@ -121,18 +169,13 @@ async def fetch_activities_by_weather(
     else:
         preference = weather_preference
     print("USER PREFERENCE: ", preference)
-    if activity_types is None and user and user.interests:
-        activity_types = _map_interests_to_activity_types(user.interests)
+    features = features_for(user) if user else None
+    plan = ScoringPlan(features) if features else None
+    if activity_types is None and features and features.interests_lower:
+        activity_types = plan.activity_types
 
     print("activitiy_types: ", activity_types)
-    user_age = None
-    if user and user.birth_date:
-        today = date_class.today()
-        user_age = (
-            today.year
-            - user.birth_date.year
-            - ((today.month, today.day) < (user.birth_date.month, user.birth_date.day))
-        )
+    user_age = features.age(date_class.today()) if features else None
 
     print("Age: ", user_age)
     filtered_activities = []
@@ -169,10 +212,9 @@ async def fetch_activities_by_weather(
         filtered_activities.append(activity)
 
     print("filtered_activities: ", filtered_activities)
-    if user:
-        filtered_activities = _score_and_sort_activities(
-            filtered_activities, user, weather
-        )
+    if plan:
+        # Scored in one pass; only the best max_results are sorted.
+        filtered_activities = plan.rank(filtered_activities, limit=max_results or None)
 
     if max_results and len(filtered_activities) > max_results:
         filtered_activities = filtered_activities[:max_results]
@@ -180,36 +222,6 @@ async def fetch_activities_by_weather(
     return filtered_activities
 
 
-def _map_interests_to_activity_types(interests: List[str]) -> List[ActivityType]:
-    """Map user interests to ActivityType enums."""
-    interest_mapping = {
-        "music": ActivityType.cultural,
-        "art": ActivityType.cultural,
-        "theater": ActivityType.cultural,
-        "museum": ActivityType.cultural,
-        "culture": ActivityType.cultural,
-        "sports": ActivityType.sports,
-        "fitness": ActivityType.sports,
-        "football": ActivityType.sports,
-        "basketball": ActivityType.sports,
-        "running": ActivityType.sports,
-        "community": ActivityType.community,
-        "volunteer": ActivityType.community,
-        "social": ActivityType.community,
-        "cultural": ActivityType.cultural,
-        "hiking": ActivityType.sports,
-    }
-
-    mapped_types = []
-    for interest in interests:
-        if interest.lower() in interest_mapping:
-            activity_type = interest_mapping[interest.lower()]
-            if activity_type not in mapped_types:
-                mapped_types.append(activity_type)
-
-    return mapped_types if mapped_types else list(ActivityType)
-
-
 def _is_age_appropriate(activity: Activity, age: int) -> bool:
     """Check if activity is appropriate for user's age."""
     if age < 13:
@@ -229,44 +241,6 @@ def _is_gender_appropriate(activity: Activity, gender: str) -> bool:
     return True
 
 
-def _score_and_sort_activities(
-    activities: List[Activity], user: User, weather
-) -> List[Activity]:
-    """Score and sort activities based on user preferences and context."""
-    scored_activities = []
-
-    for activity in activities:
-        score = 0.0
-
-        score += 1.0
-
-        if user.interests:
-            for interest in user.interests:
-                if (
-                    interest.lower() in activity.name.lower()
-                    or interest.lower() in (activity.description or "").lower()
-                ):
-                    score += 2.0
-
-        user_activity_types = _map_interests_to_activity_types(user.interests or [])
-        if activity.type in user_activity_types:
-            score += 1.5
-
-        if user.activity_preference == "outdoor" and not activity.is_indoor:
-            score += 1.0
-        elif user.activity_preference == "indoor" and activity.is_indoor:
-            score += 1.0
-
-        if user.city and user.city.lower() == activity.location.lower():
-            score += 0.5
-
-        scored_activities.append((score, activity))
-
-    scored_activities.sort(key=lambda x: x[0], reverse=True)
-
-    return [activity for score, activity in scored_activities]
-
-
 async def get_weather_recommendation(city: str, date: str) -> Dict[str, Any]:
     """
     Get weather-based activity recommendations with metadata.
@@ -352,12 +326,11 @@ async def fetch_activities_by_weather_ordered_by_votes(
     if not activities:
         return []
 
-    votes = list_votes()
-    print("All votes: ", votes)
+    votes = get_vote_snapshot()
 
     activity_scores: Dict[int, Tuple[float, int]] = {}
     for activity in activities:
-        activity_votes_list = [v for v in votes if v.get("activity_id") == activity.id]
+        activity_votes_list = votes.activity_votes(activity.id)
         if activity_votes_list:
             avg_score = sum(v.get("score", 0) for v in activity_votes_list) / len(
                 activity_votes_list
@@ -398,6 +371,10 @@ async def suggest_personalized_activities(
     2. Similar user preferences (collaborative filtering)
     3. Personal activity history and voting patterns
 
+    Results are cached per (user, city, countryCode, date, weather_preference, max_results)
+    and reused until the user's profile, the collaborative scorer's inputs or
+    the admin catalog change (see `recommendation_cache`).
+
     Args:
         city: City name
         countryCode: Country code
@@ -409,6 +386,14 @@ async def suggest_personalized_activities(
     Returns:
         List of recommended activities ordered by relevance
     """
+    if RESULT_CACHE_ENABLED:
+        cache = get_recommendation_cache()
+        key = recommendation_key(user.id, city, countryCode, date, weather_preference, max_results)
+        dependencies = recommendation_dependencies(user.id)
+        cached = cache.get(key, dependencies)
+        if cached is not None:
+            return list(cached)
+
     weather_filtered = await fetch_activities_by_weather(
         city=city,
         countryCode=countryCode,
@@ -430,4 +415,81 @@ async def suggest_personalized_activities(
 
     recommended_activities = [activity for activity, score in recommendations]
 
+    if RESULT_CACHE_ENABLED:
+        cache.put(key, dependencies, recommended_activities)
+
     return recommended_activities
+
+
+async def suggest_personalized_activities_batch(
+    city: str,
+    countryCode: str,
+    date: str,
+    users: List[User],
+    weather_preference: Optional[str] = "auto",
+    max_results: Optional[int] = 5,
+) -> AsyncIterator[Tuple[User, List[Activity]]]:
+    """
+    suggest_personalized_activities for many users of the same city and date.
+
+    Cached lists are yielded first. For the rest, the weather and the
+    activities are fetched once, the similar users of everyone who needs them
+    are found as one matrix operation, and each user's list is yielded (and
+    cached) as soon as it is scored.
+
+    Args:
+        city: City name
+        countryCode: Country code
+        date: Date in ISO format
+        users: Users to get recommendations for
+        weather_preference: Weather preference override
+        max_results: Maximum number of activities per user
+
+    Yields:
+        (user, recommended activities), not necessarily in the order of `users`
+    """
+    cache = get_recommendation_cache()
+    pending = []
+    for user in users:
+        key = recommendation_key(user.id, city, countryCode, date, weather_preference, max_results)
+        dependencies = recommendation_dependencies(user.id)
+        cached = cache.get(key, dependencies) if RESULT_CACHE_ENABLED else None
+        if cached is not None:
+            yield user, list(cached)
+        else:
+            pending.append((user, key, dependencies))
+    if not pending:
+        return
+
+    weather, activities = await _fetch_weather_and_activities(city, countryCode, date)
+    filtered = [
+        _filter_activities_for_user(
+            activities, weather, city, user=user, weather_preference=weather_preference
+        )
+        for user, _, _ in pending
+    ]
+
+    # Users the factor model scores directly do not need similar users.
+    model = get_model()
+    needs_neighbours = [
+        i for i, (user, _, _) in enumerate(pending)
+        if filtered[i] and not (model is not None and model.has_user(user.id))
+    ]
+    neighbours = dict(zip(
+        needs_neighbours,
+        find_similar_users_many([pending[i][0] for i in needs_neighbours]),
+    ))
+
+    for i, (user, key, dependencies) in enumerate(pending):
+        recommended_activities = []
+        if filtered[i]:
+            recommendations = get_collaborative_recommendations(
+                user=user,
+                current_activities=filtered[i],
+                max_recommendations=max_results,
+                similar_users=neighbours.get(i),
+            )
+            recommended_activities = [activity for activity, score in recommendations]
+        if RESULT_CACHE_ENABLED:
+            cache.put(key, dependencies, recommended_activities)
+        yield user, recommended_activities
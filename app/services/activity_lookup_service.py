@@ -1,7 +1,7 @@
 """
 Service for managing and retrieving activities from all sources.
 """
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from app.models.db.activity import Activity
 
 
@@ -28,6 +28,22 @@ def activity_exists(activity_id: int) -> bool:
     return any(a.id == activity_id for a in admin_activities)
 
 
+def find_missing_activity_ids(activity_ids: Iterable[int]) -> List[int]:
+    """
+    Return the IDs from `activity_ids` that do not exist, in input order.
+    Builds the set of known IDs once, so checking a whole batch is a single pass.
+    """
+    from app.routes.admin import admin_activities
+    known = {a.id for a in admin_activities}
+    missing = []
+    seen = set()
+    for activity_id in activity_ids:
+        if activity_id not in known and activity_id not in seen:
+            missing.append(activity_id)
+            seen.add(activity_id)
+    return missing
+
+
 def get_activity_by_id(activity_id: int) -> Optional[Activity]:
     """Get an activity by ID from admin activities."""
     from app.routes.admin import admin_activities
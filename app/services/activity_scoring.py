@@ -0,0 +1,144 @@
+"""
+Scoring of candidate activities for one user, compiled once per request.
+
+`ScoringPlan.for_user` does the per-user work up front: the interests are
+lowercased and deduplicated, the activity types they map to are resolved
+into a bonus per type, and the weights of `recommendations.scoring` are
+folded into lookup tables. `rank` then scores every candidate in one pass
+(one lowercasing of each activity's text, no per-activity dict building)
+and keeps the best `limit` with a heap instead of sorting them all.
+
+An activity scores `base`, plus `interest_match` for each interest found in
+its name or description, `type_match` if its type is one the interests map
+to, `location_preference` if it is indoor/outdoor as the user prefers and
+`same_city` if it takes place in the user's city. Equal scores keep the
+order of the candidates.
+"""
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models.db.activity import Activity, ActivityType
+from app.models.db.user import User
+from app.services.config_service import get_config
+from app.services.user_features import UserFeatures, features_for
+
+# Interest (lowercased) -> activity type it counts for.
+INTEREST_ACTIVITY_TYPES: Dict[str, ActivityType] = {
+    "music": ActivityType.cultural,
+    "art": ActivityType.cultural,
+    "theater": ActivityType.cultural,
+    "museum": ActivityType.cultural,
+    "culture": ActivityType.cultural,
+    "sports": ActivityType.sports,
+    "fitness": ActivityType.sports,
+    "football": ActivityType.sports,
+    "basketball": ActivityType.sports,
+    "running": ActivityType.sports,
+    "community": ActivityType.community,
+    "volunteer": ActivityType.community,
+    "social": ActivityType.community,
+    "cultural": ActivityType.cultural,
+    "hiking": ActivityType.sports,
+}
+
+DEFAULT_WEIGHTS = {
+    "base": 1.0,
+    "interest_match": 2.0,
+    "type_match": 1.5,
+    "location_preference": 1.0,
+    "same_city": 0.5,
+}
+WEIGHTS: Dict[str, float] = {
+    **DEFAULT_WEIGHTS,
+    **(get_config().get("recommendations.scoring", {}) or {}),
+}
+
+# Joins an activity's name and description so one substring test covers
+# both; interests cannot contain it, so no match spans the two.
+_SEPARATOR = "\x00"
+
+
+def map_interests_to_activity_types(interests: Iterable[str]) -> List[ActivityType]:
+    """Activity types the interests map to, in order of first mention (every type if none does)."""
+    mapped_types: List[ActivityType] = []
+    for interest in interests:
+        activity_type = INTEREST_ACTIVITY_TYPES.get(interest.lower())
+        if activity_type is not None and activity_type not in mapped_types:
+            mapped_types.append(activity_type)
+    return mapped_types if mapped_types else list(ActivityType)
+
+
+class ScoringPlan:
+    """Everything needed to score activities for one user, precomputed."""
+
+    __slots__ = ("activity_types", "_base", "_interests", "_type_bonus", "_indoor_bonus", "_city", "_city_bonus")
+
+    def __init__(self, features: UserFeatures, weights: Optional[Dict[str, float]] = None):
+        weights = {**WEIGHTS, **(weights or {})}
+        self.activity_types = map_interests_to_activity_types(features.interests_lower)
+        self._base = weights["base"]
+        # (interest, bonus) with the bonus of repeated interests added up.
+        self._interests: Tuple[Tuple[str, float], ...] = tuple(
+            (interest, weights["interest_match"] * count)
+            for interest, count in Counter(features.interests_lower).items()
+            if _SEPARATOR not in interest
+        )
+        self._type_bonus = {t: weights["type_match"] for t in self.activity_types}
+        # Indexed by Activity.is_indoor.
+        preference = features.activity_preference
+        self._indoor_bonus = (
+            weights["location_preference"] if preference == "outdoor" else 0.0,
+            weights["location_preference"] if preference == "indoor" else 0.0,
+        )
+        self._city = features.city
+        self._city_bonus = weights["same_city"]
+
+    @classmethod
+    def for_user(cls, user: User, weights: Optional[Dict[str, float]] = None) -> "ScoringPlan":
+        return cls(features_for(user), weights)
+
+    def score(self, activity: Activity) -> float:
+        """Score of one activity."""
+        return self.scores([activity])[0]
+
+    def scores(self, activities: List[Activity]) -> List[float]:
+        """Scores of the activities, in order."""
+        base = self._base
+        interests = self._interests
+        type_bonus = self._type_bonus
+        indoor_bonus = self._indoor_bonus
+        city = self._city
+        city_bonus = self._city_bonus
+        scores = []
+        for activity in activities:
+            score = base + type_bonus.get(activity.type, 0.0) + indoor_bonus[bool(activity.is_indoor)]
+            if interests:
+                text = f"{activity.name}{_SEPARATOR}{activity.description or ''}".lower()
+                for interest, bonus in interests:
+                    if interest in text:
+                        score += bonus
+            if city and (activity.location or "").lower() == city:
+                score += city_bonus
+            scores.append(score)
+        return scores
+
+    def rank(self, activities: List[Activity], limit: Optional[int] = None) -> List[Activity]:
+        """
+        The activities by decreasing score.
+
+        Args:
+            activities: Candidates
+            limit: Keep only the best `limit` (selected with a heap)
+
+        Returns:
+            A new list; candidates with equal scores keep their order.
+        """
+        scores = self.scores(activities)
+        order = range(len(activities))
+        if limit is not None and limit < len(activities):
+            # nlargest is stable, like the full sort below.
+            best = heapq.nlargest(limit, order, key=scores.__getitem__)
+        else:
+            best = sorted(order, key=scores.__getitem__, reverse=True)
+        return [activities[i] for i in best]
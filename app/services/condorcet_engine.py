@@ -0,0 +1,136 @@
+"""
+NumPy implementation of the Schulze/Condorcet method.
+
+`VectorizedVoteService` exposes the same parse/score/build_graph/order_votes
+pipeline as `vote_service.VoteService`, but stores ballots as integer position
+arrays and works on dense matrices instead of dicts of dicts. Rankings are
+identical to the dict implementation, including the order of tied candidates.
+
+Large ballot sets can be tallied on several cores (see `parallel_tally`).
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.config_service import get_config
+from app.services.parallel_tally import count_pairwise, parallel_count_pairwise
+from app.services.vote_service import VoteService
+
+# Position given to candidates a ballot does not rank; larger than any real position.
+UNRANKED = np.iinfo(np.int32).max
+
+tally_config = get_config().get("votes.tally", {}) or {}
+# Worker processes for the pairwise tally (1 = in-process, null = one per CPU).
+TALLY_WORKERS = tally_config.get("workers", 1)
+# Below this many ballots the pool's start-up and copy cost outweighs the gain.
+PARALLEL_MIN_BALLOTS = tally_config.get("parallel_min_ballots", 100000)
+
+
+def ballots_to_positions(ballots: List[List[int]], candidate_ids: List[int]) -> np.ndarray:
+    """
+    Encode ranked ballots as a (ballots x candidates) position matrix.
+
+    Args:
+        ballots: Rankings of candidate IDs, best first
+        candidate_ids: Candidate IDs in column order
+
+    Returns:
+        int32 matrix where cell [v, c] is the position of candidate c on ballot v,
+        or UNRANKED if the ballot does not rank it.
+    """
+    index = {cid: col for col, cid in enumerate(candidate_ids)}
+    positions = np.full((len(ballots), len(candidate_ids)), UNRANKED, dtype=np.int32)
+    for row, ranking in enumerate(ballots):
+        for pos, cid in enumerate(ranking):
+            positions[row, index[cid]] = pos
+    return positions
+
+
+def pairwise_from_positions(positions: np.ndarray, workers: Optional[int] = 1) -> np.ndarray:
+    """
+    Count, for every ordered pair (a, b), the ballots preferring a over b.
+
+    A ranked candidate beats every unranked one; two unranked candidates tie.
+    Ballots are processed in chunks so memory stays bounded for large elections.
+
+    Args:
+        positions: (ballots x candidates) position matrix
+        workers: Processes to partition the ballots across (None = one per CPU).
+            Used only from PARALLEL_MIN_BALLOTS ballots on.
+    """
+    if workers != 1 and len(positions) >= PARALLEL_MIN_BALLOTS:
+        return parallel_count_pairwise(positions, workers)
+    return count_pairwise(positions)
+
+
+def strongest_paths(pairwise: np.ndarray) -> np.ndarray:
+    """
+    Widest-path closure (Floyd-Warshall on max/min) over a pairwise matrix.
+
+    Row and column k are not modified during iteration k, so each step can be
+    applied to the whole matrix at once.
+    """
+    paths = pairwise.copy()
+    np.fill_diagonal(paths, 0)
+    for k in range(paths.shape[0]):
+        np.maximum(paths, np.minimum(paths[:, k:k + 1], paths[k:k + 1, :]), out=paths)
+    np.fill_diagonal(paths, 0)
+    return paths
+
+
+def rank_candidates(paths: np.ndarray, candidate_ids: List[int]) -> List[int]:
+    """Order candidates by Schulze wins, keeping input order among ties."""
+    if not candidate_ids:
+        return []
+    wins = (paths > paths.T).sum(axis=1)
+    order = np.argsort(-wins, kind="stable")
+    return [candidate_ids[i] for i in order]
+
+
+def schulze_ranking(pairwise: np.ndarray, candidate_ids: List[int]) -> List[int]:
+    """Run the closure and ranking steps on an already tallied pairwise matrix."""
+    return rank_candidates(strongest_paths(pairwise), candidate_ids)
+
+
+class VectorizedVoteService(VoteService):
+    """Drop-in replacement for `VoteService` backed by NumPy arrays."""
+
+    def __init__(self, workers: Optional[int] = TALLY_WORKERS):
+        super().__init__()
+        self.workers = workers
+        self.candidate_ids: List[int] = []
+        self.positions: np.ndarray = np.zeros((0, 0), dtype=np.int32)
+        self.pairwise: np.ndarray = np.zeros((0, 0), dtype=np.int64)
+        self.paths: np.ndarray = np.zeros((0, 0), dtype=np.int64)
+
+    def parse(self, votes_data: List[Dict]) -> None:
+        """
+        Parse vote data into a ballot position matrix.
+
+        Args:
+            votes_data: List of vote dictionaries with 'user_id' and 'activity_ranking'
+        """
+        super().parse(votes_data)
+        # Same iteration order as VoteService so ties break identically.
+        self.candidate_ids = list(self.candidates)
+        self.positions = ballots_to_positions(
+            [vote.get('activity_ranking', []) for vote in votes_data],
+            self.candidate_ids,
+        )
+
+    def score(self) -> None:
+        """Build the pairwise preference matrix from the ballot positions (in parallel for large sets)."""
+        self.pairwise = pairwise_from_positions(self.positions, self.workers)
+
+    def build_graph(self) -> None:
+        """Compute the strongest paths between all candidates."""
+        self.paths = strongest_paths(self.pairwise)
+
+    def order_votes(self) -> List[int]:
+        """
+        Determine the final ranking using the Schulze method.
+
+        Returns:
+            List[int]: Ordered list of candidate IDs
+        """
+        return rank_candidates(self.paths, self.candidate_ids)
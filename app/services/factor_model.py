@@ -0,0 +1,344 @@
+"""
+Matrix-factorization model of the user x activity score matrix.
+
+An offline job (`train_model`, or `scripts/train_factor_model.py`, which reads
+the votes from the write-ahead log with `train_from_log`) factorizes the
+current votes' scores with alternating least squares (ALS) into one
+embedding per user and per activity, so that
+
+    predicted score = mean score + user_factors[u] . activity_factors[a]
+
+Serving then scores a user's candidate activities with one matrix-vector
+product instead of walking similar users' votes.
+
+Each trained model gets a version one higher than both the serving model and
+the model file already published (so separate training runs keep counting up)
+and is written atomically to `recommendations.factor_model.path` (the
+FACTOR_MODEL_PATH environment variable overrides it). `get_model` swaps in a
+newer file as soon as one is published, so a model trained by another process
+is picked up without a restart; requests in flight keep the model they read.
+"""
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.config_service import get_config
+from app.services.vote_log import read_votes, resolve_directory
+
+model_config = get_config().get("recommendations.factor_model", {}) or {}
+FACTOR_MODEL_ENABLED = model_config.get("enabled", True)
+FACTORS = model_config.get("factors", 16)
+REGULARIZATION = model_config.get("regularization", 0.1)
+ITERATIONS = model_config.get("iterations", 15)
+
+# Ratings per batch of the ALS solve, bounding the (ratings x factors x factors)
+# outer products held at once.
+_SOLVE_BLOCK = 1 << 14
+
+
+def _resolve_model_path() -> Path:
+    path = Path(os.getenv("FACTOR_MODEL_PATH") or model_config.get("path", "app/data/factor_model.npz"))
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[2] / path
+    return path
+
+
+MODEL_PATH = _resolve_model_path()
+
+
+def _model_path() -> Path:
+    return MODEL_PATH
+
+
+class FactorModel:
+    """Trained user and activity embeddings, read-only once published."""
+
+    def __init__(
+        self,
+        user_ids: np.ndarray,
+        activity_ids: np.ndarray,
+        user_factors: np.ndarray,
+        activity_factors: np.ndarray,
+        mean: float,
+        version: int = 0,
+        vote_version: int = 0,
+        trained_at: str = "",
+    ):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.activity_ids = np.asarray(activity_ids, dtype=np.int64)
+        self.user_factors = np.asarray(user_factors, dtype=np.float64)
+        self.activity_factors = np.asarray(activity_factors, dtype=np.float64)
+        self.mean = float(mean)
+        self.version = int(version)
+        self.vote_version = int(vote_version)
+        self.trained_at = trained_at
+        self._users = {int(uid): row for row, uid in enumerate(self.user_ids)}
+        self._activities = {int(aid): row for row, aid in enumerate(self.activity_ids)}
+
+    def has_user(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def predict(self, user_id: int, activity_ids: Iterable[int]) -> np.ndarray:
+        """
+        Predicted scores of `user_id` for `activity_ids`.
+
+        Returns:
+            Array aligned with `activity_ids`; NaN where the user or the
+            activity was not in the training data.
+        """
+        activity_ids = list(activity_ids)
+        scores = np.full(len(activity_ids), np.nan)
+        row = self._users.get(user_id)
+        if row is None or not activity_ids:
+            return scores
+        columns = np.array([self._activities.get(aid, -1) for aid in activity_ids], dtype=np.int64)
+        known = columns >= 0
+        scores[known] = self.mean + self.activity_factors[columns[known]] @ self.user_factors[row]
+        return scores
+
+    def save(self, path: Path) -> None:
+        """Write the model to `path` atomically (write a temp file, then rename)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                user_ids=self.user_ids,
+                activity_ids=self.activity_ids,
+                user_factors=self.user_factors,
+                activity_factors=self.activity_factors,
+                meta=np.array([self.mean, self.version, self.vote_version]),
+                trained_at=np.array(self.trained_at),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def stored_version(path: Path) -> int:
+        """Version of the model saved at `path`, or 0 if there is no readable one."""
+        try:
+            with np.load(path) as data:
+                return int(data["meta"][1])
+        except Exception:
+            return 0
+
+    @classmethod
+    def load(cls, path: Path) -> "FactorModel":
+        with np.load(path) as data:
+            mean, version, vote_version = data["meta"]
+            return cls(
+                data["user_ids"], data["activity_ids"], data["user_factors"], data["activity_factors"],
+                mean=mean, version=int(version), vote_version=int(vote_version),
+                trained_at=str(data["trained_at"]),
+            )
+
+
+def _solve(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, fixed: np.ndarray, n_rows: int, reg: float) -> np.ndarray:
+    """
+    One ALS half-step: the regularized least-squares factors of every row
+    given the fixed factors of the other side. Entries must be sorted by row
+    and every row must have at least one entry.
+    """
+    k = fixed.shape[1]
+    factors = np.zeros((n_rows, k))
+    row_starts = np.searchsorted(rows, np.arange(n_rows + 1))
+    eye = np.eye(k)
+    start = 0
+    while start < n_rows:
+        # Whole rows up to about _SOLVE_BLOCK ratings (at least one row).
+        stop = int(np.searchsorted(row_starts, row_starts[start] + _SOLVE_BLOCK, side="right")) - 1
+        stop = min(max(stop, start + 1), n_rows)
+        lo, hi = row_starts[start], row_starts[stop]
+        segments = row_starts[start:stop] - lo
+        other = fixed[cols[lo:hi]]
+        outer = (other[:, :, None] * other[:, None, :]).reshape(len(other), k * k)
+        gram = np.add.reduceat(outer, segments, axis=0).reshape(-1, k, k)
+        rhs = np.add.reduceat(other * values[lo:hi, None], segments, axis=0)
+        # Weighted-lambda regularization: scale by each row's number of ratings.
+        counts = np.diff(row_starts[start:stop + 1])
+        gram += reg * counts[:, None, None] * eye
+        factors[start:stop] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+        start = stop
+    return factors
+
+
+def train_als(
+    ratings: List[Tuple[int, int, float]],
+    factors: int = FACTORS,
+    regularization: float = REGULARIZATION,
+    iterations: int = ITERATIONS,
+    seed: int = 0,
+) -> FactorModel:
+    """
+    Factorize (user_id, activity_id, score) ratings with ALS.
+
+    Args:
+        ratings: Observed scores; unobserved pairs are not treated as zeros
+        factors: Embedding size
+        regularization: L2 penalty, scaled by each user's / activity's rating count
+        iterations: Number of (users, activities) alternations
+
+    Returns:
+        An unversioned model over the users and activities in `ratings`.
+    """
+    if not ratings:
+        empty = np.zeros((0, factors))
+        return FactorModel(np.zeros(0), np.zeros(0), empty, empty, 0.0)
+    data = np.array(ratings, dtype=np.float64)
+    user_ids, users = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    activity_ids, activities = np.unique(data[:, 1].astype(np.int64), return_inverse=True)
+    mean = data[:, 2].mean()
+    values = data[:, 2] - mean
+
+    by_user = np.argsort(users, kind="stable")
+    by_activity = np.argsort(activities, kind="stable")
+    rng = np.random.default_rng(seed)
+    activity_factors = rng.normal(scale=0.1, size=(len(activity_ids), factors))
+    user_factors = np.zeros((len(user_ids), factors))
+    for _ in range(iterations):
+        user_factors = _solve(
+            users[by_user], activities[by_user], values[by_user], activity_factors, len(user_ids), regularization,
+        )
+        activity_factors = _solve(
+            activities[by_activity], users[by_activity], values[by_activity], user_factors, len(activity_ids), regularization,
+        )
+    return FactorModel(user_ids, activity_ids, user_factors, activity_factors, mean)
+
+
+_LOCK = Lock()
+_MODEL: Optional[FactorModel] = None
+# (inode, mtime_ns, size) of the model file behind _MODEL, to notice newly
+# published files, and of the last file that could not replace it (unreadable
+# or older), so it is not loaded again on every request.
+_MODEL_STAMP: Optional[Tuple[int, int, int]] = None
+_REJECTED_STAMP: Optional[Tuple[int, int, int]] = None
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def publish_model(model: FactorModel, save: bool = True) -> FactorModel:
+    """
+    Make `model` the serving model, versioned one above the current one and
+    above the model file (which another process may have published).
+
+    Args:
+        model: Freshly trained model
+        save: Also write it to the model file, for other processes and restarts
+    """
+    global _MODEL, _MODEL_STAMP
+    with _LOCK:
+        current = _MODEL.version if _MODEL is not None else 0
+        if save:
+            path = _model_path()
+            current = max(current, FactorModel.stored_version(path))
+        model.version = max(model.version, current + 1)
+        if save:
+            model.save(path)
+            _MODEL_STAMP = _file_stamp(path)
+        _MODEL = model
+    print(f"Published factor model v{model.version}: {len(model.user_ids)} users, {len(model.activity_ids)} activities")
+    return model
+
+
+def get_model() -> Optional[FactorModel]:
+    """
+    The serving model, or None if none has been trained.
+
+    Loads the model file when it changed since it was last read, so a model
+    published by another process replaces the one in memory.
+    """
+    global _MODEL, _MODEL_STAMP, _REJECTED_STAMP
+    if not FACTOR_MODEL_ENABLED:
+        return None
+    path = _model_path()
+    stamp = _file_stamp(path)
+    if stamp is None or stamp == _MODEL_STAMP or stamp == _REJECTED_STAMP:
+        return _MODEL
+    with _LOCK:
+        if stamp != _MODEL_STAMP and stamp != _REJECTED_STAMP:
+            try:
+                model = FactorModel.load(path)
+            except Exception as e:
+                print(f"Error loading factor model from {path}: {e}")
+                _REJECTED_STAMP = stamp
+                return _MODEL
+            if _MODEL is None or model.version >= _MODEL.version:
+                _MODEL = model
+                _MODEL_STAMP = stamp
+            else:
+                print(f"Ignoring factor model v{model.version} in {path}: v{_MODEL.version} is newer")
+                _REJECTED_STAMP = stamp
+        return _MODEL
+
+
+def _ratings(votes: Iterable[Dict]) -> List[Tuple[int, int, float]]:
+    """(user, activity, score) of each user's latest vote per activity."""
+    latest: Dict[Tuple[int, int], float] = {}
+    for vote in votes:
+        user_id, activity_id, score = vote.get("user_id"), vote.get("activity_id"), vote.get("score")
+        if isinstance(user_id, int) and isinstance(activity_id, int) and isinstance(score, (int, float)):
+            latest[(user_id, activity_id)] = float(score)
+    return [(user_id, activity_id, score) for (user_id, activity_id), score in latest.items()]
+
+
+def train_model(votes: Optional[Iterable[Dict]] = None, vote_version: int = 0, **kwargs) -> FactorModel:
+    """
+    Train on votes and publish the result.
+
+    Args:
+        votes: Votes to train on (later votes supersede earlier ones for the
+            same user and activity); by default this process's vote store
+        vote_version: Version of the votes, recorded with the model
+            (the vote store's version by default)
+
+    Other keyword arguments are passed to `train_als`.
+    """
+    if votes is None:
+        # Imported late: offline jobs pass the votes read from the log
+        # (train_from_log) and must not open the live vote store.
+        from app.services.vote_service import get_vote_snapshot
+
+        snapshot = get_vote_snapshot()
+        votes, vote_version = snapshot.votes(), snapshot.version
+    model = train_als(_ratings(votes), **kwargs)
+    model.vote_version = vote_version
+    model.trained_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    return publish_model(model)
+
+
+def train_from_log(directory: Optional[Path] = None, **kwargs) -> FactorModel:
+    """
+    Train on the votes in the vote store's write-ahead log and publish the result.
+
+    Reads the log without starting it (see vote_log.read_votes), so it is safe
+    while API processes are writing to the same directory. The model records
+    the log's last LSN as its vote version.
+
+    Args:
+        directory: Log directory (default: `votes.storage.directory`, or VOTE_STORAGE_DIR)
+    """
+    if directory is None:
+        storage_config = get_config().get("votes.storage", {}) or {}
+        directory = resolve_directory(storage_config.get("directory", "app/data/vote_log"))
+    lsn, votes = read_votes(directory)
+    return train_model(votes, vote_version=lsn, **kwargs)
+
+
+def reset_model() -> None:
+    """Forget the serving model (the file is left alone). Mostly for tests."""
+    global _MODEL, _MODEL_STAMP, _REJECTED_STAMP
+    with _LOCK:
+        _MODEL = None
+        _MODEL_STAMP = None
+        _REJECTED_STAMP = None
@@ -0,0 +1,127 @@
+"""
+Long-lived item-item similarity of activities from co-voting users.
+
+Each activity is a sparse vector of its voters' scores, centered on the
+middle of the score scale (so a 9 and a 2 pull in opposite directions). Two
+activities are similar when the users who voted on both scored them alike:
+
+    similarity(a, b) = dot(a, b) / sqrt(norm(a) * norm(b)) * co / (co + shrinkage)
+
+where `dot` sums the products of the two centered scores over co-voters,
+`norm` sums an activity's squared centered scores and `co` counts the
+co-voters. The shrinkage term damps pairs with only a handful of co-voters.
+
+Ballots are folded in as they change, and only pairs involving a changed
+activity are touched, so a vote costs O(len(ballot)). The top-N neighbours
+of an activity are cached and dropped whenever one of its similarities
+changes; reading them is a dictionary lookup unless a vote touched the
+activity since the last read.
+"""
+import heapq
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class ItemSimilarityMatrix:
+    """Sparse co-vote statistics and cached top-N neighbours. Not thread-safe."""
+
+    def __init__(self, top_n: int = 20, shrinkage: float = 10.0, center: float = 5.5):
+        self.top_n = top_n
+        self.shrinkage = shrinkage
+        self.center = center
+        # Symmetric: _dots[a][b] == _dots[b][a], same for _co.
+        self._dots: Dict[int, Dict[int, float]] = {}
+        self._co: Dict[int, Dict[int, int]] = {}
+        self._norms: Dict[int, float] = {}
+        self._top: Dict[int, List[Tuple[int, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._norms)
+
+    def _apply_pairs(self, ballot: Dict[int, float], changed: Set[int], sign: int) -> None:
+        """Add (sign=1) or retract (sign=-1) every pair of `ballot` involving a changed activity."""
+        for a in changed:
+            if a not in ballot:
+                continue
+            score_a = ballot[a] - self.center
+            for b, score in ballot.items():
+                if b == a or (b in changed and b < a):
+                    continue
+                product = sign * score_a * (score - self.center)
+                for x, y in ((a, b), (b, a)):
+                    dots = self._dots.setdefault(x, {})
+                    co = self._co.setdefault(x, {})
+                    count = co.get(y, 0) + sign
+                    if count:
+                        dots[y] = dots.get(y, 0.0) + product
+                        co[y] = count
+                    else:
+                        dots.pop(y, None)
+                        co.pop(y, None)
+
+    def replace_ballot(self, old: Dict[int, float], new: Dict[int, float]) -> None:
+        """
+        Move one user's ballot from `old` to `new`.
+
+        Args:
+            old: The user's previous {activity_id: score}
+            new: The user's current {activity_id: score}
+        """
+        changed = {aid for aid in old.keys() | new.keys() if old.get(aid) != new.get(aid)}
+        if not changed:
+            return
+        self._invalidate(changed)
+        self._apply_pairs(old, changed, -1)
+        self._apply_pairs(new, changed, 1)
+        self._invalidate(changed)
+        for aid in changed:
+            norm = self._norms.get(aid, 0.0)
+            if aid in old:
+                norm -= (old[aid] - self.center) ** 2
+            if aid in new:
+                norm += (new[aid] - self.center) ** 2
+            self._norms[aid] = norm
+
+    def _invalidate(self, changed: Set[int]) -> None:
+        """Drop the cached neighbours of the changed activities and of everything co-voted with them."""
+        for aid in changed:
+            self._top.pop(aid, None)
+            for other in self._dots.get(aid, ()):
+                self._top.pop(other, None)
+
+    def similarity(self, a: int, b: int) -> float:
+        """Current similarity of two activities (0 without co-voters)."""
+        dot = self._dots.get(a, {}).get(b)
+        if dot is None:
+            return 0.0
+        norms = self._norms.get(a, 0.0) * self._norms.get(b, 0.0)
+        if norms <= 0:
+            return 0.0
+        co = self._co[a][b]
+        return dot / math.sqrt(norms) * co / (co + self.shrinkage)
+
+    def neighbours(self, activity_id: int, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        The most similar activities (positive similarity only), best first.
+
+        Returns:
+            List of (activity_id, similarity), at most min(limit, top_n) long.
+        """
+        top = self._top.get(activity_id)
+        if top is None:
+            scored = ((b, self.similarity(activity_id, b)) for b in self._dots.get(activity_id, ()))
+            positive = (item for item in scored if item[1] > 0)
+            top = heapq.nlargest(self.top_n, positive, key=lambda item: (item[1], -item[0]))
+            self._top[activity_id] = top
+        return top[:limit] if limit is not None else list(top)
+
+    def co_votes(self, a: int, b: int) -> int:
+        """Number of users who voted on both activities."""
+        return self._co.get(a, {}).get(b, 0)
+
+    def clear(self) -> None:
+        """Drop all statistics."""
+        self._dots = {}
+        self._co = {}
+        self._norms = {}
+        self._top = {}
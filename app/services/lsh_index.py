@@ -0,0 +1,126 @@
+"""
+MinHash LSH candidate index for similar-user search.
+
+Each user's interest set is summarised by a MinHash signature of `num_perm`
+values; the probability that two signatures agree in one position equals the
+Jaccard similarity of the sets. Signatures are cut into `bands` bands of
+`num_perm / bands` rows, and users whose signatures agree on a whole band
+land in the same bucket. Looking up the query's buckets therefore returns,
+in time independent of the user count, the users likely to share interests.
+Users in the same city are added from a city bucket, since location weighs
+heavily in the similarity score. Callers re-rank the candidates with the
+exact similarity score.
+
+The index follows the user feature cache: it is updated on every profile
+write and rebuilt when the store is reloaded.
+"""
+import zlib
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services.user_features import UserFeatures
+
+# Mersenne prime used by the universal hash family of the permutations.
+_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """Banded MinHash index over interest sets, plus exact city buckets."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._lock = Lock()
+        self._buckets: List[Dict[bytes, Set[int]]] = [defaultdict(set) for _ in range(bands)]
+        self._cities: Dict[str, Set[int]] = defaultdict(set)
+        # user_id -> (interests, city) as indexed, to find the buckets again on
+        # update/removal. The band keys are recomputed then rather than kept per
+        # user: the interest set is shared with the user's features.
+        self._entries: Dict[int, Tuple[FrozenSet[str], Optional[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, interests: Iterable[str]) -> Optional[np.ndarray]:
+        """MinHash signature of an interest set, or None if it is empty."""
+        elements = np.array(
+            [zlib.crc32(i.encode("utf-8")) & 0x7FFFFFFF for i in set(interests)], dtype=np.uint64
+        )
+        if elements.size == 0:
+            return None
+        hashed = (self._a[:, None] * elements[None, :] + self._b[:, None]) % _PRIME
+        return hashed.min(axis=1)
+
+    def _band_keys(self, interests: Iterable[str]) -> List[bytes]:
+        signature = self.signature(interests)
+        if signature is None:
+            return []
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _remove_locked(self, user_id: int, keys: Optional[List[bytes]] = None) -> None:
+        """Drop a user from its buckets (`keys`: its band keys, if already known)."""
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        interests, city = entry
+        for band, key in enumerate(keys if keys is not None else self._band_keys(interests)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._buckets[band][key]
+        if city is not None:
+            members = self._cities.get(city)
+            if members is not None:
+                members.discard(user_id)
+                if not members:
+                    del self._cities[city]
+
+    def add(self, features: UserFeatures) -> None:
+        """Index (or re-index) one user."""
+        keys = self._band_keys(features.interests)
+        with self._lock:
+            entry = self._entries.get(features.id)
+            # Unchanged interests (e.g. a city update) have the same band keys.
+            same = entry is not None and entry[0] == features.interests
+            self._remove_locked(features.id, keys if same else None)
+            for band, key in enumerate(keys):
+                self._buckets[band][key].add(features.id)
+            if features.city:
+                self._cities[features.city].add(features.id)
+            self._entries[features.id] = (features.interests, features.city)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            self._remove_locked(user_id)
+
+    def rebuild(self, features: Iterable[UserFeatures]) -> None:
+        """Replace the whole index."""
+        with self._lock:
+            self._buckets = [defaultdict(set) for _ in range(self.bands)]
+            self._cities = defaultdict(set)
+            self._entries = {}
+        for f in features:
+            self.add(f)
+
+    def candidates(self, features: UserFeatures) -> Set[int]:
+        """Users sharing at least one band with the query, or its city."""
+        keys = self._band_keys(features.interests)
+        found: Set[int] = set()
+        with self._lock:
+            for band, key in enumerate(keys):
+                bucket = self._buckets[band].get(key)
+                if bucket:
+                    found |= bucket
+            if features.city:
+                found |= self._cities.get(features.city, set())
+        return found
@@ -0,0 +1,136 @@
+"""
+Long-lived pairwise preference matrix for the Condorcet/Schulze method.
+
+Ballots are folded in (and retracted) one at a time, so the pairwise counts
+are always current and a Schulze result only needs the closure step.
+
+A ballot maps candidate IDs to positions: a lower position is preferred,
+equal positions are a tie, and candidates missing from the ballot lose to
+every candidate it ranks (the same rule as `VoteService.score`).
+
+Only pairs of candidates that appear on the same ballot are touched, so
+adding or retracting a ballot costs O(len(ballot)^2). The counts for
+"ranked vs. unranked" pairs are derived when the matrix is read:
+
+    pairwise[a][b] = prefer[a][b] + ranked[a] - both[a][b]
+
+where `prefer` counts ballots ranking a strictly above b, `both` counts
+ballots ranking both and `ranked` counts ballots ranking a at all.
+"""
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+
+def ranking_positions(ranking: Sequence[int]) -> Dict[int, int]:
+    """Convert a best-first ranking list into a ballot of positions."""
+    return {cid: pos for pos, cid in enumerate(ranking)}
+
+
+class IncrementalPairwiseMatrix:
+    """Pairwise preference counts maintained ballot by ballot. Not thread-safe."""
+
+    def __init__(self, initial_capacity: int = 16):
+        self.candidate_ids: List[int] = []
+        self.ballot_count = 0
+        self._index: Dict[int, int] = {}
+        self._capacity = max(1, initial_capacity)
+        self._prefer = np.zeros((self._capacity, self._capacity), dtype=np.int64)
+        self._both = np.zeros((self._capacity, self._capacity), dtype=np.int64)
+        self._ranked = np.zeros(self._capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.candidate_ids)
+
+    def _grow(self, needed: int) -> None:
+        """Reallocate the backing arrays with at least `needed` rows, keeping counts."""
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        n = len(self.candidate_ids)
+        prefer = np.zeros((capacity, capacity), dtype=np.int64)
+        both = np.zeros((capacity, capacity), dtype=np.int64)
+        ranked = np.zeros(capacity, dtype=np.int64)
+        prefer[:n, :n] = self._prefer[:n, :n]
+        both[:n, :n] = self._both[:n, :n]
+        ranked[:n] = self._ranked[:n]
+        self._prefer, self._both, self._ranked = prefer, both, ranked
+        self._capacity = capacity
+
+    def add_candidate(self, candidate_id: int) -> int:
+        """
+        Register a candidate and return its row index.
+
+        Existing ballots do not rank the new candidate, so it starts out
+        beaten by every candidate they rank; no existing cell changes.
+        """
+        idx = self._index.get(candidate_id)
+        if idx is not None:
+            return idx
+        idx = len(self.candidate_ids)
+        if idx >= self._capacity:
+            self._grow(idx + 1)
+        self._index[candidate_id] = idx
+        self.candidate_ids.append(candidate_id)
+        return idx
+
+    def add_candidates(self, candidate_ids: Iterable[int]) -> None:
+        """Register several candidates at once."""
+        for cid in candidate_ids:
+            self.add_candidate(cid)
+
+    def _apply(self, ballot: Dict[int, float], sign: int) -> None:
+        if not ballot:
+            return
+        idx = np.fromiter((self.add_candidate(cid) for cid in ballot), dtype=np.intp, count=len(ballot))
+        pos = np.fromiter(ballot.values(), dtype=np.float64, count=len(ballot))
+        block = np.ix_(idx, idx)
+        self._prefer[block] += sign * (pos[:, None] < pos[None, :])
+        self._both[block] += sign
+        self._ranked[idx] += sign
+        self.ballot_count += sign
+
+    def add_ballot(self, ballot: Dict[int, float]) -> None:
+        """
+        Fold one ballot into the counts.
+
+        Args:
+            ballot: Mapping of candidate ID to position (lower is preferred)
+        """
+        self._apply(ballot, 1)
+
+    def retract_ballot(self, ballot: Dict[int, float]) -> None:
+        """
+        Remove a ballot previously passed to `add_ballot`.
+
+        The ballot must be identical to the one that was added, otherwise the
+        counts become inconsistent.
+        """
+        self._apply(ballot, -1)
+
+    def replace_ballot(self, old: Dict[int, float], new: Dict[int, float]) -> None:
+        """Retract `old` and add `new`, e.g. when a voter amends their ballot."""
+        self._apply(old, -1)
+        self._apply(new, 1)
+
+    def pairwise(self) -> np.ndarray:
+        """
+        Return a fresh (candidates x candidates) matrix of pairwise wins.
+
+        Cell [i, j] is the number of ballots preferring candidate_ids[i]
+        over candidate_ids[j].
+        """
+        n = len(self.candidate_ids)
+        matrix = self._prefer[:n, :n] + self._ranked[:n, None] - self._both[:n, :n]
+        np.fill_diagonal(matrix, 0)
+        return matrix
+
+    def clear(self) -> None:
+        """Drop all ballots and candidates, keeping the allocated capacity."""
+        n = len(self.candidate_ids)
+        self._prefer[:n, :n] = 0
+        self._both[:n, :n] = 0
+        self._ranked[:n] = 0
+        self.candidate_ids = []
+        self._index = {}
+        self.ballot_count = 0
@@ -0,0 +1,131 @@
+"""
+Pairwise tally of ranked ballots, optionally split across a process pool.
+
+The ballot position matrix (see `condorcet_engine.ballots_to_positions`) is
+copied once into shared memory. Each worker attaches to it by name, counts
+its own range of ballots and writes a partial pairwise matrix into its slice
+of a shared output buffer; the parent sums the partials. Nothing but a few
+integers is pickled, so the cost per worker does not grow with the ballots.
+
+This module imports nothing from the app so that spawned workers start
+quickly and never load the vote store.
+"""
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+# Upper bound on the number of ballot x candidate x candidate cells compared at once.
+_CHUNK_CELLS = 1 << 24
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = Lock()
+
+
+def count_pairwise(positions: np.ndarray) -> np.ndarray:
+    """
+    Count, for every ordered pair (a, b), the ballots preferring a over b.
+
+    A ranked candidate beats every unranked one; two unranked candidates tie.
+    Ballots are processed in chunks so memory stays bounded for large elections.
+    """
+    n_ballots, n = positions.shape
+    pairwise = np.zeros((n, n), dtype=np.int64)
+    if n == 0:
+        return pairwise
+    chunk = max(1, _CHUNK_CELLS // (n * n))
+    for start in range(0, n_ballots, chunk):
+        block = positions[start:start + chunk]
+        pairwise += (block[:, :, None] < block[:, None, :]).sum(axis=0)
+    return pairwise
+
+
+def _tally_partition(positions_name: str, shape, dtype: str, out_name: str, slot: int, start: int, stop: int) -> None:
+    """Worker: tally ballots[start:stop] into slot `slot` of the shared output."""
+    positions_shm = shared_memory.SharedMemory(name=positions_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        positions = np.ndarray(shape, dtype=np.dtype(dtype), buffer=positions_shm.buf)
+        n = shape[1]
+        partial = np.ndarray((n, n), dtype=np.int64, buffer=out_shm.buf, offset=slot * n * n * 8)
+        partial[:] = count_pairwise(positions[start:stop])
+        # Drop the views before closing, or close() fails on exported buffers.
+        del positions, partial
+    finally:
+        positions_shm.close()
+        out_shm.close()
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """Shared process pool, recreated only when a different size is requested."""
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown()
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (they are started again on demand)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown()
+            _POOL = None
+
+
+atexit.register(shutdown_pool)
+
+
+def parallel_count_pairwise(positions: np.ndarray, workers: Optional[int] = None) -> np.ndarray:
+    """
+    Same result as `count_pairwise`, with the ballots partitioned across processes.
+
+    Args:
+        positions: (ballots x candidates) position matrix
+        workers: Number of worker processes (defaults to the number of CPUs)
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(positions)))
+    n_ballots, n = positions.shape
+    if workers == 1 or n == 0:
+        return count_pairwise(positions)
+
+    positions = np.ascontiguousarray(positions)
+    positions_shm = shared_memory.SharedMemory(create=True, size=max(1, positions.nbytes))
+    out_shm = shared_memory.SharedMemory(create=True, size=workers * n * n * 8)
+    try:
+        shared = np.ndarray(positions.shape, dtype=positions.dtype, buffer=positions_shm.buf)
+        shared[:] = positions
+        bounds = np.linspace(0, n_ballots, workers + 1).astype(int)
+        pool = _pool(workers)
+        futures = [
+            pool.submit(
+                _tally_partition, positions_shm.name, positions.shape, positions.dtype.str,
+                out_shm.name, slot, int(bounds[slot]), int(bounds[slot + 1]),
+            )
+            for slot in range(workers)
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except Exception:
+            # A broken pool stays broken; start a fresh one next time.
+            shutdown_pool()
+            raise
+        partials = np.ndarray((workers, n, n), dtype=np.int64, buffer=out_shm.buf)
+        pairwise = partials.sum(axis=0)
+        del shared, partials
+        return pairwise
+    finally:
+        positions_shm.close()
+        positions_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
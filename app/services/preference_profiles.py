@@ -0,0 +1,141 @@
+"""
+Per-user preference profiles maintained from score votes.
+
+A user's profile holds their normalized score per voted activity (1-10 mapped
+to 0-1) and, for activities of a known type, the mean normalized score per
+activity type. Profiles are updated as votes arrive, so reading one costs
+O(profile size) instead of a scan of the user's votes.
+
+The type of an activity is looked up in the admin catalog when the user first
+votes on it and stored in the profile, so later catalog changes do not shift
+existing aggregates. Profiles are saved in the vote log snapshots (see
+`to_state` / `from_state`) and only votes logged after a snapshot are
+replayed into them on recovery.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+
+MIN_SCORE = 1
+MAX_SCORE = 10
+
+
+def normalize_score(score: float) -> float:
+    """Map a 1-10 vote score to 0-1."""
+    return (score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE)
+
+
+class PreferenceProfile:
+    """One user's preferences. Read-only once built: updates create a new profile."""
+
+    __slots__ = ("scores", "activity_types", "_type_totals")
+
+    def __init__(
+        self,
+        scores: Optional[Dict[int, float]] = None,
+        activity_types: Optional[Dict[int, str]] = None,
+        type_totals: Optional[Dict[str, Tuple[float, int]]] = None,
+    ):
+        # activity_id -> normalized score
+        self.scores: Dict[int, float] = scores or {}
+        # activity_id -> type recorded on the first vote (known types only)
+        self.activity_types: Dict[int, str] = activity_types or {}
+        # type -> (sum of normalized scores, number of activities)
+        self._type_totals: Dict[str, Tuple[float, int]] = type_totals or {}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def type_scores(self) -> Dict[str, float]:
+        """Mean normalized score per activity type."""
+        return {t: total / count for t, (total, count) in self._type_totals.items()}
+
+    def with_score(self, activity_id: int, score: float, activity_type: Optional[str]) -> "PreferenceProfile":
+        """
+        A copy of the profile with the normalized `score` for `activity_id`.
+
+        Args:
+            activity_id: Voted activity
+            score: Normalized score (see normalize_score)
+            activity_type: Catalog type of the activity; ignored if the
+                profile already recorded one for it
+        """
+        scores = dict(self.scores)
+        activity_types = self.activity_types
+        type_totals = self._type_totals
+        previous = scores.get(activity_id)
+        scores[activity_id] = score
+
+        recorded = activity_types.get(activity_id)
+        if recorded is None and previous is None and activity_type is not None:
+            activity_types = dict(activity_types)
+            activity_types[activity_id] = recorded = activity_type
+        if recorded is not None:
+            total, count = type_totals.get(recorded, (0.0, 0))
+            if previous is None:
+                total, count = total + score, count + 1
+            else:
+                total += score - previous
+            type_totals = dict(type_totals)
+            type_totals[recorded] = (total, count)
+        return PreferenceProfile(scores, activity_types, type_totals)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "scores": {str(aid): score for aid, score in self.scores.items()},
+            "types": {str(aid): t for aid, t in self.activity_types.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "PreferenceProfile":
+        scores = {int(aid): float(score) for aid, score in state.get("scores", {}).items()}
+        activity_types = {int(aid): t for aid, t in state.get("types", {}).items()}
+        type_totals: Dict[str, Tuple[float, int]] = {}
+        for aid, t in activity_types.items():
+            total, count = type_totals.get(t, (0.0, 0))
+            type_totals[t] = (total + scores.get(aid, 0.0), count + 1)
+        return cls(scores, activity_types, type_totals)
+
+
+_EMPTY = PreferenceProfile()
+
+
+class PreferenceProfiles:
+    """
+    Profiles of every user who voted.
+
+    Not thread-safe for writers: callers serialize updates per user (the vote
+    store holds the user's stripe). Readers get an immutable profile.
+    """
+
+    def __init__(self, activity_type: Optional[Callable[[int], Optional[str]]] = None):
+        self._activity_type = activity_type or (lambda activity_id: None)
+        self._profiles: Dict[int, PreferenceProfile] = {}
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def get(self, user_id: int) -> PreferenceProfile:
+        """The user's profile (empty if they never voted)."""
+        return self._profiles.get(user_id, _EMPTY)
+
+    def apply_vote(self, vote: Dict) -> None:
+        """Fold a score vote into its user's profile, replacing their previous score for the activity."""
+        score = vote.get("score")
+        if score is None:
+            return
+        user_id, activity_id = vote.get("user_id"), vote.get("activity_id")
+        profile = self._profiles.get(user_id, _EMPTY)
+        activity_type = None
+        if activity_id not in profile.scores:
+            activity_type = self._activity_type(activity_id)
+        self._profiles[user_id] = profile.with_score(activity_id, normalize_score(score), activity_type)
+
+    def clear(self) -> None:
+        self._profiles = {}
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-serializable form of every profile."""
+        return {str(uid): profile.to_state() for uid, profile in list(self._profiles.items())}
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Replace every profile with the ones saved by `to_state`."""
+        self._profiles = {int(uid): PreferenceProfile.from_state(s) for uid, s in state.items()}
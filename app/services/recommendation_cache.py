@@ -0,0 +1,158 @@
+"""
+Cache of final personalized recommendation lists.
+
+Entries are keyed by every request input, user first (see
+`recommendation_key`), and record the versions of the inputs the list was
+computed from:
+
+- the user's profile (its feature-cache version),
+- the collaborative scorer: the factor model version when the model knows
+  the user, otherwise every profile (similar users) and the vote store,
+- the admin activity catalog.
+
+A lookup compares those versions with the current ones, so an entry is never
+served once one of its inputs changed, and nothing else invalidates it. The
+weather forecast and Ticketmaster events come from external APIs that
+cannot notify us; entries therefore also expire `external_ttl` seconds after
+they were computed. Profile writes drop the user's entries right away so
+their memory is reclaimed early.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.services import vote_service
+from app.services.config_service import get_config
+from app.services.factor_model import get_model
+from app.services.user_features import (
+    UserFeatures, add_features_listener, get_features_version, get_user_features,
+)
+
+cache_config = get_config().get("recommendations.result_cache", {}) or {}
+RESULT_CACHE_ENABLED = cache_config.get("enabled", True)
+MAX_ENTRIES = cache_config.get("max_entries", 10000)
+EXTERNAL_TTL = cache_config.get("external_ttl", 600)
+
+
+_ADMIN = None
+
+
+def get_catalog_version() -> int:
+    """Version of the admin activity catalog."""
+    global _ADMIN
+    if _ADMIN is None:
+        # Imported late: the admin routes import the services.
+        from app.routes import admin
+        _ADMIN = admin
+    return _ADMIN.admin_activities_version
+
+
+def recommendation_key(
+    user_id: int,
+    city: str,
+    countryCode: str,
+    date: str,
+    weather_preference: Optional[str],
+    max_results: Optional[int],
+) -> Tuple:
+    """Cache key of a recommendation list: the user first, then every request input."""
+    return (user_id, city, countryCode, date, weather_preference, max_results)
+
+
+def recommendation_dependencies(user_id: int) -> Tuple:
+    """Current versions of everything a user's recommendation list depends on."""
+    features = get_user_features(user_id)
+    model = get_model()
+    if model is not None and model.has_user(user_id):
+        scorer = ("model", model.version)
+    else:
+        scorer = ("similar_users", get_features_version(), vote_service.get_vote_version())
+    return (features.version if features else 0, scorer, get_catalog_version())
+
+
+class RecommendationCache:
+    """LRU map of recommendation lists, validated against their dependencies on read."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, external_ttl: float = EXTERNAL_TTL):
+        self.max_entries = max_entries
+        self.external_ttl = external_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        # key -> (dependencies, expires_at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple, float, List[Any]]]" = OrderedDict()
+        self._by_user: Dict[int, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple, dependencies: Tuple) -> Optional[List[Any]]:
+        """
+        The cached list for `key` if it was computed from `dependencies` and has not expired.
+
+        Args:
+            key: (user_id, ...) lookup key
+            dependencies: Current `recommendation_dependencies` of the user
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == dependencies and entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove_locked(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, dependencies: Tuple, value: List[Any]) -> None:
+        """
+        Store a freshly computed list.
+
+        Pass the dependencies read *before* computing it: if an input changed
+        meanwhile, the entry is simply never served.
+        """
+        with self._lock:
+            self._entries[key] = (dependencies, time.monotonic() + self.external_ttl, list(value))
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def _remove_locked(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every entry of one user."""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+
+_CACHE = RecommendationCache()
+
+
+def _on_features_changed(user_id: Optional[int], features: Optional[UserFeatures]) -> None:
+    """Feature-cache listener: a profile changed, its entries can go now."""
+    if user_id is None:
+        _CACHE.clear()
+    else:
+        _CACHE.invalidate_user(user_id)
+
+
+add_features_listener(_on_features_changed)
+
+
+def get_recommendation_cache() -> RecommendationCache:
+    return _CACHE
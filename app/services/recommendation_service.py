@@ -2,11 +2,18 @@ from typing import List, Dict, Optional, Tuple
 from datetime import date
 from app.models.db.user import User
 from app.models.db.activity import Activity, ActivityType
-from app.services.user_service import get_user as get_user_dict
-from app.services.vote_service import list_votes
+from app.services.user_service import get_user as get_user_dict, ensure_loaded
+from app.services.similarity_engine import find_neighbours, find_neighbours_many
+from app.services.config_service import get_config
+from app.services.vote_service import get_user_profile
+from app.services.factor_model import get_model
+import numpy as np
 import math
 from collections import defaultdict
 
+MAX_SIMILAR_USERS = get_config().get("recommendations.max_similar_users", 20)
+TYPE_PREFERENCE_WEIGHT = get_config().get("recommendations.type_preference_weight", 0.5)
+
 
 def calculate_user_similarity(user1: User, user2: User) -> float:
     """
@@ -75,76 +82,113 @@ def _calculate_age(birth_date: date) -> int:
 def get_user_activity_preferences(user_id: int) -> Dict[int, float]:
     """
     Build a preference profile for a user based on their voting history.
-    Returns a dictionary mapping activity IDs to preference scores.
+    Returns a dictionary mapping activity IDs to preference scores (the
+    user's vote scores mapped from 1-10 to 0-1).
+    Reads the profile the vote store maintains, so it costs O(profile size).
     """
-    votes = list_votes()
-    print("All votes: ", votes)
-    preferences = {}
-    total_activities = 0
-
-    user_votes = [v for v in votes if v.get("user_id") == user_id]
-
-    for vote in user_votes:
-        ranking = vote.get("activity_ranking", [])
-        total_activities = max(total_activities, len(ranking))
-
-        for position, activity_id in enumerate(ranking):
-            score = (len(ranking) - position) / len(ranking)
-            if activity_id in preferences:
-                preferences[activity_id] = max(preferences[activity_id], score)
-            else:
-                preferences[activity_id] = score
-
-    return preferences
+    return dict(get_user_profile(user_id).scores)
 
 
 def find_similar_users(
-    user: User, min_similarity: float = 0.3
+    user: User, min_similarity: float = 0.3, limit: int = MAX_SIMILAR_USERS
 ) -> List[Tuple[User, float]]:
     """
-    Find users similar to the given user.
+    Find the users most similar to the given user across the whole user store.
+
+    Similarity is `calculate_user_similarity`, computed in bulk by the
+    similarity engine (over LSH candidates for large user bases); only the
+    top `limit` are loaded as `User` models.
     Returns list of (user, similarity_score) tuples sorted by similarity.
     """
-    similar_users = []
+    ensure_loaded()
+    neighbours = find_neighbours(user, limit, min_similarity=min_similarity, exclude_id=user.id)
+    return _load_similar_users(user, neighbours)
 
-    user_dicts = [get_user_dict(i) for i in range(1, 6) if i != user.id]
-    test_users = [User(**u) if u else None for u in user_dicts]
-    test_users = [u for u in test_users if u is not None]  # Remove None values
-    print("Comparing user id:", user.id, "with test users:", [u.id for u in test_users])
-    for other_user in test_users:
-        if other_user and other_user.id != user.id:
-            similarity = calculate_user_similarity(user, other_user)
-            print("Similarity between user", user.id, "and user", other_user.id, ":", similarity)
-            if similarity >= min_similarity:
-                similar_users.append((other_user, similarity))
-                print("similar_users: ", similar_users)
 
+def find_similar_users_many(
+    users: List[User], min_similarity: float = 0.3, limit: int = MAX_SIMILAR_USERS
+) -> List[List[Tuple[User, float]]]:
+    """
+    `find_similar_users` for several users, scored against the user store as one matrix operation.
+    Returns one list of (user, similarity_score) tuples per user, in order.
+    """
+    ensure_loaded()
+    neighbours = find_neighbours_many(users, limit, min_similarity=min_similarity)
+    return [_load_similar_users(user, found) for user, found in zip(users, neighbours)]
+
+
+def _load_similar_users(user: User, neighbours: List[Tuple[int, float]]) -> List[Tuple[User, float]]:
+    similar_users = []
+    for user_id, similarity in neighbours:
+        record = get_user_dict(user_id)
+        if record:
+            similar_users.append((User(**record), similarity))
     return similar_users
 
 
-def get_collaborative_recommendations(
-    user: User, current_activities: List[Activity], max_recommendations: int = 5
-) -> List[Tuple[Activity, float]]:
+def _similar_users_preferences(
+    user: User,
+    activities: List[Activity],
+    similar_users: Optional[List[Tuple[User, float]]] = None,
+) -> Optional[Dict[int, float]]:
     """
-    Get activity recommendations based on similar users' preferences.
-    Returns list of (activity, score) tuples sorted by score.
+    Best similarity-weighted preference per candidate activity among similar
+    users, or None if there are none.
+
+    A similar user's preference for an activity is their own score for it,
+    or else TYPE_PREFERENCE_WEIGHT times their mean score for its type.
     """
-    similar_users = find_similar_users(user)
+    if similar_users is None:
+        similar_users = find_similar_users(user)
     if not similar_users:
         print("-----------------> No similar users found for user id:", user.id)
-        return []
+        return None
     all_preferences = {}
     for similar_user, similarity in similar_users:
-        user_prefs = get_user_activity_preferences(similar_user.id)
-        print("user_prefs: ", user_prefs)
-        for activity_id, score in user_prefs.items():
+        profile = get_user_profile(similar_user.id)
+        if not len(profile):
+            continue
+        type_scores = profile.type_scores()
+        for activity in activities:
+            score = profile.scores.get(activity.id)
+            if score is None:
+                type_score = type_scores.get(getattr(activity.type, "value", activity.type))
+                if type_score is None:
+                    continue
+                score = TYPE_PREFERENCE_WEIGHT * type_score
             weighted_score = score * similarity
-            if activity_id in all_preferences:
-                all_preferences[activity_id] = max(
-                    all_preferences[activity_id], weighted_score
-                )
-            else:
-                all_preferences[activity_id] = weighted_score
+            if weighted_score > all_preferences.get(activity.id, 0.0):
+                all_preferences[activity.id] = weighted_score
+    return all_preferences
+
+
+def get_collaborative_recommendations(
+    user: User,
+    current_activities: List[Activity],
+    max_recommendations: int = 5,
+    similar_users: Optional[List[Tuple[User, float]]] = None,
+) -> List[Tuple[Activity, float]]:
+    """
+    Get activity recommendations based on similar users' preferences.
+
+    When the trained factor model knows the user, the activities are scored
+    with its predictions (mapped from the 1-10 vote scale to 0-1); otherwise
+    the preferences of similar users are combined on the fly. Pass
+    `similar_users` when they were already found (see find_similar_users_many).
+    Returns list of (activity, score) tuples sorted by score.
+    """
+    model = get_model()
+    if model is not None and model.has_user(user.id):
+        predicted = np.clip((model.predict(user.id, [a.id for a in current_activities]) - 1.0) / 9.0, 0.0, 1.0)
+        all_preferences = {
+            activity.id: float(score)
+            for activity, score in zip(current_activities, predicted)
+            if not np.isnan(score)
+        }
+    else:
+        all_preferences = _similar_users_preferences(user, current_activities, similar_users)
+        if all_preferences is None:
+            return []
 
     scored_activities = []
     for activity in current_activities:
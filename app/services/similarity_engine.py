@@ -0,0 +1,571 @@
+"""
+Vectorized user-user similarity over the whole user store.
+
+Users are encoded once into column arrays, from their cached
+`UserFeatures`: a multi-hot interest matrix plus age, city, country, activity
+preference and gender codes. Scoring a query user against everyone is then a
+handful of NumPy operations, and only the top-k neighbours are turned back
+into `User` models. `get_similarity_index` serves one index for the user
+store that is not rebuilt on every profile write: the users written since it
+was built are hidden from it and scored from a small index of their own
+(see `SimilarityView`). Once they are numerous, or when the date changes
+(ages do), the full index is rebuilt on a background thread while the
+previous one keeps serving.
+
+For large user bases `find_neighbours` does not score everyone: a MinHash
+LSH index (see `lsh_index`) proposes candidates that share interests or the
+city, and only those are scored exactly.
+
+The score is the same weighted blend as
+`recommendation_service.calculate_user_similarity`:
+    3.0  interests (Jaccard)        2.0  age (1 - |diff| / 20, floored at 0)
+    1.5  same city (0.5 if only the country matches)
+    1.0  same indoor/outdoor preference (0.5 if one is 'either')
+    0.5  same gender
+divided by the total weight (8.0).
+"""
+from datetime import date
+from threading import Lock, Thread
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.config_service import get_config
+from app.services.lsh_index import MinHashLSH
+from app.services.user_features import (
+    UserFeatures, add_features_listener, build_features, features_for,
+    get_user_features, list_user_features,
+)
+
+INTEREST_WEIGHT = 3.0
+AGE_WEIGHT = 2.0
+LOCATION_WEIGHT = 1.5
+PREFERENCE_WEIGHT = 1.0
+GENDER_WEIGHT = 0.5
+TOTAL_WEIGHT = INTEREST_WEIGHT + AGE_WEIGHT + LOCATION_WEIGHT + PREFERENCE_WEIGHT + GENDER_WEIGHT
+AGE_SPAN = 20.0
+
+# Code for a missing value; values the index has never seen get UNKNOWN.
+MISSING = -1
+UNKNOWN = -2
+# Upper bound on the (query users x indexed users) scores computed at once.
+_MATRIX_CELLS = 1 << 22
+# The shared index is rebuilt once more users than this (or this share of the
+# index) were written since it was built.
+_REBUILD_MIN_CHANGES = 256
+_REBUILD_FRACTION = 0.05
+
+lsh_config = get_config().get("recommendations.lsh", {}) or {}
+LSH_ENABLED = lsh_config.get("enabled", True)
+# Below this many users an exhaustive scan is exact and fast enough.
+LSH_MIN_USERS = lsh_config.get("min_users", 5000)
+
+
+def _features(user: Any) -> UserFeatures:
+    return user if isinstance(user, UserFeatures) else features_for(user)
+
+
+def _age(features: UserFeatures, today: date) -> float:
+    age = features.age(today)
+    return np.nan if age is None else float(age)
+
+
+class _Codes:
+    """Dense integer codes for the distinct values of one field."""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+
+    def add(self, value: Any) -> int:
+        if not value:
+            return MISSING
+        return self.codes.setdefault(value, len(self.codes))
+
+    def get(self, value: Any) -> int:
+        if not value:
+            return MISSING
+        return self.codes.get(value, UNKNOWN)
+
+
+class UserSimilarityIndex:
+    """Feature matrices for a set of users, scored against one query user at a time."""
+
+    def __init__(self, users: Iterable[Any], today: Optional[date] = None, version: int = 0):
+        """
+        Args:
+            users: `UserFeatures` (or user dicts / `User` models, encoded on the fly)
+            today: Date ages are computed for
+            version: Feature cache version the index was built from
+        """
+        self.today = today or date.today()
+        self.version = version
+        self._interests = _Codes()
+        self._cities = _Codes()
+        self._countries = _Codes()
+        self._preferences = _Codes()
+        self._genders = _Codes()
+
+        ids, rows, ages, cities, countries, preferences, genders = [], [], [], [], [], [], []
+        for user in users:
+            features = user if isinstance(user, UserFeatures) else build_features(user)
+            ids.append(features.id)
+            rows.append([self._interests.add(i) for i in features.interests])
+            ages.append(_age(features, self.today))
+            cities.append(self._cities.add(features.city))
+            countries.append(self._countries.add(features.country))
+            preferences.append(self._preferences.add(features.activity_preference))
+            genders.append(self._genders.add(features.gender))
+
+        self.user_ids = np.array(ids, dtype=np.int64)
+        self._rows = {uid: row for row, uid in enumerate(ids)}
+        self.interests = np.zeros((len(ids), len(self._interests.codes)), dtype=bool)
+        for row, columns in enumerate(rows):
+            self.interests[row, columns] = True
+        self.interest_counts = self.interests.sum(axis=1)
+        self.ages = np.array(ages, dtype=np.float64)
+        self.cities = np.array(cities, dtype=np.int32)
+        self.countries = np.array(countries, dtype=np.int32)
+        self.preferences = np.array(preferences, dtype=np.int32)
+        self.genders = np.array(genders, dtype=np.int32)
+        self._either = self._preferences.get("either")
+        self._interest_matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def rows_for(self, user_ids: Iterable[int]) -> np.ndarray:
+        """Index rows of the given users (unknown ids are skipped)."""
+        rows = [self._rows.get(uid) for uid in user_ids]
+        return np.array(sorted(r for r in rows if r is not None), dtype=np.int64)
+
+    def _profile_keys(self, user: UserFeatures) -> Tuple[Tuple, ...]:
+        """The query fields each of the age, location, preference and gender terms depends on."""
+        return (
+            (user.age(self.today),),
+            (self._cities.get(user.city), self._countries.get(user.country)),
+            (self._preferences.get(user.activity_preference), user.activity_preference == "either"),
+            (self._genders.get(user.gender),),
+        )
+
+    def _age_scores(self, key: Tuple, rows) -> Optional[np.ndarray]:
+        (age,) = key
+        if age is None:
+            return None
+        closeness = 1.0 - np.minimum(np.abs(self.ages[rows] - age) / AGE_SPAN, 1.0)
+        return AGE_WEIGHT * np.nan_to_num(closeness, nan=0.0)
+
+    def _location_scores(self, key: Tuple, rows) -> Optional[np.ndarray]:
+        city, country = key
+        if city == MISSING:
+            return None
+        cities = self.cities[rows]
+        has_city = cities != MISSING
+        same_city = cities == city
+        same_country = (self.countries[rows] == country) if country != MISSING else False
+        return LOCATION_WEIGHT * np.where(
+            has_city & same_city, 1.0, np.where(has_city & same_country, 0.5, 0.0)
+        )
+
+    def _preference_scores(self, key: Tuple, rows) -> Optional[np.ndarray]:
+        preference, either = key
+        if preference == MISSING:
+            return None
+        preferences = self.preferences[rows]
+        has_preference = preferences != MISSING
+        partial = has_preference & (either | (preferences == self._either))
+        return PREFERENCE_WEIGHT * np.where(
+            has_preference & (preferences == preference), 1.0, np.where(partial, 0.5, 0.0)
+        )
+
+    def _gender_scores(self, key: Tuple, rows) -> Optional[np.ndarray]:
+        (gender,) = key
+        if gender == MISSING:
+            return None
+        return GENDER_WEIGHT * (self.genders[rows] == gender)
+
+    def _profile_terms(self):
+        return (self._age_scores, self._location_scores, self._preference_scores, self._gender_scores)
+
+    def similarities(self, user: Any, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Similarity (0-1) of `user` to every indexed user, in index order.
+
+        With `rows`, only those users are scored, in the order given.
+        """
+        if rows is None:
+            rows = slice(None)
+        if not len(self.user_ids[rows]):
+            return np.zeros(0, dtype=np.float64)
+        user = _features(user)
+
+        scores = np.zeros(len(self.user_ids[rows]), dtype=np.float64)
+        for term, key in zip(self._profile_terms(), self._profile_keys(user)):
+            values = term(key, rows)
+            if values is not None:
+                scores += values
+        interests = user.interests
+        if interests:
+            counts = self.interest_counts[rows]
+            columns = [c for c in (self._interests.get(i) for i in interests) if c >= 0]
+            common = self.interests[rows][:, columns].sum(axis=1) if columns else 0
+            union = len(interests) + counts - common
+            with np.errstate(invalid="ignore", divide="ignore"):
+                jaccard = np.where(counts > 0, common / union, 0.0)
+            scores = INTEREST_WEIGHT * jaccard + scores
+
+        return scores / TOTAL_WEIGHT
+
+    def top_k(
+        self,
+        user: Any,
+        k: int,
+        min_similarity: float = 0.0,
+        exclude_id: Optional[int] = None,
+        rows: Optional[np.ndarray] = None,
+        hidden: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        The `k` most similar users (among `rows`, if given).
+
+        Args:
+            hidden: Mask of index rows to leave out
+
+        Returns:
+            List of (user_id, similarity), most similar first (ties by lower id).
+        """
+        scores = self.similarities(user, rows)
+        user_ids = self.user_ids if rows is None else self.user_ids[rows]
+        if hidden is not None and rows is not None:
+            hidden = hidden[rows]
+        return _select_top(scores, user_ids, k, min_similarity, exclude_id, hidden)
+
+    def similarity_matrix(self, users: List[Any]) -> np.ndarray:
+        """
+        Similarities of several query users to every indexed user at once.
+
+        Shared interests are counted with one matrix product. Each other term
+        depends on one or two profile fields with few distinct values (ages are
+        whole years), so it is computed once per distinct value and gathered
+        per user.
+
+        Returns:
+            (len(users) x len(self)) array; row i equals `similarities(users[i])`.
+        """
+        if not len(self) or not users:
+            return np.zeros((len(users), len(self)), dtype=np.float64)
+        queries = [_features(user) for user in users]
+
+        scores = np.zeros((len(queries), len(self)), dtype=np.float64)
+        query_keys = [self._profile_keys(query) for query in queries]
+        for i, term in enumerate(self._profile_terms()):
+            table: Dict[Tuple, int] = {}
+            values: List[np.ndarray] = []
+            key_rows = []
+            for keys in query_keys:
+                row = table.get(keys[i])
+                if row is None:
+                    term_scores = term(keys[i], slice(None))
+                    row = table[keys[i]] = len(values)
+                    values.append(np.zeros(len(self)) if term_scores is None else term_scores)
+                key_rows.append(row)
+            scores += np.stack(values)[key_rows]
+
+        if self._interest_matrix is None:
+            # Float copy for BLAS matrix products; counts stay exact in float32.
+            self._interest_matrix = self.interests.T.astype(np.float32)
+        query_interests = np.zeros((len(queries), self.interests.shape[1]), dtype=np.float32)
+        query_sizes = np.zeros(len(queries), dtype=np.float64)
+        for row, query in enumerate(queries):
+            columns = [c for c in (self._interests.get(i) for i in query.interests) if c >= 0]
+            query_interests[row, columns] = 1.0
+            query_sizes[row] = len(query.interests)
+        with_interests = np.flatnonzero(query_sizes > 0)
+        if len(with_interests):
+            common = (query_interests[with_interests] @ self._interest_matrix).astype(np.float64)
+            union = query_sizes[with_interests, None] + self.interest_counts[None, :] - common
+            with np.errstate(invalid="ignore", divide="ignore"):
+                jaccard = np.where(self.interest_counts[None, :] > 0, common / union, 0.0)
+            scores[with_interests] = INTEREST_WEIGHT * jaccard + scores[with_interests]
+
+        scores /= TOTAL_WEIGHT
+        return scores
+
+    def top_k_many(
+        self,
+        users: List[Any],
+        k: int,
+        min_similarity: float = 0.0,
+        exclude_self: bool = True,
+        hidden: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        `top_k` for several users, scored as one matrix operation per block.
+
+        Args:
+            exclude_self: Leave each query user out of their own neighbours
+            hidden: Mask of index rows to leave out
+
+        Returns:
+            One list of (user_id, similarity) per query user, in order.
+        """
+        results = []
+        block = max(1, _MATRIX_CELLS // max(len(self), 1))
+        for start in range(0, len(users), block):
+            chunk = users[start:start + block]
+            matrix = self.similarity_matrix(chunk)
+            for user, scores in zip(chunk, matrix):
+                exclude_id = _features(user).id if exclude_self else None
+                results.append(_select_top(scores, self.user_ids, k, min_similarity, exclude_id, hidden))
+        return results
+
+
+def _select_top(
+    scores: np.ndarray,
+    user_ids: np.ndarray,
+    k: int,
+    min_similarity: float,
+    exclude_id: Optional[int],
+    hidden: Optional[np.ndarray] = None,
+) -> List[Tuple[int, float]]:
+    """The k best (user_id, score) pairs above `min_similarity`, ties broken by lower id."""
+    eligible = scores >= min_similarity
+    if exclude_id is not None:
+        eligible &= user_ids != exclude_id
+    if hidden is not None:
+        eligible &= ~hidden
+    candidates = np.flatnonzero(eligible)
+    if k <= 0:
+        return []
+    if k < len(candidates):
+        # Partial selection of the k-th best score; keep everything tied with it
+        # so the id tie-break below is exact, then sort only those.
+        kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[scores[candidates] >= kth]
+    order = np.lexsort((user_ids[candidates], -scores[candidates]))[:k]
+    return [(int(user_ids[i]), float(scores[i])) for i in candidates[order]]
+
+
+def _merge_top(first: List[Tuple[int, float]], second: List[Tuple[int, float]], k: int) -> List[Tuple[int, float]]:
+    """The k best of two top-k lists over different users, in top_k order."""
+    if not second:
+        return first
+    return sorted(first + second, key=lambda pair: (-pair[1], pair[0]))[:k]
+
+
+class SimilarityView:
+    """
+    The similarity index as of one state of the feature cache.
+
+    A full `UserSimilarityIndex` built earlier, with the rows of the users
+    written since then hidden, plus a small index of those users' current
+    features. Queries score both and merge the results, so a profile write
+    costs a rebuild of the small index, not of the full one. Read-only.
+    """
+
+    def __init__(self, base: UserSimilarityIndex, changed: Iterable[int], stamp: int):
+        """
+        Args:
+            base: Full index
+            changed: Ids of the users written since `base` was built
+            stamp: Change count the view reflects (see get_similarity_index)
+        """
+        changed = list(changed)
+        self.base = base
+        self.today = base.today
+        self.stamp = stamp
+        self.changes = len(changed)
+        self._hidden: Optional[np.ndarray] = None
+        if changed:
+            self._hidden = np.zeros(len(base), dtype=bool)
+            self._hidden[base.rows_for(changed)] = True
+        current = [f for f in map(get_user_features, changed) if f is not None]
+        self.delta = UserSimilarityIndex(current, today=base.today) if current else None
+
+    def __len__(self) -> int:
+        hidden = int(self._hidden.sum()) if self._hidden is not None else 0
+        return len(self.base) - hidden + (len(self.delta) if self.delta is not None else 0)
+
+    def top_k(
+        self,
+        user: Any,
+        k: int,
+        min_similarity: float = 0.0,
+        exclude_id: Optional[int] = None,
+        candidate_ids: Optional[Iterable[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """`UserSimilarityIndex.top_k` over every user, or only `candidate_ids`."""
+        if candidate_ids is not None:
+            candidate_ids = list(candidate_ids)
+        rows = None if candidate_ids is None else self.base.rows_for(candidate_ids)
+        found = self.base.top_k(user, k, min_similarity, exclude_id, rows=rows, hidden=self._hidden)
+        if self.delta is not None:
+            rows = None if candidate_ids is None else self.delta.rows_for(candidate_ids)
+            found = _merge_top(found, self.delta.top_k(user, k, min_similarity, exclude_id, rows=rows), k)
+        return found
+
+    def top_k_many(self, users: List[Any], k: int, min_similarity: float = 0.0) -> List[List[Tuple[int, float]]]:
+        """`UserSimilarityIndex.top_k_many` over every user (each query user excluded)."""
+        found = self.base.top_k_many(users, k, min_similarity, hidden=self._hidden)
+        if self.delta is None:
+            return found
+        extra = self.delta.top_k_many(users, k, min_similarity)
+        return [_merge_top(a, b, k) for a, b in zip(found, extra)]
+
+
+# Guards the state below. Never held while an index is built.
+_INDEX_LOCK = Lock()
+# Full index and the change count it was built at.
+_BASE: Optional[UserSimilarityIndex] = None
+_BASE_STAMP = 0
+# Feature-cache changes seen so far, and user id -> change count of the last
+# change, for the users written since the full index was built.
+_CHANGES = 0
+_CHANGED: Dict[int, int] = {}
+# Bumped when the whole feature cache is replaced; rebuilds of an older
+# epoch are discarded.
+_EPOCH = 0
+_REBUILDING = False
+_VIEW: Optional[SimilarityView] = None
+
+
+def _rebuild_base() -> None:
+    """Build a full index from the feature cache and swap it in."""
+    global _BASE, _BASE_STAMP, _CHANGED, _VIEW, _REBUILDING
+    with _INDEX_LOCK:
+        epoch, stamp = _EPOCH, _CHANGES
+    try:
+        # Every change counted up to `stamp` is in the cache by now.
+        version, features = list_user_features()
+        base = UserSimilarityIndex(features, today=date.today(), version=version)
+    finally:
+        with _INDEX_LOCK:
+            _REBUILDING = False
+    with _INDEX_LOCK:
+        if epoch != _EPOCH:
+            return
+        _BASE, _BASE_STAMP = base, stamp
+        _CHANGED = {uid: seen for uid, seen in _CHANGED.items() if seen > stamp}
+        _VIEW = None
+
+
+def _start_rebuild() -> None:
+    """Rebuild the full index on a background thread (unless one is running)."""
+    global _REBUILDING
+    with _INDEX_LOCK:
+        if _REBUILDING:
+            return
+        _REBUILDING = True
+    Thread(target=_rebuild_base, name="similarity-index-rebuild", daemon=True).start()
+
+
+def _current_view(build: bool = True) -> Optional[SimilarityView]:
+    """
+    The view of the current feature cache. Without a full index yet, builds
+    one first (or with `build=False`, starts a background build and returns None).
+    """
+    global _VIEW
+    while True:
+        view = _VIEW
+        if view is not None and view.stamp == _CHANGES:
+            break
+        with _INDEX_LOCK:
+            base, stamp, changed = _BASE, _CHANGES, list(_CHANGED)
+        if base is None:
+            if not build:
+                _start_rebuild()
+                return None
+            _rebuild_base()
+            continue
+        view = SimilarityView(base, changed, stamp)
+        with _INDEX_LOCK:
+            if _BASE is base:
+                _VIEW = view
+        break
+    if view.today != date.today() or view.changes > max(_REBUILD_MIN_CHANGES, _REBUILD_FRACTION * len(view.base)):
+        _start_rebuild()
+    return view
+
+
+def get_similarity_index() -> SimilarityView:
+    """
+    The similarity index over all stored users.
+
+    The full index is built from the feature cache once, then reused: a
+    profile write only rebuilds the view's small index of written users. The
+    full index is rebuilt in the background once those are numerous or the
+    date changed.
+    """
+    return _current_view()
+
+
+_LSH = MinHashLSH(num_perm=lsh_config.get("num_perm", 64), bands=lsh_config.get("bands", 16))
+
+
+def _on_features_changed(user_id: Optional[int], features: Optional[UserFeatures]) -> None:
+    """Feature-cache listener keeping the LSH index current and tracking written users."""
+    global _CHANGES, _BASE, _CHANGED, _VIEW, _EPOCH
+    with _INDEX_LOCK:
+        _CHANGES += 1
+        if user_id is None:
+            _BASE, _CHANGED, _VIEW = None, {}, None
+            _EPOCH += 1
+        else:
+            _CHANGED[user_id] = _CHANGES
+    if user_id is None:
+        _LSH.rebuild(list_user_features()[1])
+    elif features is None:
+        _LSH.remove(user_id)
+    else:
+        _LSH.add(features)
+
+
+_LSH.rebuild(list_user_features()[1])
+add_features_listener(_on_features_changed)
+
+
+def find_neighbours(
+    user: Any,
+    k: int,
+    min_similarity: float = 0.0,
+    exclude_id: Optional[int] = None,
+) -> List[Tuple[int, float]]:
+    """
+    The `k` users most similar to `user`.
+
+    Scans every user while there are fewer than `recommendations.lsh.min_users`;
+    beyond that, scores only the LSH candidates (same city, or likely shared
+    interests) with the same exact similarity. Candidates are scored from the
+    shared index; before it was first built they are encoded on the fly while
+    it is built in the background.
+
+    Returns:
+        List of (user_id, similarity), most similar first.
+    """
+    if not LSH_ENABLED or len(_LSH) < LSH_MIN_USERS:
+        return get_similarity_index().top_k(user, k, min_similarity, exclude_id)
+    query = _features(user)
+    candidate_ids = _LSH.candidates(query)
+    view = _current_view(build=False)
+    if view is not None:
+        return view.top_k(query, k, min_similarity, exclude_id, candidate_ids=candidate_ids)
+    candidates = [f for f in map(get_user_features, candidate_ids) if f is not None]
+    return UserSimilarityIndex(candidates).top_k(query, k, min_similarity, exclude_id)
+
+
+def find_neighbours_many(
+    users: List[Any],
+    k: int,
+    min_similarity: float = 0.0,
+) -> List[List[Tuple[int, float]]]:
+    """
+    `find_neighbours` for several users (each one excluded from their own list).
+
+    Below the LSH threshold all users are scored against the store as one
+    matrix operation; above it each user is searched through the LSH index.
+    """
+    if not LSH_ENABLED or len(_LSH) < LSH_MIN_USERS:
+        return get_similarity_index().top_k_many(users, k, min_similarity)
+    return [
+        find_neighbours(user, k, min_similarity, exclude_id=_features(user).id)
+        for user in users
+    ]
@@ -0,0 +1,49 @@
+"""
+Lock striping: a fixed pool of locks shared out by key.
+
+Writers that touch different keys usually hash to different stripes and
+proceed in parallel, while writers to the same key still serialize. Locks
+for several keys are always taken in ascending stripe order, so callers
+holding more than one stripe cannot deadlock each other.
+"""
+from contextlib import contextmanager
+from threading import Lock
+from typing import Hashable, Iterable, Iterator, List
+
+
+class StripedLock:
+    """A pool of `stripes` locks indexed by hash(key)."""
+
+    def __init__(self, stripes: int = 64):
+        self._locks: List[Lock] = [Lock() for _ in range(max(1, stripes))]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def index(self, key: Hashable) -> int:
+        """Stripe number guarding `key`."""
+        return hash(key) % len(self._locks)
+
+    def lock_for(self, key: Hashable) -> Lock:
+        """The lock guarding `key`."""
+        return self._locks[self.index(key)]
+
+    @contextmanager
+    def hold(self, keys: Iterable[Hashable]) -> Iterator[None]:
+        """Hold the stripes of all `keys` (each stripe once, in ascending order)."""
+        indexes = sorted({self.index(key) for key in keys})
+        acquired = []
+        try:
+            for i in indexes:
+                self._locks[i].acquire()
+                acquired.append(self._locks[i])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    @contextmanager
+    def hold_all(self) -> Iterator[None]:
+        """Hold every stripe, e.g. to reset the whole store."""
+        with self.hold(range(len(self._locks))):
+            yield
@@ -0,0 +1,346 @@
+"""
+Trending activities from time-bucketed, exponentially decayed vote counters.
+
+Every vote is stamped with `created_at` at ingestion. Within a window, votes
+are weighted by 0.5 ** (age / half_life), with the half-life a fraction of
+the window, so recent votes count most.
+
+The windows of `votes.trending.tracked_windows` are maintained as votes
+arrive (see `_WindowTracker`): each activity keeps its decayed total for the
+window, the votes leaving the window are subtracted bucket by bucket, and a
+heap keeps the activities ordered, so a query reads about `limit` entries.
+
+Any other window is answered from two ring buffers per activity, per-minute
+buckets covering the last hour and per-hour buckets covering the last week,
+shared in one NumPy matrix per ring: one vectorized pass over
+(activities x buckets), never over history, but O(activities) per query.
+"""
+import re
+import heapq
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services import vote_service
+from app.services.config_service import get_config
+
+trending_config = get_config().get("votes.trending", {}) or {}
+HALF_LIFE_FRACTION = trending_config.get("half_life_fraction", 0.25)
+DEFAULT_WINDOW = trending_config.get("default_window", "1h")
+TRACKED_WINDOWS = trending_config.get("tracked_windows", ["15m", "1h", "24h", "7d"])
+
+_WINDOW_PATTERN = re.compile(r"^(\d+)([mhd])$")
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(window: str) -> int:
+    """
+    Parse a window like '15m', '1h', '24h' or '7d' into seconds.
+
+    Raises:
+        ValueError: If the format is invalid or the window is longer than a week
+    """
+    match = _WINDOW_PATTERN.match(window.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid window '{window}', expected e.g. '15m', '1h' or '7d'")
+    seconds = int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    if seconds > TrendingCounters.HOUR_SLOTS * 3600:
+        raise ValueError(f"Window '{window}' is longer than the 7 day trending history")
+    return seconds
+
+
+def _timestamp(vote: Dict) -> Optional[float]:
+    created_at = vote.get("created_at")
+    if not created_at:
+        return None
+    try:
+        return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class _Ring:
+    """Ring of fixed-width time buckets for every activity row."""
+
+    def __init__(self, bucket_seconds: int, slots: int, capacity: int):
+        self.bucket_seconds = bucket_seconds
+        self.slots = slots
+        self.counts = np.zeros((capacity, slots), dtype=np.float64)
+        # Absolute bucket number each slot currently holds (-1 = empty).
+        self.stamps = np.full((capacity, slots), -1, dtype=np.int64)
+
+    def grow(self, capacity: int) -> None:
+        counts = np.zeros((capacity, self.slots), dtype=np.float64)
+        stamps = np.full((capacity, self.slots), -1, dtype=np.int64)
+        rows = self.counts.shape[0]
+        counts[:rows] = self.counts
+        stamps[:rows] = self.stamps
+        self.counts, self.stamps = counts, stamps
+
+    def add(self, row: int, ts: float) -> None:
+        bucket = int(ts // self.bucket_seconds)
+        slot = bucket % self.slots
+        if self.stamps[row, slot] != bucket:
+            if self.stamps[row, slot] > bucket:
+                return  # older than the ring's span
+            self.stamps[row, slot] = bucket
+            self.counts[row, slot] = 0.0
+        self.counts[row, slot] += 1.0
+
+    def window(self, rows: int, now: float, seconds: int, half_life: float):
+        """Return (decayed score, raw count) per row for the last `seconds`."""
+        current = int(now // self.bucket_seconds)
+        span = max(1, -(-seconds // self.bucket_seconds))
+        stamps = self.stamps[:rows]
+        age_buckets = current - stamps
+        live = (age_buckets >= 0) & (age_buckets < span)
+        ages = np.maximum(now - (stamps + 0.5) * self.bucket_seconds, 0.0)
+        weights = np.where(live, 0.5 ** (ages / half_life), 0.0)
+        counts = self.counts[:rows]
+        return (counts * weights).sum(axis=1), np.where(live, counts, 0.0).sum(axis=1)
+
+
+class _WindowTracker:
+    """
+    Decayed vote totals of every activity over one window, kept current per vote.
+
+    A vote at time t adds 2 ** ((t - origin) / half_life) to its activity's
+    total; the score at `now` is the total times 2 ** ((origin - now) / half_life).
+    That factor is the same for every activity, so totals rank activities
+    without being decayed on each query. Votes are grouped in buckets (minutes
+    for windows up to an hour, hours beyond) and a bucket's weights and counts
+    are subtracted once it leaves the window. A heap of (-total, activity,
+    stamp) entries holds the order; entries of earlier totals are skipped.
+
+    Not thread-safe: TrendingCounters serializes access.
+    """
+
+    # Re-anchor the weights before they grow past 2 ** REBASE_EXPONENT.
+    REBASE_EXPONENT = 512
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.half_life = max(seconds * HALF_LIFE_FRACTION, 1.0)
+        self.bucket_seconds = 60 if seconds <= 3600 else 3600
+        self.span = max(1, -(-seconds // self.bucket_seconds))
+        self._origin: Optional[float] = None
+        self._current = None  # newest bucket seen (votes or queries)
+        # bucket -> activity_id -> [votes, weight]
+        self._buckets: Dict[int, Dict[int, List[float]]] = {}
+        self._bucket_heap: List[int] = []
+        self._totals: Dict[int, float] = {}
+        self._counts: Dict[int, int] = {}
+        self._stamps: Dict[int, int] = {}
+        self._heap: List[Tuple[float, int, int]] = []
+        self._stamp = 0
+
+    def _touch(self, activity_id: int) -> None:
+        """Queue the activity's new total in the heap."""
+        self._stamp += 1
+        if self._counts.get(activity_id):
+            self._stamps[activity_id] = self._stamp
+            heapq.heappush(self._heap, (-self._totals[activity_id], activity_id, self._stamp))
+        else:
+            self._totals.pop(activity_id, None)
+            self._counts.pop(activity_id, None)
+            self._stamps.pop(activity_id, None)
+        if len(self._heap) > 2 * len(self._stamps) + 64:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(-self._totals[aid], aid, stamp) for aid, stamp in self._stamps.items()]
+        heapq.heapify(self._heap)
+
+    def _rebase(self, origin: float) -> None:
+        """Re-anchor every weight at `origin` (the order is unchanged)."""
+        factor = 2.0 ** ((self._origin - origin) / self.half_life)
+        self._origin = origin
+        self._totals = {aid: total * factor for aid, total in self._totals.items()}
+        for bucket in self._buckets.values():
+            for entry in bucket.values():
+                entry[1] *= factor
+        self._rebuild_heap()
+
+    def _advance(self, ts: float) -> None:
+        """Move the window forward to `ts`, subtracting the buckets that left it."""
+        bucket = int(ts // self.bucket_seconds)
+        if self._current is not None and bucket <= self._current:
+            return
+        self._current = bucket
+        oldest = bucket - self.span
+        while self._bucket_heap and self._bucket_heap[0] <= oldest:
+            expired = self._buckets.pop(heapq.heappop(self._bucket_heap))
+            for activity_id, (votes, weight) in expired.items():
+                self._counts[activity_id] -= int(votes)
+                self._totals[activity_id] -= weight
+                self._touch(activity_id)
+
+    def record(self, activity_id: int, ts: float) -> None:
+        if self._origin is None:
+            self._origin = ts
+        elif (ts - self._origin) / self.half_life > self.REBASE_EXPONENT:
+            self._rebase(ts)
+        self._advance(ts)
+        bucket = int(ts // self.bucket_seconds)
+        if bucket <= self._current - self.span:
+            return  # already outside the window
+        entries = self._buckets.get(bucket)
+        if entries is None:
+            entries = self._buckets[bucket] = {}
+            heapq.heappush(self._bucket_heap, bucket)
+        weight = 2.0 ** ((ts - self._origin) / self.half_life)
+        entry = entries.setdefault(activity_id, [0, 0.0])
+        entry[0] += 1
+        entry[1] += weight
+        self._counts[activity_id] = self._counts.get(activity_id, 0) + 1
+        self._totals[activity_id] = self._totals.get(activity_id, 0.0) + weight
+        self._touch(activity_id)
+
+    def top(self, limit: int, now: float) -> List[Dict]:
+        self._advance(now)
+        found: List[Tuple[float, int, int]] = []
+        while self._heap and len(found) < limit:
+            entry = heapq.heappop(self._heap)
+            if self._stamps.get(entry[1]) == entry[2]:
+                found.append(entry)
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        scale = 2.0 ** ((self._origin - now) / self.half_life) if found else 0.0
+        return [
+            {
+                "activity_id": activity_id,
+                "trend_score": round(-neg_total * scale, 3),
+                "votes": self._counts[activity_id],
+            }
+            for neg_total, activity_id, _ in found
+        ]
+
+
+class TrendingCounters:
+    """Per-activity minute and hour rings shared in NumPy matrices, plus trackers of the common windows."""
+
+    MINUTE_SLOTS = 60
+    HOUR_SLOTS = 168
+
+    def __init__(self, initial_capacity: int = 64, tracked_windows: Optional[List[str]] = None):
+        self._lock = Lock()
+        self._rows: Dict[int, int] = {}
+        self._activity_ids: List[int] = []
+        self._capacity = initial_capacity
+        self._minutes = _Ring(60, self.MINUTE_SLOTS, initial_capacity)
+        self._hours = _Ring(3600, self.HOUR_SLOTS, initial_capacity)
+        if tracked_windows is None:
+            tracked_windows = list(TRACKED_WINDOWS) + [DEFAULT_WINDOW]
+        self._tracked_seconds = sorted({parse_window(w) for w in tracked_windows})
+        self._trackers = {seconds: _WindowTracker(seconds) for seconds in self._tracked_seconds}
+
+    def _row(self, activity_id: int) -> int:
+        row = self._rows.get(activity_id)
+        if row is None:
+            row = len(self._activity_ids)
+            if row >= self._capacity:
+                self._capacity *= 2
+                self._minutes.grow(self._capacity)
+                self._hours.grow(self._capacity)
+            self._rows[activity_id] = row
+            self._activity_ids.append(activity_id)
+        return row
+
+    def record(self, activity_id: int, ts: float) -> None:
+        """Count one vote for `activity_id` cast at epoch seconds `ts`."""
+        with self._lock:
+            row = self._row(activity_id)
+            self._minutes.add(row, ts)
+            self._hours.add(row, ts)
+            for tracker in self._trackers.values():
+                tracker.record(activity_id, ts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows = {}
+            self._activity_ids = []
+            self._minutes = _Ring(60, self.MINUTE_SLOTS, self._capacity)
+            self._hours = _Ring(3600, self.HOUR_SLOTS, self._capacity)
+            self._trackers = {seconds: _WindowTracker(seconds) for seconds in self._tracked_seconds}
+
+    def top(self, window_seconds: int, limit: int = 10, now: Optional[float] = None) -> List[Dict]:
+        """
+        Rank activities by decayed vote count over the last `window_seconds`.
+
+        Tracked windows read about `limit` entries; others scan the rings.
+
+        Returns:
+            List of {activity_id, trend_score, votes}, hottest first.
+        """
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        tracker = self._trackers.get(window_seconds)
+        if tracker is not None:
+            with self._lock:
+                return tracker.top(limit, now)
+        return self.scan(window_seconds, limit, now)
+
+    def scan(self, window_seconds: int, limit: int = 10, now: Optional[float] = None) -> List[Dict]:
+        """`top` computed from the rings, for any window: O(activities x buckets)."""
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        ring = self._minutes if window_seconds <= 3600 else self._hours
+        half_life = max(window_seconds * HALF_LIFE_FRACTION, 1.0)
+        with self._lock:
+            rows = len(self._activity_ids)
+            if rows == 0:
+                return []
+            scores, counts = ring.window(rows, now, window_seconds, half_life)
+            activity_ids = list(self._activity_ids)
+        top_rows = heapq.nlargest(
+            limit, (row for row in range(rows) if counts[row] > 0), key=lambda row: scores[row]
+        )
+        return [
+            {
+                "activity_id": activity_ids[row],
+                "trend_score": round(float(scores[row]), 3),
+                "votes": int(counts[row]),
+            }
+            for row in top_rows
+        ]
+
+
+_COUNTERS = TrendingCounters()
+
+
+def _on_vote(vote: Optional[Dict]) -> None:
+    """Vote-store listener keeping the counters current."""
+    if vote is None:
+        _COUNTERS.clear()
+        return
+    ts = _timestamp(vote)
+    if ts is not None:
+        _COUNTERS.record(vote.get("activity_id"), ts)
+
+
+def _rebuild() -> None:
+    """Count the votes already in the store (e.g. recovered from the vote log)."""
+    _COUNTERS.clear()
+    for vote in vote_service.list_votes():
+        _on_vote(vote)
+
+
+_rebuild()
+vote_service.add_vote_listener(_on_vote)
+
+
+def get_trending_activities(window: str = DEFAULT_WINDOW, limit: int = 10) -> List[Dict]:
+    """
+    Get the activities with the most recent votes.
+
+    Args:
+        window: Time window such as '15m', '1h', '24h' or '7d' (at most 7 days)
+        limit: Maximum number of activities to return
+
+    Returns:
+        List of {activity_id, trend_score, votes}, hottest first.
+
+    Raises:
+        ValueError: If the window is invalid
+    """
+    return _COUNTERS.top(parse_window(window), limit)
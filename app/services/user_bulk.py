@@ -0,0 +1,106 @@
+"""
+Streaming bulk import and export of users as NDJSON (one JSON object per line).
+
+Import validates each line as a `UserCreate` and creates the valid users in
+batches of `users.bulk.batch_size`, each batch with one block of ids (see
+`user_service.create_users`). Only the current batch and the first
+`users.bulk.max_errors` errors are kept in memory, so files of any size can
+be imported.
+
+Export writes every user from one consistent snapshot of the store, one line
+at a time.
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+from pydantic import ValidationError
+
+from app.models.db.user import UserCreate
+from app.services import user_service
+from app.services.config_service import get_config
+
+bulk_config = get_config().get("users.bulk", {}) or {}
+BATCH_SIZE = bulk_config.get("batch_size", 1000)
+MAX_ERRORS = bulk_config.get("max_errors", 100)
+
+
+class UserImporter:
+    """Feeds NDJSON lines into the user store batch by batch."""
+
+    def __init__(self, batch_size: int = BATCH_SIZE, max_errors: int = MAX_ERRORS):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.lines = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.first_id = None
+        self.last_id = None
+        self._batch: List[Dict[str, Any]] = []
+
+    def _reject(self, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": self.lines, "error": error})
+
+    def add_line(self, line: Union[str, bytes]) -> None:
+        """Validate one line (blank lines are skipped) and create the batch once it is full."""
+        self.lines += 1
+        if not line.strip():
+            return
+        try:
+            user = UserCreate.model_validate(json.loads(line))
+        except ValueError as e:
+            # json.JSONDecodeError and pydantic's ValidationError are both ValueErrors.
+            message = e.errors()[0]["msg"] if isinstance(e, ValidationError) else f"Invalid JSON: {e}"
+            self._reject(message)
+            return
+        self._batch.append(user.model_dump(mode="json"))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def add_lines(self, lines: Iterable[Union[str, bytes]]) -> None:
+        """Feed several lines (e.g. one chunk of an upload) to `add_line`."""
+        for line in lines:
+            self.add_line(line)
+
+    def flush(self) -> None:
+        """Create the users validated so far."""
+        if not self._batch:
+            return
+        ids = user_service.create_users(self._batch)
+        self._batch = []
+        self.imported += len(ids)
+        if self.first_id is None:
+            self.first_id = ids[0]
+        self.last_id = ids[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "lines": self.lines,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "first_id": self.first_id,
+            "last_id": self.last_id,
+            "errors": self.errors,
+        }
+
+
+def import_users(lines: Iterable[Union[str, bytes]], batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Import users from NDJSON lines (e.g. an open file).
+
+    Returns:
+        Summary with the number of lines, imported and rejected users, the
+        range of ids given to the imported users and the first errors.
+    """
+    importer = UserImporter(batch_size=batch_size)
+    importer.add_lines(lines)
+    importer.flush()
+    return importer.summary()
+
+
+def export_users() -> Iterator[str]:
+    """Every user as an NDJSON line, sorted by id, from one snapshot of the store."""
+    for user in user_service.iter_users_snapshot():
+        yield json.dumps(user, separators=(",", ":"), default=str) + "\n"
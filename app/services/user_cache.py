@@ -0,0 +1,126 @@
+"""
+Memory-bounded hot tier of user records in front of the durable user store.
+
+Users are spread over shards by id; each shard is an LRU map holding at most
+`max_entries / shards` records, and inserting past that evicts the least
+recently used one. Evicted users stay in the cold tier (the SQLite
+`UserStore`) and `user_service` loads them back on the next read, so the
+memory held by profiles stays bounded however many users sign up.
+
+This bounds the profiles only. The derived per-user state used to search
+users without touching SQLite (the feature cache, the city/interest
+postings, the MinHash LSH buckets and the similarity index) still has an
+entry for every user and grows linearly; it is kept compact instead (see
+`scripts/benchmarks/bench_user_cache.py` for the bytes per user).
+
+Records are kept compact: the values of a user dict in a tuple, next to a
+tuple of its keys that is shared by every record with the same fields
+(most users have the same ones). Reads rebuild a fresh dict.
+
+Without a cold tier (`max_entries=None`) nothing is ever evicted.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Interned key tuples, shared by all records with the same fields.
+_KEYS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def pack(user: Dict[str, Any]) -> Tuple[Tuple[str, ...], Tuple[Any, ...]]:
+    """Compact form of a user dict (list values become tuples)."""
+    keys = tuple(user)
+    keys = _KEYS.setdefault(keys, keys)
+    return keys, tuple(tuple(v) if isinstance(v, list) else v for v in user.values())
+
+
+def unpack(record: Tuple[Tuple[str, ...], Tuple[Any, ...]]) -> Dict[str, Any]:
+    keys, values = record
+    return {k: list(v) if isinstance(v, tuple) else v for k, v in zip(keys, values)}
+
+
+class UserCache:
+    """Sharded LRU of compact user records with hit, miss and eviction counters."""
+
+    def __init__(self, max_entries: Optional[int] = None, shards: int = 64):
+        self.max_entries = max_entries
+        self._per_shard = None if max_entries is None else max(1, -(-max_entries // shards))
+        self._locks = [Lock() for _ in range(shards)]
+        self._shards: List["OrderedDict[int, Tuple]"] = [OrderedDict() for _ in range(shards)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def _index(self, user_id: int) -> int:
+        return user_id % len(self._shards)
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """A fresh dict of the cached user, or None on a miss."""
+        i = self._index(user_id)
+        with self._locks[i]:
+            record = self._shards[i].get(user_id)
+            if record is None:
+                self.misses += 1
+                return None
+            self._shards[i].move_to_end(user_id)
+            self.hits += 1
+        return unpack(record)
+
+    def put(self, user: Dict[str, Any], loaded: bool = False) -> None:
+        """
+        Cache a user.
+
+        Args:
+            user: The user as written, or as read from the cold tier
+            loaded: The user was read from the cold tier; a record cached
+                meanwhile is newer and is kept
+        """
+        user_id = int(user["id"])
+        record = pack(user)
+        i = self._index(user_id)
+        with self._locks[i]:
+            shard = self._shards[i]
+            if loaded:
+                self.loads += 1
+                if user_id in shard:
+                    return
+            shard[user_id] = record
+            shard.move_to_end(user_id)
+            if self._per_shard is not None:
+                while len(shard) > self._per_shard:
+                    shard.popitem(last=False)
+                    self.evictions += 1
+
+    def remove(self, user_id: int) -> None:
+        i = self._index(user_id)
+        with self._locks[i]:
+            self._shards[i].pop(user_id, None)
+
+    def clear(self) -> None:
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                shard.clear()
+
+    def users(self) -> Iterator[Dict[str, Any]]:
+        """Every cached user (all users when nothing is ever evicted)."""
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                records = list(shard.values())
+            for record in records:
+                yield unpack(record)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "loads": self.loads,
+        }
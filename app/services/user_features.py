@@ -0,0 +1,181 @@
+"""
+Per-user feature cache for similarity and activity filtering.
+
+Derived profile features (interest sets, lowercased city and country, parsed
+birth date) are computed once when a user is loaded, created or updated in
+`user_service`, instead of on every similarity evaluation. Each entry is
+stamped with the cache version at which it was built, and the version is
+bumped on every profile write, so derived results know when they are
+stale. Structures kept current per write (such as the LSH and similarity
+indexes) register a listener instead.
+"""
+import sys
+from datetime import date, datetime
+from threading import Lock
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class UserFeatures(NamedTuple):
+    """Precomputed, immutable features of one user profile."""
+    id: int
+    interests: FrozenSet[str]
+    interests_lower: Tuple[str, ...]
+    birth_date: Optional[date]
+    city: Optional[str]
+    country: Optional[str]
+    activity_preference: Optional[str]
+    gender: Optional[str]
+    updated_at: Optional[datetime]
+    version: int
+
+    def age(self, today: date) -> Optional[int]:
+        """Age in whole years on `today`, or None without a birth date."""
+        if self.birth_date is None:
+            return None
+        born = self.birth_date
+        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+_LOCK = Lock()
+_FEATURES: Dict[int, UserFeatures] = {}
+_VERSION = 0
+# Called after every change with (user_id, features), features being None when
+# the user was deleted, or with (None, None) after the whole cache was replaced.
+_LISTENERS: List[Callable[[Optional[int], Optional[UserFeatures]], None]] = []
+
+
+def _notify(user_id: Optional[int], features: Optional[UserFeatures]) -> None:
+    """Tell listeners about a change. Must be called without holding _LOCK."""
+    for callback in list(_LISTENERS):
+        try:
+            callback(user_id, features)
+        except Exception as e:
+            print(f"User features listener {callback} failed: {e}")
+
+
+def add_features_listener(callback: Callable[[Optional[int], Optional[UserFeatures]], None]) -> None:
+    """Register a callback run after every change to the feature cache."""
+    if callback not in _LISTENERS:
+        _LISTENERS.append(callback)
+
+
+def remove_features_listener(callback: Callable[[Optional[int], Optional[UserFeatures]], None]) -> None:
+    """Unregister a callback added with add_features_listener."""
+    if callback in _LISTENERS:
+        _LISTENERS.remove(callback)
+
+
+def _field(user: Any, name: str) -> Any:
+    """Read a field from a user dict or a `User` model."""
+    if isinstance(user, dict):
+        return user.get(name)
+    return getattr(user, name, None)
+
+
+def _shared(value: Any) -> Any:
+    """Interned copy of a string, so the many users with the same city or interest share one."""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return None
+
+
+def build_features(user: Any, version: int = 0) -> UserFeatures:
+    """Compute the features of a user dict or `User` model."""
+    raw_interests = _field(user, "interests") or []
+    city = _field(user, "city")
+    country = _field(user, "country")
+    return UserFeatures(
+        id=int(_field(user, "id") or 0),
+        interests=frozenset(_shared(i) for i in raw_interests),
+        interests_lower=tuple(_shared(i.lower()) for i in raw_interests),
+        birth_date=_parse_date(_field(user, "birth_date")),
+        city=_shared(city.lower()) if city else None,
+        country=_shared(country.lower()) if country else None,
+        activity_preference=_shared(_field(user, "activity_preference")) or None,
+        gender=_shared(_field(user, "gender")) or None,
+        updated_at=_parse_datetime(_field(user, "updated_at")),
+        version=version,
+    )
+
+
+def reset_user_features(users: Iterable[Dict[str, Any]]) -> None:
+    """Replace the whole cache, e.g. after (re)loading the user store."""
+    global _FEATURES, _VERSION
+    with _LOCK:
+        _VERSION += 1
+        _FEATURES = {int(u["id"]): build_features(u, _VERSION) for u in users}
+    _notify(None, None)
+
+
+def put_user_features(user: Dict[str, Any]) -> UserFeatures:
+    """(Re)build the features of a created or updated user."""
+    global _VERSION
+    with _LOCK:
+        _VERSION += 1
+        features = build_features(user, _VERSION)
+        _FEATURES[features.id] = features
+    _notify(features.id, features)
+    return features
+
+
+def remove_user_features(user_id: int) -> None:
+    """Drop the features of a deleted user."""
+    global _VERSION
+    with _LOCK:
+        if _FEATURES.pop(int(user_id), None) is None:
+            return
+        _VERSION += 1
+    _notify(int(user_id), None)
+
+
+def get_features_version() -> int:
+    """Increases on every profile write."""
+    return _VERSION
+
+
+def get_user_features(user_id: int) -> Optional[UserFeatures]:
+    """Cached features of a stored user, or None."""
+    return _FEATURES.get(int(user_id))
+
+
+def list_user_features() -> Tuple[int, List[UserFeatures]]:
+    """(version, features of every stored user) as one consistent view."""
+    with _LOCK:
+        return _VERSION, list(_FEATURES.values())
+
+
+def features_for(user: Any) -> UserFeatures:
+    """
+    Features of a user dict or `User` model.
+
+    Uses the cache when it holds the same revision of the profile (same id and
+    `updated_at`), and computes them otherwise.
+    """
+    user_id = _field(user, "id")
+    cached = _FEATURES.get(user_id) if user_id is not None else None
+    if cached is not None and cached.updated_at is not None:
+        if cached.updated_at == _parse_datetime(_field(user, "updated_at")):
+            return cached
+    return build_features(user)
@@ -0,0 +1,159 @@
+"""
+In-memory inverted indexes over stored users by city and by interest.
+
+Targeting questions such as "users in Paris who like music" are answered
+with set operations on these posting sets instead of scanning every user.
+City names and interests are compared case-insensitively.
+
+The index follows the user feature cache: `create_user`, `update_user` and
+`delete_user` update it through the feature-cache listener, and it is
+rebuilt when the store is reloaded.
+"""
+import sys
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.user_features import UserFeatures, add_features_listener, list_user_features
+
+
+def normalize(value: str) -> str:
+    """Key of a city or interest in the index."""
+    return value.strip().lower()
+
+
+class UserIndex:
+    """Posting sets of user ids per city and per interest."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._by_city: Dict[str, Set[int]] = defaultdict(set)
+        self._by_interest: Dict[str, Set[int]] = defaultdict(set)
+        # user_id -> (city, interests) as indexed, to find the postings again.
+        # Kept compact: interned strings (shared by every user with the same
+        # city or interest) in a tuple rather than a set per user.
+        self._entries: Dict[int, Tuple[Optional[str], Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[int]], key: str, user_id: int) -> None:
+        members = postings.get(key)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del postings[key]
+
+    def _remove_locked(self, user_id: int) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        city, interests = entry
+        if city is not None:
+            self._discard(self._by_city, city, user_id)
+        for interest in interests:
+            self._discard(self._by_interest, interest, user_id)
+
+    def add(self, features: UserFeatures) -> None:
+        """Index (or re-index) one user."""
+        city = sys.intern(normalize(features.city)) if features.city else None
+        interests = tuple({sys.intern(normalize(i)) for i in features.interests_lower})
+        with self._lock:
+            self._remove_locked(features.id)
+            if city:
+                self._by_city[city].add(features.id)
+            for interest in interests:
+                self._by_interest[interest].add(features.id)
+            self._entries[features.id] = (city, interests)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            self._remove_locked(user_id)
+
+    def rebuild(self, features: Iterable[UserFeatures]) -> None:
+        """Replace the whole index."""
+        with self._lock:
+            self._by_city = defaultdict(set)
+            self._by_interest = defaultdict(set)
+            self._entries = {}
+        for f in features:
+            self.add(f)
+
+    def query(
+        self,
+        city: Optional[str] = None,
+        interests: Optional[Iterable[str]] = None,
+        match_all: bool = True,
+    ) -> Set[int]:
+        """
+        Ids of the users in `city` with the given interests.
+
+        Args:
+            city: Only users in this city (None for any city)
+            interests: Only users with every one of these interests, or with
+                any of them when `match_all` is False (None for no constraint)
+            match_all: Intersect (True) or unite (False) the interest postings
+
+        Returns:
+            A new set the caller may modify.
+        """
+        with self._lock:
+            postings: List[Set[int]] = []
+            if city is not None:
+                postings.append(self._by_city.get(normalize(city), set()))
+            if interests is not None:
+                keys = {normalize(i) for i in interests}
+                by_interest = [self._by_interest.get(key, set()) for key in keys]
+                if match_all:
+                    postings.extend(by_interest)
+                else:
+                    postings.append(set().union(*by_interest))
+            if not postings:
+                return set(self._entries)
+            # Start from the smallest posting set so every step is cheap.
+            postings.sort(key=len)
+            found = set(postings[0])
+            for members in postings[1:]:
+                if not found:
+                    break
+                found &= members
+            return found
+
+    def city_count(self, city: str) -> int:
+        with self._lock:
+            return len(self._by_city.get(normalize(city), ()))
+
+    def interest_count(self, interest: str) -> int:
+        with self._lock:
+            return len(self._by_interest.get(normalize(interest), ()))
+
+
+_INDEX = UserIndex()
+
+
+def _on_features_changed(user_id: Optional[int], features: Optional[UserFeatures]) -> None:
+    """Feature-cache listener keeping the index current."""
+    if user_id is None:
+        _INDEX.rebuild(list_user_features()[1])
+    elif features is None:
+        _INDEX.remove(user_id)
+    else:
+        _INDEX.add(features)
+
+
+_INDEX.rebuild(list_user_features()[1])
+add_features_listener(_on_features_changed)
+
+
+def query_user_ids(
+    city: Optional[str] = None,
+    interests: Optional[Iterable[str]] = None,
+    match_all: bool = True,
+) -> Set[int]:
+    """Ids of stored users matching `city` and `interests` (see UserIndex.query)."""
+    return _INDEX.query(city, interests, match_all)
+
+
+def get_user_index() -> UserIndex:
+    return _INDEX
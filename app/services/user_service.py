@@ -1,42 +1,113 @@
+import atexit
 import json
+import os
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from threading import Lock
 from datetime import datetime, timezone
+from app.services.config_service import get_config
+from app.services.striped_lock import StripedLock
+from app.services.user_cache import UserCache
+from app.services.user_features import put_user_features, remove_user_features, reset_user_features
+from app.services.user_index import query_user_ids
+from app.services.user_store import UserStore
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "users.json"
 
+LOCK_STRIPES = get_config().get("users.lock_stripes", 64)
+storage_config = get_config().get("users.storage", {}) or {}
+cache_config = get_config().get("users.cache", {}) or {}
+
+# Writers hold the user's stripe while they update the cache, the feature
+# cache and the durable store, so all three see each user's writes in order.
+# Readers that miss the cache take the stripe too while they load the user
+# from the durable store, so they never cache a stale copy.
+_STRIPES = StripedLock(LOCK_STRIPES)
+# Guards loading and id allocation only.
 _LOCK = Lock()
-_STORE: Dict[int, Dict[str, Any]] = {}
 _NEXT_ID = 1
 _INITIAL_LOADED = False
 
 
+def _open_store() -> Optional[UserStore]:
+    """Open the durable user store from config; USER_STORE_PATH overrides the path."""
+    if not storage_config.get("enabled", False):
+        return None
+    path = Path(os.getenv("USER_STORE_PATH") or storage_config.get("path", "app/data/users.db"))
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[2] / path
+    return UserStore(
+        path,
+        flush_interval=storage_config.get("flush_interval_ms", 50) / 1000.0,
+        batch_size=storage_config.get("batch_size", 1000),
+    )
+
+
+# Every write is handed to the store after it is published in memory, while
+# the user's stripe is held, so the store sees each user's writes in order.
+_STORE = _open_store()
+if _STORE is not None:
+    atexit.register(_STORE.close)
+
+# Hot tier of user records. With a durable store it is bounded and misses are
+# loaded from the store; without one it is the only copy, so it is unbounded.
+_CACHE = UserCache(
+    cache_config.get("max_entries", 100000) if _STORE is not None else None,
+    shards=LOCK_STRIPES,
+)
+
+
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def _load_initial() -> None:
-    """Load users from JSON once into the in-memory store."""
-    global _STORE, _NEXT_ID, _INITIAL_LOADED
+def _read_seed() -> List[Dict[str, Any]]:
     with open(DATA_PATH, "r", encoding="utf-8") as f:
-        users = json.load(f)
-    store: Dict[int, Dict[str, Any]] = {}
+        return json.load(f)
+
+
+def _load_initial(from_seed: bool = False) -> None:
+    """
+    Load users: from the durable store when it has any, otherwise (or with
+    `from_seed`) from the JSON seed, which then replaces the durable store's
+    contents. Users are streamed into the feature cache; the user cache keeps
+    as many as fit.
+    """
+    global _NEXT_ID, _INITIAL_LOADED
+    if _STORE is not None and not from_seed and _STORE.count():
+        users = _STORE.iter_all()
+        print(f"Loading users from {_STORE.path}")
+    else:
+        users = _read_seed()
+        if _STORE is not None:
+            _STORE.replace_all(users)
     max_id = 0
-    for u in users:
-        uid = int(u.get("id"))
-        store[uid] = u.copy()
-        if uid > max_id:
-            max_id = uid
-    with _LOCK:
-        _STORE = store
+
+    def warm(users):
+        nonlocal max_id
+        room = _CACHE.max_entries
+        for u in users:
+            max_id = max(max_id, int(u["id"]))
+            if room is None or room > 0:
+                _CACHE.put(u)
+                room = None if room is None else room - 1
+            yield u
+
+    with _STRIPES.hold_all(), _LOCK:
+        _CACHE.clear()
+        reset_user_features(warm(users))
         _NEXT_ID = max_id + 1
         _INITIAL_LOADED = True
 
 
 def reset_store() -> None:
-    """Reset the in-memory store back to the initial JSON contents."""
-    _load_initial()
+    """Reset the store (in memory and on disk) back to the initial JSON contents."""
+    _load_initial(from_seed=True)
+
+
+def flush_store(timeout: Optional[float] = None) -> bool:
+    """Wait until every write so far is in the durable store. Returns False on timeout."""
+    return _STORE.flush(timeout) if _STORE is not None else True
 
 
 def _ensure_loaded() -> None:
@@ -44,62 +115,197 @@ def _ensure_loaded() -> None:
         _load_initial()
 
 
+def ensure_loaded() -> None:
+    """Load the store (and the user feature cache) if that has not happened yet."""
+    _ensure_loaded()
+
+
+def _load_locked(uid: int) -> Optional[Dict[str, Any]]:
+    """Read a user from the durable store into the cache. Caller must hold uid's stripe."""
+    user = _STORE.get(uid)
+    if user is not None:
+        _CACHE.put(user, loaded=True)
+    return user
+
+
+def _lookup(uid: int) -> Optional[Dict[str, Any]]:
+    user = _CACHE.get(uid)
+    if user is not None or _STORE is None:
+        return user
+    with _STRIPES.lock_for(uid):
+        return _load_locked(uid)
+
+
+def _lookup_locked(uid: int) -> Optional[Dict[str, Any]]:
+    """_lookup for a caller already holding uid's stripe."""
+    user = _CACHE.get(uid)
+    if user is not None or _STORE is None:
+        return user
+    return _load_locked(uid)
+
+
 def get_user(user_id: int) -> Optional[Dict[str, Any]]:
     """Get a user by ID from the store."""
     _ensure_loaded()
-    with _LOCK:
-        return _STORE.get(user_id)
+    return _lookup(int(user_id))
 
 
 def list_users() -> List[Dict[str, Any]]:
+    """Every user, sorted by id (read from the durable store, bypassing the cache)."""
     _ensure_loaded()
-    with _LOCK:
-        return [u.copy() for u in _STORE.values()]
+    if _STORE is not None:
+        return _STORE.load_all()
+    users = list(_CACHE.users())
+    users.sort(key=lambda u: u["id"])
+    return users
 
 
 def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
     _ensure_loaded()
-    with _LOCK:
-        return _STORE.get(int(user_id)).copy() if int(user_id) in _STORE else None
+    return _lookup(int(user_id))
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit, miss, eviction and load counters of the user cache."""
+    return _CACHE.stats()
 
 
 def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Create a new user in the in-memory store. Does NOT modify the original JSON file."""
+    """Create a new user. It is persisted to the durable store (not the JSON seed) shortly after."""
     _ensure_loaded()
     global _NEXT_ID
     with _LOCK:
         uid = int(_NEXT_ID)
         _NEXT_ID += 1
-        now = _now_iso()
-        new_user = user_data.copy()
-        new_user["id"] = uid
-        if "created_at" not in new_user:
-            new_user["created_at"] = now
-        new_user["updated_at"] = now
-        _STORE[uid] = new_user
-        return new_user.copy()
+    now = _now_iso()
+    new_user = user_data.copy()
+    new_user["id"] = uid
+    if "created_at" not in new_user:
+        new_user["created_at"] = now
+    new_user["updated_at"] = now
+    with _STRIPES.lock_for(uid):
+        _CACHE.put(new_user)
+        put_user_features(new_user)
+        if _STORE is not None:
+            _STORE.put(new_user)
+    return new_user.copy()
+
+
+def create_users(users_data: List[Dict[str, Any]]) -> List[int]:
+    """
+    Create many users at once, e.g. for a bulk import.
+
+    Ids are allocated as one consecutive block and the stripes of the whole
+    batch are taken once. Returns the new ids, in order.
+    """
+    _ensure_loaded()
+    global _NEXT_ID
+    if not users_data:
+        return []
+    with _LOCK:
+        first = int(_NEXT_ID)
+        _NEXT_ID += len(users_data)
+    ids = list(range(first, first + len(users_data)))
+    now = _now_iso()
+    with _STRIPES.hold(ids):
+        for uid, user_data in zip(ids, users_data):
+            new_user = {**user_data, "id": uid, "updated_at": now}
+            new_user.setdefault("created_at", now)
+            _CACHE.put(new_user)
+            put_user_features(new_user)
+            if _STORE is not None:
+                _STORE.put(new_user)
+    return ids
+
+
+def iter_users_snapshot() -> Iterator[Dict[str, Any]]:
+    """
+    Every user as of one point in time, sorted by id, without loading them
+    all into memory (from a read transaction on the durable store).
+    """
+    _ensure_loaded()
+    if _STORE is not None:
+        return _STORE.iter_snapshot()
+    return iter(list_users())
 
 
 def update_user(user_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update fields for an existing user. Returns updated user or None if not found."""
     _ensure_loaded()
     uid = int(user_id)
-    with _LOCK:
-        existing = _STORE.get(uid)
+    updates = {k: v for k, v in updates.items() if k != "id"}
+    with _STRIPES.lock_for(uid):
+        existing = _lookup_locked(uid)
         if not existing:
             return None
-        updates = {k: v for k, v in updates.items() if k != "id"}
-        existing.update(updates)
-        existing["updated_at"] = _now_iso()
-        return existing.copy()
+        updated = {**existing, **updates, "updated_at": _now_iso()}
+        _CACHE.put(updated)
+        put_user_features(updated)
+        if _STORE is not None:
+            _STORE.put(updated)
+    return updated.copy()
 
 
 def delete_user(user_id: int) -> bool:
-    """Delete a user from the in-memory store. Returns True if deleted."""
+    """Delete a user. Returns True if deleted."""
     _ensure_loaded()
     uid = int(user_id)
-    with _LOCK:
-        if uid in _STORE:
-            del _STORE[uid]
-            return True
-        return False
+    with _STRIPES.lock_for(uid):
+        if _lookup_locked(uid) is None:
+            return False
+        _CACHE.remove(uid)
+        remove_user_features(uid)
+        if _STORE is not None:
+            _STORE.delete(uid)
+        return True
+
+
+def find_user_ids(
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    city: Optional[str] = None,
+    interest: Optional[str] = None,
+) -> List[int]:
+    """
+    Ids of the users matching every given field, sorted.
+
+    City and interest alone are answered from the in-memory user index.
+    Username and email use the durable store's secondary indexes (waiting
+    for pending writes first), or a scan without a durable store.
+    Strings compare case-insensitively.
+    """
+    _ensure_loaded()
+    if username is None and email is None:
+        return sorted(query_user_ids(city, [interest] if interest is not None else None))
+    if _STORE is not None:
+        return _STORE.find_ids(username=username, email=email, city=city, interest=interest)
+    wanted = {k: v.lower() for k, v in (("username", username), ("email", email)) if v is not None}
+    candidates = query_user_ids(city, [interest] if interest is not None else None)
+    ids = []
+    for uid in candidates:
+        u = _lookup(uid)
+        if u is not None and all(str(u.get(k) or "").lower() == v for k, v in wanted.items()):
+            ids.append(uid)
+    return sorted(ids)
+
+
+def find_users(
+    city: Optional[str] = None,
+    interests: Optional[List[str]] = None,
+    match_all: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Users in `city` with all (or, unless `match_all`, any) of `interests`, sorted by id.
+
+    Answered with set operations on the in-memory user index; only the
+    matching users are copied.
+    """
+    _ensure_loaded()
+    users = (_lookup(uid) for uid in sorted(query_user_ids(city, interests, match_all)))
+    return [u for u in users if u is not None]
+
+
+def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
+    """Get a user by username (case-insensitive), or None."""
+    ids = find_user_ids(username=username)
+    return get_user_by_id(ids[0]) if ids else None
@@ -0,0 +1,334 @@
+"""
+Durable user storage: embedded SQLite in WAL mode, written behind the
+in-memory user store.
+
+`user_service` serves every read from memory and hands each write to
+`UserStore.put` / `UserStore.delete`, which only record it as pending and
+return. A flusher thread writes whatever has accumulated in one transaction
+every `flush_interval` seconds (sooner once `batch_size` users are pending).
+Pending writes are coalesced per user, so a burst of updates to one profile
+costs one row write.
+
+Each batch is one SQLite transaction, and WAL mode keeps the database file a
+consistent snapshot at every commit: after a crash the store reopens at the
+last committed batch, and at most the writes of the last `flush_interval`
+are lost. `flush` waits for everything pending, e.g. before shutdown. A batch
+whose transaction fails goes back to pending (behind any newer write of the
+same users) to be retried, and `flush` raises the error instead of waiting.
+
+The store is also the cold tier of the user cache: `get` reads one user
+(pending and in-flight writes first, then a separate WAL reader connection
+that does not wait for the flusher).
+
+Besides the JSON document of each user, the tables keep secondary indexes
+on username, email and city (case-insensitive) and on each interest
+(lowercased), for `find_ids`.
+
+Schema:
+    users(id, username, email, city, data)      data = JSON document
+    user_interests(user_id, interest)
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT COLLATE NOCASE,
+    email TEXT COLLATE NOCASE,
+    city TEXT COLLATE NOCASE,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_username ON users (username);
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+CREATE INDEX IF NOT EXISTS users_city ON users (city);
+CREATE TABLE IF NOT EXISTS user_interests (
+    user_id INTEGER NOT NULL,
+    interest TEXT NOT NULL,
+    PRIMARY KEY (interest, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS user_interests_user ON user_interests (user_id);
+"""
+
+
+def _row(user: Dict[str, Any]) -> tuple:
+    return (
+        int(user["id"]),
+        user.get("username"),
+        user.get("email"),
+        user.get("city"),
+        json.dumps(user, separators=(",", ":"), default=str),
+    )
+
+
+def _interests(user: Dict[str, Any]) -> List[tuple]:
+    uid = int(user["id"])
+    return [(uid, interest) for interest in {str(i).lower() for i in user.get("interests") or []}]
+
+
+class UserStore:
+    """SQLite user table with write-behind batching."""
+
+    def __init__(self, path: Path, flush_interval: float = 0.05, batch_size: int = 1000):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.commits = 0
+        self.rows_written = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL still keeps every commit atomic; only the last
+        # commits before a power loss can roll back.
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # Serializes use of the connection. Taken before _cond, never after.
+        self._db_lock = threading.Lock()
+        self._reader = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._reader_lock = threading.Lock()
+        self._cond = threading.Condition()
+        # user id -> latest user dict, or None for a delete
+        self._pending: Dict[int, Optional[Dict[str, Any]]] = {}
+        # The batch being committed, still visible to `get` until it is.
+        self._inflight: Dict[int, Optional[Dict[str, Any]]] = {}
+        # Number of writes handed over so far, and how many are on disk.
+        self._submitted = 0
+        self._written = 0
+        self._flush_requested = False
+        self._closed = False
+        # Number of failed batch writes so far, and the last error.
+        self._failures = 0
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._flush_loop, name="user-store-flusher", daemon=True)
+        self._thread.start()
+
+    def count(self) -> int:
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def max_id(self) -> int:
+        self.flush()
+        with self._db_lock:
+            return self._db.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """Every stored user, pending writes included."""
+        return list(self.iter_all())
+
+    def iter_all(self, batch: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Every stored user by id, pending writes included, read `batch` rows at a time."""
+        self.flush()
+        last = -1
+        while True:
+            with self._reader_lock:
+                rows = self._reader.execute(
+                    "SELECT id, data FROM users WHERE id > ? ORDER BY id LIMIT ?", (last, batch)
+                ).fetchall()
+            if not rows:
+                return
+            for _, data in rows:
+                yield json.loads(data)
+            last = rows[-1][0]
+
+    def iter_snapshot(self, batch: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Every user by id as of one point in time (after the writes submitted
+        so far), read `batch` rows at a time.
+
+        Uses its own connection and read transaction, so writers and cache
+        loads carry on meanwhile and do not show up in the result.
+        """
+        self.flush()
+        # Iterated from whichever thread consumes the generator.
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            cursor = conn.execute("SELECT data FROM users ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                for (data,) in rows:
+                    yield json.loads(data)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """One user, or None if there is none (pending writes and deletes included)."""
+        with self._cond:
+            for writes in (self._pending, self._inflight):
+                if user_id in writes:
+                    return writes[user_id]
+        with self._reader_lock:
+            row = self._reader.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, user: Dict[str, Any]) -> None:
+        """Queue a created or updated user (the dict must not be mutated afterwards)."""
+        self._submit(int(user["id"]), user)
+
+    def delete(self, user_id: int) -> None:
+        """Queue the deletion of a user."""
+        self._submit(int(user_id), None)
+
+    def _submit(self, user_id: int, user: Optional[Dict[str, Any]]) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("User store is closed")
+            self._pending[user_id] = user
+            self._submitted += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def replace_all(self, users: Iterable[Dict[str, Any]]) -> None:
+        """Replace every stored user at once, discarding pending writes. Synchronous."""
+        users = list(users)
+        with self._db_lock:
+            with self._cond:
+                self._pending.clear()
+                written = self._submitted
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute("DELETE FROM users")
+                self._db.execute("DELETE FROM user_interests")
+                self._insert(users)
+            self.commits += 1
+            self.rows_written += len(users)
+            with self._cond:
+                self._written = max(self._written, written)
+                self._cond.notify_all()
+
+    def _insert(self, users: List[Dict[str, Any]]) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?)", [_row(u) for u in users])
+        self._db.executemany(
+            "INSERT OR IGNORE INTO user_interests VALUES (?, ?)",
+            [pair for u in users for pair in _interests(u)],
+        )
+
+    def _write_batch(self) -> bool:
+        """Write everything pending in one transaction. Returns False if nothing was pending."""
+        with self._db_lock:
+            with self._cond:
+                if not self._pending:
+                    return False
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+                written = self._submitted
+            ids = [(uid,) for uid in batch]
+            try:
+                with self._db:
+                    self._db.execute("BEGIN")
+                    self._db.executemany("DELETE FROM users WHERE id = ?", ids)
+                    self._db.executemany("DELETE FROM user_interests WHERE user_id = ?", ids)
+                    self._insert([u for u in batch.values() if u is not None])
+            except BaseException as e:
+                with self._cond:
+                    # Writes submitted meanwhile are newer than the batch's.
+                    batch.update(self._pending)
+                    self._pending = batch
+                    self._inflight = {}
+                    self._failures += 1
+                    self._error = e
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._inflight = {}
+                self._error = None
+            self.commits += 1
+            self.rows_written += len(batch)
+        with self._cond:
+            self._written = max(self._written, written)
+            self._cond.notify_all()
+        return True
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._flush_requested or len(self._pending) >= self.batch_size,
+                    self.flush_interval,
+                )
+                self._flush_requested = False
+                closed = self._closed
+            try:
+                self._write_batch()
+            except Exception as e:
+                print(f"User store flush failed: {e}")
+                if closed:
+                    return
+                # The batch is pending again; retry after the interval (or
+                # when flush is called), not in a busy loop.
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed or self._flush_requested, self.flush_interval)
+                continue
+            if closed:
+                return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every write submitted so far is committed. Returns False on timeout.
+
+        Raises:
+            RuntimeError: if a batch write failed meanwhile (its writes stay
+                pending and are retried)
+        """
+        with self._cond:
+            target = self._submitted
+            if self._written >= target:
+                return True
+            failures = self._failures
+            self._flush_requested = True
+            self._cond.notify_all()
+            done = self._cond.wait_for(
+                lambda: self._written >= target or self._closed or self._failures > failures, timeout
+            )
+            if self._written < target and self._failures > failures:
+                raise RuntimeError(f"User store write failed: {self._error}")
+            return done
+
+    def find_ids(
+        self,
+        username: Optional[str] = None,
+        email: Optional[str] = None,
+        city: Optional[str] = None,
+        interest: Optional[str] = None,
+    ) -> List[int]:
+        """
+        Ids of the users matching every given criterion, through the secondary indexes.
+
+        Pending writes are flushed first, so the result includes them.
+        Username, email and city compare case-insensitively.
+        """
+        clauses, params = [], []
+        for column, value in (("username", username), ("email", email), ("city", city)):
+            if value is not None:
+                clauses.append(f"u.{column} = ?")
+                params.append(value)
+        join = ""
+        if interest is not None:
+            join = " JOIN user_interests i ON i.user_id = u.id AND i.interest = ?"
+            params.insert(0, str(interest).lower())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute(f"SELECT u.id FROM users u{join}{where} ORDER BY u.id", params)
+            return [uid for (uid,) in rows]
+
+    def close(self) -> None:
+        """Write everything pending and close the database."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._write_batch()
+        with self._db_lock:
+            self._db.close()
+        with self._reader_lock:
+            self._reader.close()
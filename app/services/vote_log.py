@@ -0,0 +1,406 @@
+"""
+Append-only write-ahead log for the vote store.
+
+Every write to the vote store is appended here as one record with a log
+sequence number (LSN). Records are buffered in memory and a single flusher
+thread writes and fsyncs whatever has accumulated in one go (group commit),
+so many concurrent writers share one fsync.
+
+Periodically the store's full state is written as a compact columnar
+snapshot. The log is rotated into a new segment at the snapshot's LSN, and
+once the snapshot is durable the older segments are deleted (compaction).
+
+A snapshot can also carry derived state of the store (e.g. preference
+profiles) as of its LSN, so recovery only has to fold the records after it
+into that state. Recovery loads the latest snapshot and replays the segments
+after it. Every
+line carries a CRC32, so a torn or corrupted tail left by a crash is
+detected and ignored.
+
+On-disk layout (inside `directory`):
+    votes.snapshot.json        latest snapshot
+    votes-<start lsn>.log      log segments, one record per line
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_NAME = "votes.snapshot.json"
+SEGMENT_PREFIX = "votes-"
+SEGMENT_SUFFIX = ".log"
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    """Decode one log line, or return None if it is torn or corrupted."""
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        crc, payload = line[:-1].split(b" ", 1)
+        if int(crc, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Make renames and new files in `directory` durable (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def encode_snapshot(lsn: int, votes: List[Dict[str, Any]], state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Store votes column by column; missing fields are stored as null. `state` is stored as is."""
+    keys: List[str] = []
+    for vote in votes:
+        for key in vote:
+            if key not in keys:
+                keys.append(key)
+    data = {
+        "format": SNAPSHOT_FORMAT,
+        "lsn": lsn,
+        "count": len(votes),
+        "columns": {key: [vote.get(key) for vote in votes] for key in keys},
+    }
+    if state is not None:
+        data["state"] = state
+    return data
+
+
+def decode_snapshot(data: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]]]:
+    """Inverse of encode_snapshot. Returns (lsn, votes)."""
+    if data.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported vote snapshot format: {data.get('format')}")
+    columns = data["columns"]
+    votes = []
+    for row in range(data["count"]):
+        votes.append({
+            key: values[row] for key, values in columns.items() if values[row] is not None
+        })
+    return data["lsn"], votes
+
+
+def resolve_directory(configured: str) -> Path:
+    """Log directory: VOTE_STORAGE_DIR if set, else `configured` (relative to the project root)."""
+    directory = Path(os.getenv("VOTE_STORAGE_DIR") or configured)
+    if not directory.is_absolute():
+        directory = Path(__file__).resolve().parents[2] / directory
+    return directory
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def read_votes(directory: Path, attempts: int = 5) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Read the votes of a log that another process may be writing, e.g. for an
+    offline job. Read-only: no segment is opened for writing, no thread is
+    started and no snapshot is taken.
+
+    The writer's compaction can replace the snapshot and delete segments
+    while they are read; the read is then retried.
+
+    Returns:
+        (last lsn, votes) with every logged vote in order, superseded ones included
+    """
+    for _ in range(attempts):
+        log = VoteLog(directory)
+        before = _file_stamp(log.snapshot_path)
+        try:
+            votes = log.recover()
+        except FileNotFoundError:
+            continue
+        if _file_stamp(log.snapshot_path) == before:
+            return log.last_lsn, votes
+    raise RuntimeError(f"Vote log {directory} kept changing while it was read")
+
+
+class VoteLog:
+    """Write-ahead log with group commit, snapshots and compaction for the vote store."""
+
+    def __init__(
+        self,
+        directory: Path,
+        commit_delay: float = 0.0,
+        snapshot_interval: float = 60.0,
+        snapshot_min_records: int = 1000,
+    ):
+        self.directory = Path(directory)
+        self.commit_delay = commit_delay
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_min_records = snapshot_min_records
+        self.commits = 0
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[int, bytes]] = []
+        self._last_lsn = 0
+        self._durable_lsn = 0
+        self._snapshot_lsn = 0
+        self._rotate_after: Optional[int] = None
+        self._segment_start = 1
+        self._file = None
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_source: Optional[Callable[[], Tuple]] = None
+        # Set by recover(): the derived state saved with the snapshot (None if
+        # there was none, or a reset was replayed after it) and how many of
+        # the recovered votes the snapshot covered.
+        self.recovered_state: Optional[Dict[str, Any]] = None
+        self.recovered_snapshot_votes = 0
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.directory / SNAPSHOT_NAME
+
+    @property
+    def last_lsn(self) -> int:
+        return self._last_lsn
+
+    def _segments(self) -> List[Tuple[int, Path]]:
+        """Existing log segments as (start lsn, path), oldest first."""
+        segments = []
+        if self.directory.exists():
+            for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+                try:
+                    start = int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                segments.append((start, path))
+        return sorted(segments)
+
+    def has_data(self) -> bool:
+        """True if a snapshot or any log segment exists."""
+        return self.snapshot_path.exists() or bool(self._segments())
+
+    def recover(self) -> List[Dict[str, Any]]:
+        """
+        Rebuild the list of votes from the latest snapshot plus the log.
+
+        Must be called before `start`. Reading stops at the first damaged
+        line of a segment, which is where a crash interrupted a write.
+        """
+        votes: List[Dict[str, Any]] = []
+        snapshot_lsn = 0
+        state = None
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            snapshot_lsn, votes = decode_snapshot(data)
+            state = data.get("state")
+        snapshot_votes = len(votes)
+
+        last_lsn = snapshot_lsn
+        for _, path in self._segments():
+            with open(path, "rb") as f:
+                for line in f:
+                    record = _decode(line)
+                    if record is None:
+                        print(f"Ignoring damaged tail of vote log {path}")
+                        break
+                    lsn = record["lsn"]
+                    if lsn <= snapshot_lsn:
+                        continue
+                    if record["op"] == "add":
+                        votes.append(record["vote"])
+                    elif record["op"] == "reset":
+                        votes = []
+                        state, snapshot_votes = None, 0
+                    last_lsn = max(last_lsn, lsn)
+
+        self._snapshot_lsn = snapshot_lsn
+        self._last_lsn = self._durable_lsn = last_lsn
+        self.recovered_state = state
+        self.recovered_snapshot_votes = snapshot_votes
+        return votes
+
+    def start(self, snapshot_source: Callable[[], Tuple]) -> None:
+        """
+        Open a fresh segment and start the flusher and snapshot threads.
+
+        Args:
+            snapshot_source: Returns (lsn, votes), or (lsn, votes, state) to
+                save derived state with the snapshot, for a consistent view
+                of the store; it should call `checkpoint()` while holding
+                the store lock.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._snapshot_source = snapshot_source
+        # Never append after a possibly torn tail: always begin a new segment.
+        self._open_segment(self._last_lsn + 1)
+        for target, name in ((self._flush_loop, "vote-log-flusher"), (self._snapshot_loop, "vote-log-snapshots")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _open_segment(self, start_lsn: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = self.directory / f"{SEGMENT_PREFIX}{start_lsn:020d}{SEGMENT_SUFFIX}"
+        self._file = open(path, "ab")
+        _fsync_dir(self.directory)
+        with self._cond:
+            self._segment_start = start_lsn
+            self._cond.notify_all()
+
+    def append(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Queue records for the next group commit and return the last LSN assigned.
+
+        Call this under the store lock so log order matches store order.
+        Records are {"op": "add", "vote": {...}} or {"op": "reset"}.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Vote log is closed")
+            for record in records:
+                self._last_lsn += 1
+                self._pending.append((self._last_lsn, _encode({"lsn": self._last_lsn, **record})))
+            self._cond.notify_all()
+            return self._last_lsn
+
+    def wait_durable(self, lsn: int, timeout: Optional[float] = None) -> None:
+        """Block until every record up to `lsn` has been fsynced."""
+        with self._cond:
+            done = self._cond.wait_for(
+                lambda: self._durable_lsn >= lsn or self._error is not None, timeout
+            )
+            if self._error is not None:
+                raise RuntimeError(f"Vote log write failed: {self._error}")
+            if not done:
+                raise TimeoutError(f"Vote log commit of LSN {lsn} timed out")
+
+    def checkpoint(self) -> int:
+        """
+        Mark the current end of the log as a snapshot boundary and return its LSN.
+
+        The flusher starts a new segment right after this LSN, so segments
+        before it can be deleted once the snapshot is written.
+        """
+        with self._cond:
+            self._rotate_after = self._last_lsn
+            self._cond.notify_all()
+            return self._last_lsn
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._pending or self._rotate_after is not None or self._closed
+                )
+                if self._closed and not self._pending:
+                    return
+            if self.commit_delay:
+                # Give concurrent writers a moment to join this commit.
+                time.sleep(self.commit_delay)
+            with self._cond:
+                batch, self._pending = self._pending, []
+                rotate_after, self._rotate_after = self._rotate_after, None
+            try:
+                self._write(batch, rotate_after)
+            except Exception as e:
+                print(f"Vote log flush failed: {e}")
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+
+    def _write(self, batch: List[Tuple[int, bytes]], rotate_after: Optional[int]) -> None:
+        if rotate_after is not None:
+            head = b"".join(line for lsn, line in batch if lsn <= rotate_after)
+            batch = [(lsn, line) for lsn, line in batch if lsn > rotate_after]
+            if head:
+                self._file.write(head)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._open_segment(rotate_after + 1)
+        if batch:
+            self._file.write(b"".join(line for _, line in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.commits += 1
+        with self._cond:
+            if batch:
+                self._durable_lsn = batch[-1][0]
+            elif rotate_after is not None:
+                self._durable_lsn = max(self._durable_lsn, rotate_after)
+            self._cond.notify_all()
+
+    def _snapshot_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._cond.wait_for(lambda: self._closed, self.snapshot_interval):
+                    return
+                behind = self._last_lsn - self._snapshot_lsn
+            if behind >= self.snapshot_min_records:
+                try:
+                    self.snapshot_now()
+                except Exception as e:
+                    print(f"Vote snapshot failed: {e}")
+
+    def snapshot_now(self) -> int:
+        """
+        Write a snapshot of the store, then delete the log segments it covers.
+
+        Segments are kept if the log is closed (or failed) before the flusher
+        starts the segment after the snapshot; recovery replays them harmlessly.
+        """
+        with self._snapshot_lock:
+            lsn, votes, *state = self._snapshot_source()
+            tmp_path = self.snapshot_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(encode_snapshot(lsn, votes, *state), f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            _fsync_dir(self.directory)
+
+            with self._cond:
+                self._snapshot_lsn = lsn
+                rotated = self._cond.wait_for(
+                    lambda: self._segment_start > lsn or self._error is not None or self._closed
+                ) and self._segment_start > lsn
+                current = self._segment_start
+            if not rotated:
+                return lsn
+            for start, path in self._segments():
+                if start < current and start <= lsn:
+                    path.unlink()
+            return lsn
+
+    def close(self) -> None:
+        """Flush everything still buffered and stop the background threads."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,112 @@
+"""
+Cached Condorcet (Schulze) results for the vote store.
+
+The result is keyed on the vote store's version counter. Writes only mark the
+cache stale and schedule a recompute on a background timer; recomputes are
+throttled to one per `min_interval` seconds, so a burst of votes costs a
+single closure. Readers always get the latest completed result immediately.
+"""
+import time
+from datetime import datetime, timezone
+from threading import Lock, Timer
+from typing import Any, Dict, Optional
+
+from app.services import vote_service
+from app.services.condorcet_engine import schulze_ranking
+from app.services.config_service import get_config
+
+REFRESH_INTERVAL = get_config().get("votes.result_refresh_interval", 2.0)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class CondorcetResultCache:
+    """Latest Schulze ranking of the vote store, recomputed off the request path."""
+
+    def __init__(self, min_interval: float = REFRESH_INTERVAL):
+        self.min_interval = min_interval
+        self.computations = 0
+        self._lock = Lock()
+        self._result: Optional[Dict[str, Any]] = None
+        self._scheduled = False
+        self._last_run = float("-inf")
+
+    def get(self) -> Dict[str, Any]:
+        """
+        Return the latest completed result, scheduling a refresh if it is stale.
+
+        Only the very first call (before any result exists) computes inline.
+        """
+        result = self._result
+        if result is None:
+            return self.refresh()
+        current = vote_service.get_vote_version()
+        if result["version"] != current:
+            self.schedule()
+            return {**result, "stale": True}
+        return result
+
+    def refresh(self) -> Dict[str, Any]:
+        """Recompute the result now on the calling thread and publish it."""
+        # Read the version before the matrix: the matrix is at least this fresh,
+        # so a write racing with us can only cause one extra recompute.
+        version = vote_service.get_vote_version()
+        candidate_ids, pairwise = vote_service.get_pairwise_matrix()
+        ranking = schulze_ranking(pairwise, candidate_ids)
+        result = {
+            "ranking": ranking,
+            "version": version,
+            "computed_at": _now_iso(),
+            "stale": False,
+        }
+        with self._lock:
+            if self._result is None or self._result["version"] <= version:
+                self._result = result
+            self.computations += 1
+        return result
+
+    def schedule(self) -> None:
+        """Queue a background recompute, at most one per `min_interval`."""
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+            delay = max(0.0, self._last_run + self.min_interval - time.monotonic())
+        timer = Timer(delay, self._run)
+        timer.daemon = True
+        timer.start()
+
+    def _run(self) -> None:
+        try:
+            result = self.refresh()
+        except Exception as e:
+            print(f"Condorcet result refresh failed: {e}")
+            result = None
+        with self._lock:
+            self._scheduled = False
+            self._last_run = time.monotonic()
+        # Votes that landed while we were computing get picked up by the next run.
+        if result is not None and result["version"] != vote_service.get_vote_version():
+            self.schedule()
+
+    def invalidate(self, vote: Optional[Dict] = None) -> None:
+        """Vote-store listener: a write happened, refresh in the background."""
+        if self._result is not None:
+            self.schedule()
+
+
+_CACHE = CondorcetResultCache()
+vote_service.add_vote_listener(_CACHE.invalidate)
+
+
+def get_condorcet_result() -> Dict[str, Any]:
+    """
+    Get the Schulze ranking of all voted activities.
+
+    Returns:
+        Dict with 'ranking' (activity IDs, winner first), the vote store
+        'version' it was computed from, 'computed_at' and whether it is 'stale'.
+    """
+    return _CACHE.get()
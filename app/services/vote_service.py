@@ -1,30 +1,329 @@
-from typing import List, Dict, Optional, Set, Tuple
-from threading import Lock
+from typing import Callable, Deque, List, Dict, Optional, Set, Tuple
+from threading import Event, Lock, Thread
 from pathlib import Path
+from datetime import datetime, timezone
+import atexit
+import heapq
 import json
+from contextlib import contextmanager
+import numpy as np
 from app.models.db.vote import Vote
-from collections import defaultdict
+from app.services.config_service import get_config
+from app.services.item_similarity import ItemSimilarityMatrix
+from app.services.pairwise_matrix import IncrementalPairwiseMatrix
+from app.services.preference_profiles import PreferenceProfile, PreferenceProfiles
+from app.services.striped_lock import StripedLock
+from app.services.vote_log import VoteLog, resolve_directory
+from app.services.vote_snapshot import VoteGeneration, VoteSnapshot
+from collections import defaultdict, deque
 
+LOCK_STRIPES = get_config().get("votes.lock_stripes", 64)
+item_similarity_config = get_config().get("votes.item_similarity", {}) or {}
+
+# Writers hold the stripes of the users and activities they touch (user
+# stripes first, then activity stripes) while updating the derived state
+# below, and take _LOCK only briefly to append, publish and log in one order.
+# Readers use the published _SNAPSHOT and never lock.
+_USER_LOCKS = StripedLock(LOCK_STRIPES)
+_ACTIVITY_LOCKS = StripedLock(LOCK_STRIPES)
 _LOCK = Lock()
-_VOTES: List[Dict] = []
+# Append-only votes plus per-activity and per-user posting lists.
+_GENERATION = VoteGeneration()
+# Condorcet view of the score votes: each user's ballot is their latest score
+# per activity (guarded by the user's stripe). The pairwise matrix and the
+# item-item similarities are shared by all users, so writers do not update
+# them: they queue (old ballot, new ballot) in _BALLOT_CHANGES, and the
+# "vote-pairwise" thread folds the changes in under _PAIRWISE_LOCK. Readers
+# fold in whatever is still queued first, so they see every completed write.
+_BALLOTS: Dict[int, Dict[int, int]] = {}
+_BALLOT_CHANGES: Deque[Tuple[Dict[int, int], Dict[int, int]]] = deque()
+_BALLOT_CHANGES_READY = Event()
+# Past this many queued changes writers fold them in themselves, so a
+# consumer that falls behind slows writers down instead of growing the queue.
+MAX_PENDING_BALLOT_CHANGES = 4096
+_PAIRWISE = IncrementalPairwiseMatrix()
+_ITEM_SIMILARITY = ItemSimilarityMatrix(
+    top_n=item_similarity_config.get("top_n", 20),
+    shrinkage=item_similarity_config.get("shrinkage", 10),
+    center=item_similarity_config.get("center", 5.5),
+)
+_PAIRWISE_LOCK = Lock()
+# Per-user preference profiles, updated under the user's stripe; readers get
+# immutable profiles. Activity types come from the admin catalog.
+_ADMIN = None
+_CATALOG_TYPES: Tuple[int, Dict[int, str]] = (-1, {})
+
+
+def _catalog_activity_type(activity_id: int) -> Optional[str]:
+    """Type of an admin catalog activity, or None for other (e.g. Ticketmaster) activities."""
+    global _ADMIN, _CATALOG_TYPES
+    if _ADMIN is None:
+        # Imported late: the admin routes import the services.
+        from app.routes import admin
+        _ADMIN = admin
+    version, types = _CATALOG_TYPES
+    if version != _ADMIN.admin_activities_version:
+        version = _ADMIN.admin_activities_version
+        types = {a.id: getattr(a.type, "value", a.type) for a in list(_ADMIN.admin_activities)}
+        _CATALOG_TYPES = (version, types)
+    return types.get(activity_id)
+
+
+_PROFILES = PreferenceProfiles(_catalog_activity_type)
+# Running score aggregates: activity_id -> (score sum, vote count), guarded by
+# the activity's stripe, plus (score sum, vote count) per stripe. Entries are
+# replaced with new tuples, never mutated, so readers can use them without locks.
+_SCORE_STATS: Dict[int, Tuple[int, int]] = {}
+_SCORE_TOTALS: List[Tuple[int, int]] = [(0, 0)] * len(_ACTIVITY_LOCKS)
+# Bumped on every write so derived results can tell whether they are stale.
+_VERSION = 0
+# Latest published view of _GENERATION; replaced (never mutated) after each write.
+_SNAPSHOT = VoteSnapshot(_VERSION, _GENERATION, 0, 0)
+# Called after every write with the stored vote, or None when the store is reset.
+_LISTENERS: List[Callable[[Optional[Dict]], None]] = []
 
 VOTES_FILE = Path(__file__).resolve().parents[1] / "data" / "votes.json"
 
+ranking_config = get_config().get("votes.ranking", {}) or {}
+# Bayesian average: each activity starts with PRIOR_WEIGHT virtual votes at
+# the prior mean (the mean of all votes unless PRIOR_MEAN is configured).
+PRIOR_WEIGHT = ranking_config.get("prior_weight", 5)
+PRIOR_MEAN = ranking_config.get("prior_mean")
+MIN_VOTES = ranking_config.get("min_votes", 1)
+
+storage_config = get_config().get("votes.storage", {}) or {}
+WAIT_FOR_COMMIT = storage_config.get("wait_for_commit", True)
+
+# Rebuild the store without superseded votes once they outnumber current
+# votes by this ratio (and there are at least COMPACTION_MIN_SUPERSEDED).
+COMPACTION_RATIO = get_config().get("votes.compaction_ratio", 1.0)
+COMPACTION_MIN_SUPERSEDED = 1024
+
+
+def _open_log() -> Optional[VoteLog]:
+    """Create the write-ahead log from config; VOTE_STORAGE_DIR overrides the directory."""
+    if not storage_config.get("enabled", False):
+        return None
+    return VoteLog(
+        resolve_directory(storage_config.get("directory", "app/data/vote_log")),
+        commit_delay=storage_config.get("commit_delay_ms", 0) / 1000.0,
+        snapshot_interval=storage_config.get("snapshot_interval", 60),
+        snapshot_min_records=storage_config.get("snapshot_min_records", 1000),
+    )
+
+
+_LOG = _open_log()
+
 def _load_votes_from_file():
     """Load votes from JSON file if it exists."""
-    global _VOTES
     if VOTES_FILE.exists():
         try:
             with open(VOTES_FILE, 'r', encoding='utf-8') as f:
                 votes_data = json.load(f)
-                with _LOCK:
-                    _VOTES.clear()
-                    _VOTES.extend(votes_data)
-                print(f"Loaded {len(_VOTES)} votes from {VOTES_FILE}")
+                with _exclusive():
+                    _clear_locked()
+                    for vote in votes_data:
+                        _apply_vote(vote)
+                        _append_locked(vote)
+                    _publish_locked()
+                print(f"Loaded {len(votes_data)} votes from {VOTES_FILE}")
         except Exception as e:
             print(f"Error loading votes from file: {e}")
 
-_load_votes_from_file()
+@contextmanager
+def _writing(votes: List[Dict]):
+    """Hold the stripes of every user and activity in `votes`."""
+    with _USER_LOCKS.hold(vote.get("user_id") for vote in votes), \
+            _ACTIVITY_LOCKS.hold(vote.get("activity_id") for vote in votes):
+        yield
+
+
+@contextmanager
+def _exclusive():
+    """Hold every stripe and _LOCK, e.g. to reset or reload the whole store."""
+    with _USER_LOCKS.hold_all(), _ACTIVITY_LOCKS.hold_all(), _LOCK:
+        yield
+
+
+def _apply_vote(vote: Dict, profile: bool = True) -> None:
+    """
+    Fold a vote into the derived state, replacing the user's previous score
+    for the activity if there is one. Caller must hold its stripes (see _writing).
+
+    Args:
+        profile: Also update the user's preference profile (False when
+            recovering votes a restored profile already covers)
+    """
+    previous = _BALLOTS.get(vote.get("user_id"), {}).get(vote.get("activity_id"))
+    _update_ballot(vote)
+    _update_score_stats(vote, previous)
+    if profile:
+        _PROFILES.apply_vote(vote)
+
+
+def _append_locked(vote: Dict) -> None:
+    """
+    Append a vote to the store and its indexes, superseding the user's previous
+    vote for the activity. Caller must hold _LOCK and call _publish_locked()
+    once done writing.
+    """
+    global _VERSION
+    _VERSION += 1
+    _GENERATION.append(vote)
+
+
+def _publish_locked() -> None:
+    """Make all writes so far visible to readers. Caller must hold _LOCK."""
+    global _SNAPSHOT, _GENERATION
+    superseded = _GENERATION.superseded
+    if superseded >= COMPACTION_MIN_SUPERSEDED and superseded > _GENERATION.live * COMPACTION_RATIO:
+        # Drop superseded votes so memory follows users x activities voted, not
+        # submissions. Snapshots already handed out keep the old generation.
+        _GENERATION = _GENERATION.compacted()
+    _SNAPSHOT = VoteSnapshot(_VERSION, _GENERATION, len(_GENERATION.votes), _GENERATION.live)
+
+
+def _ballot_positions(ballot: Dict[int, int]) -> Dict[int, int]:
+    """Turn a {activity_id: score} ballot into positions (higher score ranks first)."""
+    return {aid: -score for aid, score in ballot.items()}
+
+
+def _update_ballot(vote: Dict) -> None:
+    """
+    Fold a score vote into its user's ballot and queue the change for the
+    pairwise matrix. Caller must hold the user's stripe.
+    """
+    if vote.get("score") is None:
+        return
+    user_id = vote.get("user_id")
+    old = _BALLOTS.get(user_id, {})
+    new = dict(old)
+    new[vote.get("activity_id")] = vote["score"]
+    # Ballots are replaced, never mutated, so the queue can share them.
+    _BALLOTS[user_id] = new
+    _BALLOT_CHANGES.append((old, new))
+    if len(_BALLOT_CHANGES) > MAX_PENDING_BALLOT_CHANGES:
+        with _PAIRWISE_LOCK:
+            _fold_ballot_changes_locked()
+    elif not _BALLOT_CHANGES_READY.is_set():
+        _BALLOT_CHANGES_READY.set()
+
+
+def _fold_ballot_changes_locked() -> None:
+    """Apply the queued ballot changes to the pairwise and item-similarity matrices. Caller must hold _PAIRWISE_LOCK."""
+    while _BALLOT_CHANGES:
+        old, new = _BALLOT_CHANGES.popleft()
+        _PAIRWISE.replace_ballot(_ballot_positions(old), _ballot_positions(new))
+        _ITEM_SIMILARITY.replace_ballot(old, new)
+
+
+def _fold_ballot_changes_loop() -> None:
+    """Body of the "vote-pairwise" thread: fold ballot changes in as they are queued."""
+    while True:
+        _BALLOT_CHANGES_READY.wait()
+        # Cleared before folding: a change queued meanwhile sets it again.
+        _BALLOT_CHANGES_READY.clear()
+        with _PAIRWISE_LOCK:
+            _fold_ballot_changes_locked()
+
+
+def _update_score_stats(vote: Dict, previous: Optional[int] = None) -> None:
+    """
+    Add a vote's score to the running aggregates, or apply the difference to
+    the `previous` score it replaces. Caller must hold the activity's stripe.
+    """
+    score = vote.get("score")
+    if score is None:
+        return
+    activity_id = vote.get("activity_id")
+    delta, added = (score, 1) if previous is None else (score - previous, 0)
+    total, count = _SCORE_STATS.get(activity_id, (0, 0))
+    _SCORE_STATS[activity_id] = (total + delta, count + added)
+    stripe = _ACTIVITY_LOCKS.index(activity_id)
+    stripe_total, stripe_count = _SCORE_TOTALS[stripe]
+    _SCORE_TOTALS[stripe] = (stripe_total + delta, stripe_count + added)
+
+
+def _clear_locked() -> None:
+    """
+    Empty the store by starting a new generation, leaving existing snapshots
+    intact. Caller must hold everything (see _exclusive) and call _publish_locked().
+    """
+    global _VERSION, _GENERATION, _SCORE_STATS, _SCORE_TOTALS
+    _VERSION += 1
+    _GENERATION = VoteGeneration()
+    _SCORE_STATS = {}
+    _SCORE_TOTALS = [(0, 0)] * len(_ACTIVITY_LOCKS)
+    _BALLOTS.clear()
+    _PROFILES.clear()
+    with _PAIRWISE_LOCK:
+        _BALLOT_CHANGES.clear()
+        _PAIRWISE.clear()
+        _ITEM_SIMILARITY.clear()
+
+
+def _notify(vote: Optional[Dict]) -> None:
+    """Tell listeners about a write. Must be called without holding _LOCK."""
+    for callback in list(_LISTENERS):
+        try:
+            callback(vote)
+        except Exception as e:
+            print(f"Vote listener {callback} failed: {e}")
+
+
+def _snapshot_state() -> Tuple[int, List[Dict], Dict]:
+    """
+    Consistent (lsn, votes, state) view of the store for the vote log
+    snapshots. Holding the user stripes keeps half-applied votes out of the
+    preference profiles saved in `state`.
+    """
+    with _USER_LOCKS.hold_all(), _LOCK:
+        return _LOG.checkpoint(), _SNAPSHOT.votes(), {"profiles": _PROFILES.to_state()}
+
+
+def _log_locked(records: List[Dict]) -> int:
+    """Append records to the write-ahead log. Caller must hold _LOCK."""
+    if _LOG is None:
+        return 0
+    return _LOG.append(records)
+
+
+def _wait_for_commit(lsn: int) -> None:
+    """Block until the log record `lsn` is on disk (one fsync is shared by concurrent writers)."""
+    if _LOG is not None and lsn and WAIT_FOR_COMMIT:
+        _LOG.wait_durable(lsn)
+
+
+def _load_votes() -> None:
+    """Recover votes from the write-ahead log, or seed them from votes.json on first start."""
+    if _LOG is not None and _LOG.has_data():
+        votes_data = _LOG.recover()
+        profiles = (_LOG.recovered_state or {}).get("profiles")
+        covered = _LOG.recovered_snapshot_votes if profiles is not None else 0
+        with _exclusive():
+            _clear_locked()
+            if profiles is not None:
+                _PROFILES.load_state(profiles)
+            for position, vote in enumerate(votes_data):
+                _apply_vote(vote, profile=position >= covered)
+                _append_locked(vote)
+            _publish_locked()
+        print(f"Recovered {len(votes_data)} votes from {_LOG.directory}")
+        _LOG.start(_snapshot_state)
+        return
+
+    _load_votes_from_file()
+    if _LOG is not None:
+        _LOG.recover()
+        _LOG.start(_snapshot_state)
+        # Persist the seed so later restarts recover it together with the log.
+        _LOG.snapshot_now()
+
+
+Thread(target=_fold_ballot_changes_loop, name="vote-pairwise", daemon=True).start()
+_load_votes()
+if _LOG is not None:
+    atexit.register(_LOG.close)
 
 class VoteService:
     def __init__(self):
@@ -132,22 +431,160 @@ class VoteService:
 
 
 def reset_votes() -> None:
-    """Clear in-memory votes."""
-    with _LOCK:
-        _VOTES.clear()
+    """Clear all votes."""
+    with _exclusive():
+        _clear_locked()
+        _publish_locked()
+        lsn = _log_locked([{"op": "reset"}])
+    _wait_for_commit(lsn)
+    _notify(None)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _stamped(vote: Dict, now: str) -> Dict:
+    """Copy a vote, recording its ingestion time unless one is already set."""
+    stored = vote.copy()
+    stored.setdefault("created_at", now)
+    return stored
 
 
 def add_vote(vote: Dict) -> None:
     print("Adding vote:", vote)
-    """Add a single activity vote."""
-    with _LOCK:
-        _VOTES.append(vote.copy())
+    """
+    Add a single activity vote, stamped with its ingestion time.
+
+    A user has one vote per activity: voting again replaces the earlier vote
+    and adjusts the aggregates by the score difference.
+    """
+    stored = _stamped(vote, _now_iso())
+    with _writing([stored]):
+        _apply_vote(stored)
+        with _LOCK:
+            _append_locked(stored)
+            _publish_locked()
+            lsn = _log_locked([{"op": "add", "vote": stored}])
+    _wait_for_commit(lsn)
+    _notify(stored)
+
+
+def add_votes(votes: List[Dict]) -> int:
+    """
+    Add many activity votes at once (each one an upsert, like add_vote).
+
+    The stripes of all users and activities involved are taken once, and all
+    votes are appended under a single acquisition of the store lock and
+    written to the vote log as one batch, so they become visible and durable
+    together.
+    The whole batch shares one ingestion timestamp.
+
+    Returns:
+        Number of votes recorded
+    """
+    now = _now_iso()
+    stored = [_stamped(vote, now) for vote in votes]
+    if not stored:
+        return 0
+    with _writing(stored):
+        for vote in stored:
+            _apply_vote(vote)
+        with _LOCK:
+            for vote in stored:
+                _append_locked(vote)
+            _publish_locked()
+            lsn = _log_locked([{"op": "add", "vote": vote} for vote in stored])
+    _wait_for_commit(lsn)
+    for vote in stored:
+        _notify(vote)
+    return len(stored)
+
+
+def add_vote_listener(callback: Callable[[Optional[Dict]], None]) -> None:
+    """
+    Register a callback invoked after every write to the vote store.
+
+    The callback receives the stored vote (treat it as read-only), or None
+    when the store was reset. It runs on the writer's thread, so it should
+    be cheap or hand work off to another thread.
+    """
+    _LISTENERS.append(callback)
+
+
+def remove_vote_listener(callback: Callable[[Optional[Dict]], None]) -> None:
+    """Unregister a callback added with add_vote_listener."""
+    if callback in _LISTENERS:
+        _LISTENERS.remove(callback)
+
+
+def get_vote_version() -> int:
+    """Get the store's version counter, which increases on every write."""
+    return _VERSION
+
+
+def get_vote_snapshot() -> VoteSnapshot:
+    """
+    Get the latest published snapshot of the vote store.
+
+    O(1) and lock-free. Use one snapshot for several lookups that must agree
+    with each other. The vote dicts it returns are shared and read-only.
+    """
+    return _SNAPSHOT
+
+
+def get_user_profile(user_id: int) -> PreferenceProfile:
+    """
+    The user's preference profile: normalized score per voted activity and
+    mean per activity type. O(1); the profile is immutable.
+    """
+    return _PROFILES.get(user_id)
 
 
 def list_votes() -> List[Dict]:
-    """Get all votes."""
-    with _LOCK:
-        return [v.copy() for v in _VOTES]
+    """Get all votes (read-only dicts shared with the store)."""
+    return _SNAPSHOT.votes()
+
+
+def get_pairwise_matrix() -> Tuple[List[int], np.ndarray]:
+    """
+    Get the current pairwise preference matrix over all voted activities.
+
+    Each user's latest score per activity is treated as a ranked ballot
+    (higher score first, equal scores tied). The matrix is maintained as votes
+    arrive, so this only copies it (after folding in ballot changes the
+    background thread has not applied yet).
+
+    Returns:
+        (activity_ids, matrix) where matrix[i][j] counts the users preferring
+        activity_ids[i] over activity_ids[j]
+    """
+    with _PAIRWISE_LOCK:
+        _fold_ballot_changes_locked()
+        return list(_PAIRWISE.candidate_ids), _PAIRWISE.pairwise()
+
+
+def get_similar_activities(activity_id: int, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Get the activities most similar to one, by how co-voting users scored them.
+
+    Neighbours are kept up to date as votes arrive (see `ItemSimilarityMatrix`),
+    so this is a lookup of at most `votes.item_similarity.top_n` entries.
+
+    Returns:
+        List of {activity_id, similarity, co_votes} sorted by similarity desc.
+    """
+    with _PAIRWISE_LOCK:
+        _fold_ballot_changes_locked()
+        neighbours = _ITEM_SIMILARITY.neighbours(activity_id, limit)
+        return [
+            {
+                "activity_id": aid,
+                "similarity": round(similarity, 4),
+                "co_votes": _ITEM_SIMILARITY.co_votes(activity_id, aid),
+            }
+            for aid, similarity in neighbours
+        ]
 
 
 def get_activity_votes(activity_id: int) -> List[Dict]:
@@ -158,37 +595,87 @@ def get_activity_votes(activity_id: int) -> List[Dict]:
         activity_id: The ID of the activity to get votes for
         
     Returns:
-        List of vote dictionaries for the specified activity.
+        List of vote dictionaries (read-only) for the specified activity.
         Returns empty list if no votes exist for this activity.
     """
-    with _LOCK:
-        return [v.copy() for v in _VOTES if v.get("activity_id") == activity_id]
+    return _SNAPSHOT.activity_votes(activity_id)
 
 
-def get_activity_ranking() -> List[Dict]:
-    """
-    Get activities ranked by average score.
-    Returns list of {activity_id, average_score, vote_count} sorted by score desc.
+def get_user_votes(user_id: int) -> List[Dict]:
     """
-    with _LOCK:
-        votes = [v.copy() for v in _VOTES]
-    
-    activity_scores = {}
-    for v in votes:
-        aid = v.get("activity_id")
-        score = v.get("score")
-        if aid not in activity_scores:
-            activity_scores[aid] = []
-        activity_scores[aid].append(score)
+    Get all votes cast by a specific user.
     
+    Args:
+        user_id: The ID of the user to get votes for
+        
+    Returns:
+        List of vote dictionaries (read-only) cast by the user.
+        Returns empty list if the user has not voted.
+    """
+    return _SNAPSHOT.user_votes(user_id)
+
+
+def get_vote(user_id: int, activity_id: int) -> Optional[Dict]:
+    """
+    Get a user's current vote for an activity in O(1).
+
+    Returns:
+        The vote dictionary (read-only), or None if the user has not voted for it.
+    """
+    return _SNAPSHOT.get(user_id, activity_id)
+
+
+def get_activity_ranking(
+    limit: Optional[int] = None,
+    min_votes: Optional[int] = None,
+    prior_weight: Optional[float] = None,
+    prior_mean: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Get activities ranked by Bayesian-smoothed average score.
+
+    The smoothed score is (prior_weight * prior_mean + score sum) / (prior_weight + votes),
+    so an activity with a handful of perfect votes does not outrank one with
+    hundreds of 9s. Scores come from running aggregates, and only the top
+    `limit` are selected (heap-based partial sort), so this never rescans votes.
+
+    Args:
+        limit: Return at most this many activities (all if None)
+        min_votes: Leave out activities with fewer votes (defaults to votes.ranking.min_votes)
+        prior_weight: Number of virtual prior votes (defaults to votes.ranking.prior_weight)
+        prior_mean: Prior score (defaults to votes.ranking.prior_mean, else the mean of all votes)
+
+    Returns:
+        List of {activity_id, score, average_score, vote_count} sorted by score desc.
+    """
+    min_votes = MIN_VOTES if min_votes is None else min_votes
+    prior_weight = PRIOR_WEIGHT if prior_weight is None else prior_weight
+    stats = list(_SCORE_STATS.items())
+    score_sum = sum(total for total, _ in _SCORE_TOTALS)
+    score_count = sum(count for _, count in _SCORE_TOTALS)
+    if prior_mean is None:
+        prior_mean = PRIOR_MEAN
+    if prior_mean is None:
+        prior_mean = score_sum / score_count if score_count else 0.0
+    prior_total = prior_weight * prior_mean
+
+    def smoothed(item):
+        total, count = item[1]
+        return (prior_total + total) / (prior_weight + count), count
+
+    candidates = (item for item in stats if item[1][1] >= max(min_votes, 1))
+    if limit is None:
+        top = sorted(candidates, key=smoothed, reverse=True)
+    else:
+        top = heapq.nlargest(limit, candidates, key=smoothed)
+
     ranking = []
-    for aid, scores in activity_scores.items():
-        avg = sum(scores) / len(scores)
+    for item in top:
+        aid, (total, count) = item
         ranking.append({
             "activity_id": aid,
-            "average_score": round(avg, 2),
-            "vote_count": len(scores)
+            "score": round(smoothed(item)[0], 2),
+            "average_score": round(total / count, 2),
+            "vote_count": count
         })
-    
-    ranking.sort(key=lambda x: x["average_score"], reverse=True)
     return ranking
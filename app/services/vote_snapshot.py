@@ -0,0 +1,127 @@
+"""
+Immutable, versioned views of the vote store.
+
+Writers append to a `VoteGeneration`: an append-only list of votes plus
+posting lists of vote positions per activity and per user, and an index of
+the latest position per (user_id, activity_id). A user can hold one vote per
+activity: voting again appends the new vote and records, at the old
+position, the position that replaced it.
+
+After each write writers publish a new `VoteSnapshot`, which is only
+(version, generation, size, live count). Readers take the current snapshot
+with a single reference read, hold no lock and copy nothing. A snapshot only
+sees the first `size` positions, and a vote replaced at a position beyond
+`size` still counts as current for it, so snapshots are unaffected by later
+writes. Resetting or compacting the store starts a fresh generation, so
+snapshots handed out earlier are never disturbed.
+
+Vote dicts are shared between the store and every snapshot and must be
+treated as read-only.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+
+class VoteGeneration:
+    """Append-only vote storage shared by all snapshots of one generation."""
+
+    __slots__ = ("votes", "replaced_by", "by_activity", "by_user", "by_key", "superseded")
+
+    def __init__(self):
+        self.votes: List[Dict] = []
+        # Position of the vote that replaced each vote, or None while it is current.
+        self.replaced_by: List[Optional[int]] = []
+        self.by_activity: Dict[int, List[int]] = {}
+        self.by_user: Dict[int, List[int]] = {}
+        self.by_key: Dict[Tuple[int, int], int] = {}
+        self.superseded = 0
+
+    @property
+    def live(self) -> int:
+        """Number of current (not superseded) votes."""
+        return len(self.votes) - self.superseded
+
+    def append(self, vote: Dict) -> Optional[Dict]:
+        """
+        Append a vote, replacing the user's current vote for the same activity.
+        Writers must serialize calls.
+
+        Returns:
+            The vote that was replaced, or None
+        """
+        position = len(self.votes)
+        key = (vote.get("user_id"), vote.get("activity_id"))
+        previous = self.by_key.get(key)
+        self.votes.append(vote)
+        self.replaced_by.append(None)
+        self.by_key[key] = position
+        self.by_activity.setdefault(key[1], []).append(position)
+        self.by_user.setdefault(key[0], []).append(position)
+        if previous is None:
+            return None
+        self.replaced_by[previous] = position
+        self.superseded += 1
+        return self.votes[previous]
+
+    def compacted(self) -> "VoteGeneration":
+        """A new generation holding only the current votes, in their original order."""
+        generation = VoteGeneration()
+        for vote, replaced in zip(self.votes, self.replaced_by):
+            if replaced is None:
+                generation.append(vote)
+        return generation
+
+
+class VoteSnapshot:
+    """Point-in-time, read-only view of a `VoteGeneration`."""
+
+    __slots__ = ("version", "_generation", "_size", "_live")
+
+    def __init__(self, version: int, generation: VoteGeneration, size: int, live: int):
+        self.version = version
+        self._generation = generation
+        self._size = size
+        self._live = live
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _current(self, position: int) -> bool:
+        replaced = self._generation.replaced_by[position]
+        return replaced is None or replaced >= self._size
+
+    def votes(self) -> List[Dict]:
+        """All current votes in the snapshot, oldest first."""
+        votes = self._generation.votes
+        if self._live == self._size:
+            return votes[:self._size]
+        return [votes[p] for p in range(self._size) if self._current(p)]
+
+    def _select(self, positions: Optional[List[int]]) -> List[Dict]:
+        if not positions:
+            return []
+        # Positions are increasing, so entries appended after the snapshot are a suffix.
+        end = bisect_left(positions, self._size)
+        votes = self._generation.votes
+        return [votes[p] for p in positions[:end] if self._current(p)]
+
+    def get(self, user_id: int, activity_id: int) -> Optional[Dict]:
+        """The user's current vote for an activity, or None. O(1) unless it changed after the snapshot."""
+        position = self._generation.by_key.get((user_id, activity_id))
+        if position is None:
+            return None
+        if position >= self._size:
+            # Replaced after this snapshot was taken: find the version it saw.
+            return next(
+                (v for v in reversed(self.user_votes(user_id)) if v.get("activity_id") == activity_id),
+                None,
+            )
+        return self._generation.votes[position]
+
+    def activity_votes(self, activity_id: int) -> List[Dict]:
+        """Votes for one activity."""
+        return self._select(self._generation.by_activity.get(activity_id))
+
+    def user_votes(self, user_id: int) -> List[Dict]:
+        """Votes cast by one user."""
+        return self._select(self._generation.by_user.get(user_id))
@@ -0,0 +1,129 @@
+"""
+Benchmark per-activity scoring vs a compiled ScoringPlan.
+
+Generates synthetic candidate activities (names and descriptions drawn from
+a small vocabulary that includes the user's interests) and ranks them for
+one user with:
+
+- "per-activity": the previous `_score_and_sort_activities`, which mapped
+  the interests to types and lowercased every name and description once per
+  interest, then sorted every candidate;
+- "plan": `ScoringPlan.for_user(...).rank(...)`, compiled once per request,
+  sorting every candidate;
+- "plan top-k": the same with `limit`, selecting the best k with a heap.
+
+Checks that all three return the same order, then reports the time per
+request.
+
+Usage:
+    python scripts/benchmarks/bench_activity_scoring.py
+    python scripts/benchmarks/bench_activity_scoring.py --candidates 10000 --k 20 --repeat 20
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.models.db.activity import Activity, ActivityType
+from app.services.activity_scoring import ScoringPlan
+from app.services.user_features import features_for
+
+WORDS = ["live", "music", "art", "night", "family", "run", "hiking", "tour", "open", "market", "football", "talk"]
+CITIES = ["Paris", "Lyon", "Nice", "Lille"]
+
+
+def make_activities(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    types = list(ActivityType)
+    return [
+        Activity(
+            id=i,
+            name=" ".join(rng.choice(WORDS, size=3)).title(),
+            type=types[rng.integers(len(types))],
+            location=CITIES[rng.integers(len(CITIES))],
+            is_indoor=bool(rng.integers(2)),
+            date="2026-10-19",
+            description=" ".join(rng.choice(WORDS, size=12)) if rng.random() < 0.8 else None,
+        )
+        for i in range(n)
+    ]
+
+
+def per_activity_score_and_sort(activities, user):
+    """The scoring loop as it was before the plan (one pass per activity and interest)."""
+    features = features_for(user)
+    interest_mapping = {
+        "music": ActivityType.cultural, "art": ActivityType.cultural, "theater": ActivityType.cultural,
+        "museum": ActivityType.cultural, "culture": ActivityType.cultural, "sports": ActivityType.sports,
+        "fitness": ActivityType.sports, "football": ActivityType.sports, "basketball": ActivityType.sports,
+        "running": ActivityType.sports, "community": ActivityType.community, "volunteer": ActivityType.community,
+        "social": ActivityType.community, "cultural": ActivityType.cultural, "hiking": ActivityType.sports,
+    }
+    user_activity_types = []
+    for interest in features.interests_lower:
+        if interest.lower() in interest_mapping and interest_mapping[interest.lower()] not in user_activity_types:
+            user_activity_types.append(interest_mapping[interest.lower()])
+    user_activity_types = user_activity_types or list(ActivityType)
+
+    scored_activities = []
+    for activity in activities:
+        score = 1.0
+        for interest in features.interests_lower:
+            if interest in activity.name.lower() or interest in (activity.description or "").lower():
+                score += 2.0
+        if activity.type in user_activity_types:
+            score += 1.5
+        if user["activity_preference"] == "outdoor" and not activity.is_indoor:
+            score += 1.0
+        elif user["activity_preference"] == "indoor" and activity.is_indoor:
+            score += 1.0
+        if features.city and features.city == activity.location.lower():
+            score += 0.5
+        scored_activities.append((score, activity))
+    scored_activities.sort(key=lambda x: x[0], reverse=True)
+    return [activity for score, activity in scored_activities]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=10_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    activities = make_activities(args.candidates)
+    user = {
+        "id": 1,
+        "interests": ["Music", "hiking", "Art", "cooking", "football"],
+        "city": "Paris",
+        "activity_preference": "outdoor",
+    }
+
+    expected = per_activity_score_and_sort(activities, user)
+    assert ScoringPlan.for_user(user).rank(activities) == expected
+    assert ScoringPlan.for_user(user).rank(activities, limit=args.k) == expected[:args.k]
+
+    baseline = timed(lambda: per_activity_score_and_sort(activities, user), args.repeat)
+    plan = timed(lambda: ScoringPlan.for_user(user).rank(activities), args.repeat)
+    top_k = timed(lambda: ScoringPlan.for_user(user).rank(activities, limit=args.k), args.repeat)
+
+    print(f"{args.candidates} candidates, {len(user['interests'])} interests, k={args.k}")
+    print(f"per-activity: {baseline * 1000:8.2f} ms/request")
+    print(f"plan:         {plan * 1000:8.2f} ms/request  ({baseline / plan:.1f}x)")
+    print(f"plan top-k:   {top_k * 1000:8.2f} ms/request  ({baseline / top_k:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark the dict-based VoteService against the NumPy Schulze engine.
+
+Generates random partial ballots, checks that both engines produce the same
+ranking and prints the time spent in each stage.
+
+Usage:
+    python scripts/benchmarks/bench_condorcet.py
+    python scripts/benchmarks/bench_condorcet.py --candidates 50 100 200 --ballots 500
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.services.vote_service import VoteService
+from app.services.condorcet_engine import VectorizedVoteService
+
+
+def make_votes(n_candidates: int, n_ballots: int, seed: int = 0):
+    """Random ballots ranking between 1 and n_candidates activities."""
+    rng = random.Random(seed)
+    candidates = list(range(1, n_candidates + 1))
+    return [
+        {"user_id": uid, "activity_ranking": rng.sample(candidates, rng.randint(1, n_candidates))}
+        for uid in range(n_ballots)
+    ]
+
+
+def time_engine(service, votes):
+    """Run the full pipeline and return (ranking, {stage: seconds})."""
+    timings = {}
+    start = time.perf_counter()
+    service.parse(votes)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service.score()
+    timings["score"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service.build_graph()
+    timings["build_graph"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranking = service.order_votes()
+    timings["order_votes"] = time.perf_counter() - start
+    return ranking, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--ballots", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'candidates':>10} {'engine':>10} {'parse':>9} {'score':>9} {'graph':>9} {'order':>9} {'total':>9}")
+    for n in args.candidates:
+        votes = make_votes(n, args.ballots)
+        dict_ranking, dict_times = time_engine(VoteService(), votes)
+        np_ranking, np_times = time_engine(VectorizedVoteService(), votes)
+        if dict_ranking != np_ranking:
+            raise SystemExit(f"Rankings differ for {n} candidates")
+
+        for name, times in (("dict", dict_times), ("numpy", np_times)):
+            print(
+                f"{n:>10} {name:>10} "
+                + " ".join(f"{times[stage]:>9.4f}" for stage in ("parse", "score", "build_graph", "order_votes"))
+                + f" {sum(times.values()):>9.4f}"
+            )
+        speedup = sum(dict_times.values()) / max(sum(np_times.values()), 1e-9)
+        print(f"{n:>10} {'speedup':>10} {speedup:>49.1f}x")
+
+
+if __name__ == "__main__":
+    main()
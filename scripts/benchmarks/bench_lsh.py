@@ -0,0 +1,106 @@
+"""
+Benchmark exhaustive vs. LSH-candidate similar-user search.
+
+Generates synthetic users (interests drawn from a skewed vocabulary, one of
+a few hundred cities), then for a sample of query users compares the
+exhaustive top-k of `UserSimilarityIndex` with the top-k over the MinHash LSH
+candidates, re-ranked with the same exact score: scored from the shared
+index ("lsh") and encoded per query as right after a profile write
+("lsh-fresh"). Reports latency per query and recall@k (share of the
+exhaustive top-k that the LSH search also returns).
+
+Usage:
+    python scripts/benchmarks/bench_lsh.py
+    python scripts/benchmarks/bench_lsh.py --users 200000 --queries 200 --bands 16 --num-perm 64
+"""
+
+import sys
+import time
+import argparse
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.services.lsh_index import MinHashLSH
+from app.services.similarity_engine import UserSimilarityIndex
+from app.services.user_features import build_features
+
+
+def make_users(n_users: int, n_interests: int, n_cities: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, n_interests + 1)
+    weights /= weights.sum()
+    users = []
+    for uid in range(1, n_users + 1):
+        interests = rng.choice(n_interests, size=rng.integers(1, 7), replace=False, p=weights)
+        users.append(build_features({
+            "id": uid,
+            "interests": [f"interest{i}" for i in interests],
+            "city": f"city{rng.integers(n_cities)}",
+            "country": f"country{rng.integers(20)}",
+            "birth_date": date(int(rng.integers(1950, 2008)), 1, 1),
+            "gender": ["male", "female", None][rng.integers(3)],
+            "activity_preference": ["indoor", "outdoor", "either"][rng.integers(3)],
+        }))
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--interests", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--bands", type=int, default=16)
+    args = parser.parse_args()
+
+    users = make_users(args.users, args.interests, args.cities)
+    queries = users[:args.queries]
+    features = {u.id: u for u in users}
+
+    start = time.perf_counter()
+    index = UserSimilarityIndex(users)
+    build_exact = time.perf_counter() - start
+    start = time.perf_counter()
+    lsh = MinHashLSH(num_perm=args.num_perm, bands=args.bands)
+    lsh.rebuild(users)
+    build_lsh = time.perf_counter() - start
+    print(f"{args.users} users, {args.queries} queries, k={args.k}")
+    print(f"build: exhaustive index {build_exact:.2f}s, LSH {build_lsh:.2f}s")
+
+    exact_time = lsh_time = fresh_time = 0.0
+    hits = total = candidates = 0
+    for query in queries:
+        start = time.perf_counter()
+        expected = index.top_k(query, args.k, exclude_id=query.id)
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = lsh.candidates(query)
+        got = index.top_k(query, args.k, exclude_id=query.id, rows=index.rows_for(found))
+        lsh_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fresh = UserSimilarityIndex([features[uid] for uid in lsh.candidates(query)])
+        fresh.top_k(query, args.k, exclude_id=query.id)
+        fresh_time += time.perf_counter() - start
+
+        candidates += len(found)
+        hits += len({uid for uid, _ in expected} & {uid for uid, _ in got})
+        total += len(expected)
+
+    print(f"{'search':>10} {'ms/query':>9} {'candidates':>11} {'recall@k':>9}")
+    print(f"{'exhaustive':>10} {1000 * exact_time / len(queries):>9.2f} {args.users:>11} {1.0:>9.3f}")
+    print(f"{'lsh':>10} {1000 * lsh_time / len(queries):>9.2f} "
+          f"{candidates // len(queries):>11} {hits / max(total, 1):>9.3f}")
+    print(f"{'lsh-fresh':>10} {1000 * fresh_time / len(queries):>9.2f} "
+          f"{candidates // len(queries):>11} {hits / max(total, 1):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
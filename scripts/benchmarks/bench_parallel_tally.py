@@ -0,0 +1,68 @@
+"""
+Benchmark the pairwise tally on one core vs. a process pool.
+
+Builds a random (ballots x candidates) position matrix and times the tally
+with 1, 2, 4, ... worker processes. The pool is warmed up first, so the
+timings cover the shared-memory copy, the partial tallies and the final sum.
+Speedup is bounded by the number of physical cores.
+
+Usage:
+    python scripts/benchmarks/bench_parallel_tally.py
+    python scripts/benchmarks/bench_parallel_tally.py --ballots 2000000 --candidates 40 --workers 1 2 4 8
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.services.parallel_tally import count_pairwise, parallel_count_pairwise, shutdown_pool
+
+
+def make_positions(n_ballots: int, n_candidates: int, seed: int = 0) -> np.ndarray:
+    """Random partial ballots: each ranks a random prefix of a shuffled candidate list."""
+    rng = np.random.default_rng(seed)
+    positions = np.argsort(rng.random((n_ballots, n_candidates)), axis=1).astype(np.int32)
+    ranked = rng.integers(1, n_candidates + 1, size=(n_ballots, 1))
+    positions[positions >= ranked] = np.iinfo(np.int32).max
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ballots", type=int, default=1_000_000)
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    positions = make_positions(args.ballots, args.candidates)
+    print(f"{args.ballots} ballots, {args.candidates} candidates, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+
+    start = time.perf_counter()
+    expected = count_pairwise(positions)
+    baseline = time.perf_counter() - start
+    try:
+        for workers in args.workers:
+            if workers > 1:
+                parallel_count_pairwise(positions[:workers], workers)  # start the pool
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                pairwise = parallel_count_pairwise(positions, workers)
+                best = min(best, time.perf_counter() - start)
+            if not (pairwise == expected).all():
+                raise SystemExit(f"Tally with {workers} workers differs from the serial tally")
+            print(f"{workers:>8} {best:>9.3f} {baseline / best:>7.2f}x")
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark vote and user store throughput under contention.
+
+Worker threads hammer the stores the way the threadpool behind the sync
+FastAPI endpoints does: vote writes for distinct users, user updates, and
+lock-free reads. Each workload runs twice: through the striped stores as
+they are, and with every call funnelled through one global lock, which is
+how the stores behaved before lock striping.
+
+Score votes also update the pairwise matrix and the item-item similarities.
+Writers only queue their ballot changes for the "vote-pairwise" thread, and
+each vote run ends with `get_pairwise_matrix()`, which folds in whatever is
+still queued: the throughput counts that work, not just the enqueueing.
+
+With the GIL, pure-Python critical sections cannot run in parallel either
+way; the gain comes from writers no longer queueing behind each other while
+one of them is inside a section that releases the GIL (NumPy updates, the
+vote log) and from readers never waiting on writers. "scaling" is the
+striped throughput relative to the first thread count.
+
+Usage:
+    python scripts/benchmarks/bench_store_contention.py
+    python scripts/benchmarks/bench_store_contention.py --threads 1 4 16 --ops 20000 --durable
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault("VOTE_STORAGE_DIR", tempfile.mkdtemp(prefix="bench-votes-"))
+
+from app.services import user_service, vote_service
+
+
+def run_threads(n_threads: int, n_ops: int, op, settle=None) -> float:
+    """Split n_ops across n_threads calling op(thread, i), then settle(); return ops/second."""
+    per_thread = n_ops // n_threads
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker(thread):
+        barrier.wait()
+        for i in range(per_thread):
+            op(thread, i)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    # add_vote logs every vote; keep that out of the output.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        if settle is not None:
+            settle()
+    return per_thread * n_threads / (time.perf_counter() - start)
+
+
+def serialized(op):
+    """Wrap op so that every call holds one global lock (the pre-striping behaviour)."""
+    lock = threading.Lock()
+
+    def locked(thread, i):
+        with lock:
+            op(thread, i)
+    return locked
+
+
+def vote_writes(n_activities: int):
+    def op(thread, i):
+        vote_service.add_vote({
+            "user_id": thread * 1_000_000 + i // n_activities,
+            "activity_id": i % n_activities,
+            "score": 1 + i % 10,
+        })
+    return op
+
+
+def mixed_votes(n_activities: int):
+    """One write for every nine reads."""
+    write = vote_writes(n_activities)
+
+    def op(thread, i):
+        if i % 10 == 0:
+            write(thread, i)
+        else:
+            vote_service.get_activity_votes(i % n_activities)
+            vote_service.get_user_votes(thread * 1_000_000)
+    return op
+
+
+def user_updates(user_ids):
+    def op(thread, i):
+        uid = user_ids[(thread * 7919 + i) % len(user_ids)]
+        if i % 4 == 0:
+            user_service.update_user(uid, {"city": f"City {i % 50}"})
+        else:
+            user_service.get_user_by_id(uid)
+    return op
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--ops", type=int, default=16000, help="operations per run")
+    parser.add_argument("--activities", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--durable", action="store_true",
+                        help="wait for the vote log fsync on every write (as configured in production)")
+    args = parser.parse_args()
+
+    vote_service.WAIT_FOR_COMMIT = args.durable
+    user_service.reset_store()
+    user_ids = [user_service.create_user({"username": f"bench{i}"})["id"] for i in range(args.users)]
+
+    workloads = [
+        ("vote writes", lambda: vote_writes(args.activities), vote_service.get_pairwise_matrix),
+        ("votes 90% reads", lambda: mixed_votes(args.activities), vote_service.get_pairwise_matrix),
+        ("users 75% reads", lambda: user_updates(user_ids), None),
+    ]
+    print(f"{args.ops} ops per run, durable vote writes: {args.durable}")
+    print(f"{'workload':<18}{'threads':>8}{'global lock':>14}{'striped':>12}{'speedup':>9}{'scaling':>9}")
+    for name, make_op, settle in workloads:
+        first = None
+        for n_threads in args.threads:
+            vote_service.reset_votes()
+            baseline = run_threads(n_threads, args.ops, serialized(make_op()), settle)
+            vote_service.reset_votes()
+            striped = run_threads(n_threads, args.ops, make_op(), settle)
+            first = first or striped
+            print(f"{name:<18}{n_threads:>8}{baseline:>12.0f}/s{striped:>10.0f}/s"
+                  f"{striped / baseline:>8.2f}x{striped / first:>8.2f}x")
+    vote_service.reset_votes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark the memory-bounded user cache: resident memory of every profile
+as a dict vs. a bounded hot tier, and read latency / hit rate under a
+skewed workload with misses loaded from the SQLite cold tier.
+
+Also reports the memory of the per-user state that is not bounded by the
+cache and still grows with the number of users: the feature cache, the
+city/interest postings, the MinHash LSH buckets and the similarity index.
+
+Usage:
+    python scripts/benchmarks/bench_user_cache.py
+    python scripts/benchmarks/bench_user_cache.py --users 1000000 --cache 100000
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.services.lsh_index import MinHashLSH
+from app.services.similarity_engine import UserSimilarityIndex
+from app.services.user_cache import UserCache
+from app.services.user_features import build_features
+from app.services.user_index import UserIndex
+from app.services.user_store import UserStore
+
+
+def make_user(uid: int) -> dict:
+    return {
+        "id": uid,
+        "username": f"user{uid}",
+        "email": f"user{uid}@example.com",
+        "first_name": "First",
+        "last_name": f"Last{uid}",
+        "birth_date": "1990-01-01",
+        "gender": "female",
+        "phone_number": f"+1555{uid:07d}",
+        "country": "FR",
+        "city": "Paris",
+        "interests": ["music", "hiking", "art"],
+        "activity_preference": "either",
+        "role": "subscriber",
+        "created_at": "2025-11-01T08:00:00Z",
+        "updated_at": "2025-11-01T08:00:00Z",
+    }
+
+
+def measure(build) -> float:
+    """MiB allocated by build() and still held by what it returns."""
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--cache", type=int, default=20000)
+    parser.add_argument("--reads", type=int, default=100000)
+    args = parser.parse_args()
+
+    all_dicts = measure(lambda: {uid: make_user(uid) for uid in range(1, args.users + 1)})
+
+    def fill_cache():
+        cache = UserCache(args.cache)
+        for uid in range(1, args.users + 1):
+            cache.put(make_user(uid))
+        return cache
+
+    bounded = measure(fill_cache)
+    print(f"{args.users} users as dicts: {all_dicts:.1f} MiB; hot tier of {args.cache}: {bounded:.1f} MiB")
+
+    def build_derived():
+        features = [build_features(make_user(uid)) for uid in range(1, args.users + 1)]
+        index, lsh = UserIndex(), MinHashLSH()
+        index.rebuild(features)
+        lsh.rebuild(features)
+        return features, index, lsh, UserSimilarityIndex(features)
+
+    derived = measure(build_derived)
+    print(f"per-user state kept for all {args.users} users (features, postings, LSH, similarity): "
+          f"{derived:.1f} MiB ({derived * 2**20 / args.users:.0f} bytes/user)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = UserStore(Path(directory) / "users.db")
+        store.replace_all(make_user(uid) for uid in range(1, args.users + 1))
+        cache = UserCache(args.cache)
+        rng = random.Random(0)
+        # Skewed reads: 80% of requests come from the 10% most active users.
+        active = max(1, args.users // 10)
+        reads = [
+            rng.randint(1, active) if rng.random() < 0.8 else rng.randint(1, args.users)
+            for _ in range(args.reads)
+        ]
+        start = time.perf_counter()
+        for uid in reads:
+            if cache.get(uid) is None:
+                user = store.get(uid)
+                if user is not None:
+                    cache.put(user, loaded=True)
+        elapsed = time.perf_counter() - start
+        stats = cache.stats()
+        print(
+            f"{args.reads} reads: {elapsed / args.reads * 1e6:.1f} us/read, hit rate {stats['hit_rate']:.1%}, "
+            f"{stats['loads']} cold loads, {stats['evictions']} evictions"
+        )
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
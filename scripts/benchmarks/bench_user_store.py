@@ -0,0 +1,98 @@
+"""
+Benchmark the durable user store: write-behind batches vs. one commit per
+write, and indexed lookups on a large table.
+
+Writer threads update random profiles like PUT /users/{id} does. The
+baseline commits each write to SQLite on the caller's thread; the
+write-behind store only queues it, and its flusher commits batches.
+
+Usage:
+    python scripts/benchmarks/bench_user_store.py
+    python scripts/benchmarks/bench_user_store.py --users 1000000 --writes 50000
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.services.user_store import UserStore
+
+CITIES = [f"City {i}" for i in range(500)]
+INTERESTS = [f"interest{i}" for i in range(200)]
+
+
+def make_user(uid: int, rng: random.Random) -> dict:
+    return {
+        "id": uid,
+        "username": f"user{uid}",
+        "email": f"user{uid}@example.com",
+        "city": rng.choice(CITIES),
+        "interests": rng.sample(INTERESTS, 3),
+    }
+
+
+def run_writes(n_threads: int, n_writes: int, n_users: int, write) -> float:
+    """Split n_writes across n_threads calling write(user); return writes/second."""
+    per_thread = n_writes // n_threads
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            write(make_user(rng.randrange(1, n_users + 1), rng))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return per_thread * n_threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--writes", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = UserStore(Path(directory) / "users.db")
+        start = time.perf_counter()
+        store.replace_all(make_user(uid, rng) for uid in range(1, args.users + 1))
+        print(f"Loaded {args.users} users in {time.perf_counter() - start:.1f}s")
+
+        def commit_per_write(user):
+            with store._db_lock, store._db:
+                store._db.execute("BEGIN")
+                store._db.execute("DELETE FROM user_interests WHERE user_id = ?", (user["id"],))
+                store._insert([user])
+
+        sync = run_writes(args.threads, args.writes, args.users, commit_per_write)
+        behind = run_writes(args.threads, args.writes, args.users, store.put)
+        store.flush()
+        print(f"{'commit per write':>18} {sync:>10.0f} writes/s")
+        print(f"{'write-behind':>18} {behind:>10.0f} writes/s  ({behind / sync:.0f}x, {store.commits} commits)")
+
+        lookups = 2000
+        start = time.perf_counter()
+        for _ in range(lookups):
+            store.find_ids(username=f"USER{rng.randrange(1, args.users + 1)}")
+        by_username = (time.perf_counter() - start) / lookups * 1e6
+        start = time.perf_counter()
+        for _ in range(lookups // 10):
+            store.find_ids(city=rng.choice(CITIES), interest=rng.choice(INTERESTS))
+        by_city_interest = (time.perf_counter() - start) / (lookups // 10) * 1e6
+        print(f"find_ids(username): {by_username:.0f} us, find_ids(city, interest): {by_city_interest:.0f} us")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark durable vote writes: group commit vs. one fsync per vote.
+
+Each writer thread appends votes and waits until they are on disk, like
+POST /vote/ does. The baseline takes a lock, appends one line and fsyncs
+for every vote.
+
+Usage:
+    python scripts/benchmarks/bench_vote_log.py
+    python scripts/benchmarks/bench_vote_log.py --threads 1 8 32 --votes 4000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.services.vote_log import VoteLog
+
+
+def run_threads(n_threads: int, n_votes: int, write) -> float:
+    """Split n_votes across n_threads calling write(vote); return votes/second."""
+    per_thread = n_votes // n_threads
+
+    def worker(user_id):
+        for activity_id in range(per_thread):
+            write({"user_id": user_id, "activity_id": activity_id, "score": 5})
+
+    threads = [threading.Thread(target=worker, args=(uid,)) for uid in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return per_thread * n_threads / (time.perf_counter() - start)
+
+
+def bench_fsync_per_write(directory: Path, n_threads: int, n_votes: int) -> float:
+    lock = threading.Lock()
+    with open(directory / "naive.log", "ab") as f:
+        def write(vote):
+            with lock:
+                f.write(json.dumps(vote).encode() + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+        return run_threads(n_threads, n_votes, write)
+
+
+def bench_group_commit(directory: Path, n_threads: int, n_votes: int) -> float:
+    log = VoteLog(directory)
+    log.recover()
+    log.start(lambda: (log.checkpoint(), []))
+
+    def write(vote):
+        log.wait_durable(log.append([{"op": "add", "vote": vote}]))
+
+    rate = run_threads(n_threads, n_votes, write)
+    log.close()
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--votes", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'fsync/write':>14} {'group commit':>14} {'speedup':>8}")
+    for n_threads in args.threads:
+        with tempfile.TemporaryDirectory() as naive_dir, tempfile.TemporaryDirectory() as log_dir:
+            naive = bench_fsync_per_write(Path(naive_dir), n_threads, args.votes)
+            grouped = bench_group_commit(Path(log_dir), n_threads, args.votes)
+        print(f"{n_threads:>8} {naive:>12.0f}/s {grouped:>12.0f}/s {grouped / naive:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
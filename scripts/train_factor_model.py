@@ -0,0 +1,40 @@
+"""
+Offline job: train the collaborative-filtering factor model on the vote store.
+
+Reads the votes from the vote store's write-ahead log (`votes.storage.directory`,
+or VOTE_STORAGE_DIR) without opening the store, so it can run next to the API
+processes writing to it. Factorizes the user x activity scores with ALS and
+publishes the model to `recommendations.factor_model.path` (or
+FACTOR_MODEL_PATH). Running API processes load the new version on their next
+recommendation request.
+
+Usage:
+    python scripts/train_factor_model.py
+    python scripts/train_factor_model.py --factors 32 --iterations 20 --regularization 0.05
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.factor_model import FACTORS, ITERATIONS, REGULARIZATION, train_from_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factors", type=int, default=FACTORS)
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--regularization", type=float, default=REGULARIZATION)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = train_from_log(factors=args.factors, iterations=args.iterations, regularization=args.regularization)
+    print(f"Trained factor model v{model.version} on {len(model.user_ids)} users up to vote log LSN "
+          f"{model.vote_version} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
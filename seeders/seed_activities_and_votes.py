@@ -85,7 +85,7 @@ def seed_votes():
     """Have existing users vote on the activities."""
     print("\nSeeding votes...")
 
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
 
     user_service._ensure_loaded()
     users = user_service.list_users()
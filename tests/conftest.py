@@ -0,0 +1,31 @@
+"""
+Shared test setup: keep persistent stores out of app/data.
+
+Runs before any test module imports the app, so the services open their
+on-disk storage in a throwaway directory.
+"""
+import os
+import tempfile
+
+import pytest
+
+_STORAGE_ROOT = tempfile.mkdtemp(prefix="weather-app-tests-")
+os.environ.setdefault("VOTE_STORAGE_DIR", os.path.join(_STORAGE_ROOT, "vote_log"))
+os.environ.setdefault("FACTOR_MODEL_PATH", os.path.join(_STORAGE_ROOT, "factor_model.npz"))
+os.environ.setdefault("USER_STORE_PATH", os.path.join(_STORAGE_ROOT, "users.db"))
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """A known admin activity catalog: 100 is cultural, 101 is sports."""
+    from app.models.db.activity import Activity
+    from app.routes import admin
+
+    monkeypatch.setattr(admin, "admin_activities", [
+        Activity(id=100, name="Jazz", type="cultural", location="Paris", date="2025-01-01", is_indoor=True),
+        Activity(id=101, name="Yoga", type="sports", location="Paris", date="2025-01-01", is_indoor=False),
+    ])
+    admin.admin_activities_version += 1
+    yield
+    # Bumped again (not restored) so nothing cached for the test catalog stays valid.
+    admin.admin_activities_version += 1
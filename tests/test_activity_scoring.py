@@ -0,0 +1,62 @@
+"""
+Tests for the per-request activity scoring plan.
+"""
+from app.models.db.activity import Activity, ActivityType
+from app.models.db.user import User
+from app.models.response.weather_response import WeatherResponse
+from app.services import activities_service
+from app.services.activity_scoring import ScoringPlan, map_interests_to_activity_types
+
+USER = {"id": 1, "interests": ["Music", "hiking"], "city": "Paris", "activity_preference": "outdoor"}
+
+
+def activity(i, name, type=ActivityType.other, location="Lyon", is_indoor=True, description=None):
+    return Activity(id=i, name=name, type=type, location=location, is_indoor=is_indoor, date="2025-01-01", description=description)
+
+
+def test_scores_add_up_the_configured_weights():
+    plan = ScoringPlan.for_user(USER)
+    assert plan.activity_types == [ActivityType.cultural, ActivityType.sports]
+    assert plan.score(activity(1, "Quiz")) == 1.0
+    assert plan.score(activity(2, "Live MUSIC", description="guided Hiking")) == 1.0 + 2.0 + 2.0
+    assert plan.score(activity(3, "Quiz", type=ActivityType.sports, location="paris", is_indoor=False)) == 1.0 + 1.5 + 1.0 + 0.5
+    # Name and description are matched separately.
+    assert plan.score(activity(4, "Hik", description="ing")) == 1.0
+
+    weighted = ScoringPlan.for_user(USER, weights={"base": 0.0, "interest_match": 10.0})
+    assert weighted.score(activity(5, "music")) == 10.0
+
+
+def test_interests_without_a_known_type_match_every_type():
+    assert map_interests_to_activity_types(["Cooking"]) == list(ActivityType)
+    assert map_interests_to_activity_types(["ART", "music", "running"]) == [ActivityType.cultural, ActivityType.sports]
+
+
+def test_rank_is_stable_and_top_k_matches_the_full_order():
+    activities = [
+        activity(i, ["music", "quiz", "hiking music"][i % 3], location=["Paris", "Lyon"][i % 2])
+        for i in range(30)
+    ]
+    plan = ScoringPlan.for_user(USER)
+    ranked = plan.rank(activities)
+    scores = [plan.score(a) for a in ranked]
+    assert scores == sorted(scores, reverse=True)
+    # Equal scores keep the candidates' order.
+    for a, b in zip(ranked, ranked[1:]):
+        if plan.score(a) == plan.score(b):
+            assert a.id < b.id
+    assert plan.rank(activities, limit=7) == ranked[:7]
+    assert plan.rank(activities, limit=100) == ranked
+
+
+def test_filtered_activities_are_ranked_and_cut_to_max_results():
+    weather = WeatherResponse(city="Paris", date="2025-01-01", temperature=18.0, condition="Clear", cached=False)
+    activities = [
+        activity(1, "Quiz", type=ActivityType.cultural, location="Paris"),
+        activity(2, "Hiking day", type=ActivityType.sports, location="Paris", is_indoor=False),
+        activity(3, "Concert", type=ActivityType.cultural, location="Paris", description="live music"),
+    ]
+    result = activities_service._filter_activities_for_user(
+        activities, weather, "Paris", user=User(username="scorer", **USER), weather_preference="all", max_results=2,
+    )
+    assert [a.id for a in result] == [2, 3]
@@ -3,6 +3,7 @@ Test UC5: Administrator enriching activity listings
 Test UC6: Configuration management
 """
 
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -96,6 +97,62 @@ def test_config_view_requires_admin():
     print("UC6: Config endpoint rejects non-admin users")
 
 
+
+def test_admin_audience_by_city_and_interest():
+    """Admins count users by city and interests through the user index."""
+    response = client.get(
+        "/admin/users/audience",
+        params={"admin_user_id": 3, "city": "toronto", "interests": ["Photography"]},
+    )
+    assert response.status_code == 200
+    audience = response.json()
+    assert 3 in audience["user_ids"]
+    assert audience["count"] == len(audience["user_ids"])
+
+    response = client.get(
+        "/admin/users/audience",
+        params={"admin_user_id": 3, "interests": ["photography", "no-such-interest"]},
+    )
+    assert response.json()["count"] == 0
+    response = client.get(
+        "/admin/users/audience",
+        params={"admin_user_id": 3, "interests": ["photography", "no-such-interest"], "match": "any"},
+    )
+    assert 3 in response.json()["user_ids"]
+
+    response = client.get("/admin/users/audience", params={"admin_user_id": 1, "city": "Paris"})
+    assert response.status_code == 403
+
+
+def test_admin_users_ndjson_import_and_export():
+    """Admins upload users as NDJSON and stream them back out."""
+    from app.services import user_service
+
+    body = '{"username": "ndjson-a", "city": "Oslo"}\nnot json\n{"username": "ndjson-b"}'
+    try:
+        response = client.post(
+            "/admin/users/import",
+            params={"admin_user_id": 3},
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["imported"] == 2 and summary["rejected"] == 1
+        assert summary["errors"][0]["line"] == 2
+
+        response = client.get("/admin/users/export", params={"admin_user_id": 3})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        exported = [json.loads(line) for line in response.text.splitlines()]
+        assert [u["username"] for u in exported][-2:] == ["ndjson-a", "ndjson-b"]
+        assert exported[-1]["id"] == summary["last_id"]
+
+        assert client.get("/admin/users/export", params={"admin_user_id": 1}).status_code == 403
+        assert client.post("/admin/users/import", params={"admin_user_id": 1}, content="").status_code == 403
+    finally:
+        user_service.reset_store()
+
 if __name__ == "__main__":
     print("\n=== Testing UC5: Admin Activity Enrichment ===")
     test_admin_add_custom_activity()
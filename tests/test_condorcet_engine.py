@@ -0,0 +1,80 @@
+"""
+Tests for the NumPy Schulze engine against the dict-based VoteService.
+"""
+import random
+
+import pytest
+
+from app.services.condorcet_engine import VectorizedVoteService
+from app.services.vote_service import VoteService
+
+
+def _run(service, votes):
+    service.parse(votes)
+    service.score()
+    service.build_graph()
+    return service.order_votes()
+
+
+def _random_votes(seed, n_candidates, n_ballots):
+    rng = random.Random(seed)
+    candidates = list(range(100, 100 + n_candidates))
+    votes = []
+    for user_id in range(n_ballots):
+        ranking = rng.sample(candidates, rng.randint(1, n_candidates))
+        votes.append({"user_id": user_id, "activity_ranking": ranking})
+    return votes
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_rankings_match_dict_implementation(seed):
+    """Partial random ballots produce the same ranking in both engines."""
+    votes = _random_votes(seed, n_candidates=8, n_ballots=40)
+    assert _run(VectorizedVoteService(), votes) == _run(VoteService(), votes)
+
+
+def test_pairwise_and_paths_match_dict_implementation():
+    """The matrices agree cell by cell with the dict version."""
+    votes = _random_votes(42, n_candidates=6, n_ballots=25)
+    reference = VoteService()
+    _run(reference, votes)
+    engine = VectorizedVoteService()
+    _run(engine, votes)
+
+    for i, a in enumerate(engine.candidate_ids):
+        for j, b in enumerate(engine.candidate_ids):
+            if a == b:
+                continue
+            assert engine.pairwise[i, j] == reference.pairwise_counts[a][b]
+            assert engine.paths[i, j] == reference.strongest_paths[a][b]
+
+
+def test_condorcet_winner_first():
+    """A candidate preferred by every ballot wins."""
+    votes = [
+        {"user_id": 1, "activity_ranking": [3, 1, 2]},
+        {"user_id": 2, "activity_ranking": [3, 2, 1]},
+        {"user_id": 3, "activity_ranking": [3, 1]},
+    ]
+    assert _run(VectorizedVoteService(), votes)[0] == 3
+
+
+def test_no_votes():
+    """An empty election has an empty ranking."""
+    assert _run(VectorizedVoteService(), []) == []
+
+
+def test_parallel_tally_matches_serial(monkeypatch):
+    """Partitioning ballots across worker processes gives the same matrix."""
+    from app.services import condorcet_engine
+    from app.services.parallel_tally import shutdown_pool
+
+    monkeypatch.setattr(condorcet_engine, "PARALLEL_MIN_BALLOTS", 1)
+    votes = _random_votes(7, 12, 301)
+    serial = VectorizedVoteService(workers=1)
+    parallel = VectorizedVoteService(workers=3)
+    try:
+        assert _run(parallel, votes) == _run(serial, votes)
+        assert (parallel.pairwise == serial.pairwise).all()
+    finally:
+        shutdown_pool()
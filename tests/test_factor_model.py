@@ -0,0 +1,186 @@
+"""
+Tests for the ALS factor model and its hot-swapping.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.models.db.activity import Activity
+from app.models.db.user import User
+from app.services import factor_model, vote_service
+from app.services.recommendation_service import get_collaborative_recommendations
+from app.services.vote_log import read_votes
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(autouse=True)
+def fresh_model():
+    """No serving model and no model file between tests."""
+    factor_model.reset_model()
+    factor_model._model_path().unlink(missing_ok=True)
+    yield
+    factor_model.reset_model()
+    factor_model._model_path().unlink(missing_ok=True)
+
+
+def test_als_recovers_low_rank_scores():
+    """Held-out entries of a rank-2 score matrix are predicted closely."""
+    rng = np.random.default_rng(0)
+    users, activities = rng.normal(size=(60, 2)), rng.normal(size=(30, 2))
+    truth = 5.5 + users @ activities.T
+    observed = rng.random(truth.shape) < 0.5
+    ratings = [(u, 100 + a, truth[u, a]) for u, a in zip(*np.nonzero(observed))]
+
+    model = factor_model.train_als(ratings, factors=2, regularization=0.01, iterations=30)
+    errors = [
+        model.predict(u, [100 + a])[0] - truth[u, a]
+        for u, a in zip(*np.nonzero(~observed))
+    ]
+    assert np.sqrt(np.mean(np.square(errors))) < 0.3
+    assert np.isnan(model.predict(0, [999])[0])
+    assert np.isnan(model.predict(999, [100])).all()
+
+
+def test_published_models_are_versioned_and_hot_swapped():
+    """Each publish bumps the version; a newer file replaces the model in memory."""
+    first = factor_model.publish_model(factor_model.train_als([(1, 10, 8.0), (2, 10, 3.0)], factors=2))
+    assert factor_model.get_model() is first
+
+    # Another process publishes a newer model to the same file.
+    newer = factor_model.train_als([(1, 10, 8.0), (3, 11, 5.0)], factors=2)
+    newer.version = first.version + 1
+    newer.save(factor_model._model_path())
+    current = factor_model.get_model()
+    assert current.version == first.version + 1
+    assert current.has_user(3)
+
+
+def test_older_model_files_are_ignored_until_a_newer_one_is_published():
+    """A file older than the serving model is skipped, and a later newer file still swaps in."""
+    factor_model.publish_model(factor_model.train_als([(1, 10, 8.0)], factors=2), save=False)
+    serving = factor_model.publish_model(factor_model.train_als([(1, 10, 8.0)], factors=2), save=False)
+    older = factor_model.train_als([(2, 10, 3.0)], factors=2)
+    older.version = serving.version - 1
+    older.save(factor_model._model_path())
+    assert factor_model.get_model() is serving
+
+    newer = factor_model.train_als([(3, 10, 5.0)], factors=2)
+    newer.version = serving.version + 1
+    newer.save(factor_model._model_path())
+    assert factor_model.get_model().has_user(3)
+
+
+def test_collaborative_recommendations_use_the_model():
+    """A user known to the model gets activities ranked by predicted score."""
+    vote_service.reset_votes()
+    try:
+        vote_service.add_votes([
+            {"user_id": 1, "activity_id": 501, "score": 9},
+            {"user_id": 1, "activity_id": 502, "score": 2},
+            {"user_id": 2, "activity_id": 501, "score": 8},
+            {"user_id": 2, "activity_id": 502, "score": 3},
+            {"user_id": 2, "activity_id": 503, "score": 10},
+        ])
+        model = factor_model.train_model(factors=2)
+        assert model.vote_version == vote_service.get_vote_version()
+
+        activities = [
+            Activity(id=aid, name=f"a{aid}", type="other", location="Paris", date="2025-01-01", is_indoor=True)
+            for aid in (501, 502, 503, 504)
+        ]
+        user = User(id=1, username="u1")
+        ranked = get_collaborative_recommendations(user, activities, max_recommendations=4)
+        ids = [activity.id for activity, _ in ranked]
+        assert 504 not in ids
+        assert ids.index(501) < ids.index(502)
+    finally:
+        vote_service.reset_votes()
+
+
+def test_similar_users_fallback_uses_preference_profiles(catalog):
+    """Without a model, similar users' scores (or their type means) rank the activities."""
+    vote_service.reset_votes()
+    try:
+        vote_service.add_votes([
+            {"user_id": 2, "activity_id": 100, "score": 10},  # cultural catalog activity
+            {"user_id": 2, "activity_id": 505, "score": 7},
+        ])
+        activities = [
+            Activity(id=aid, name=f"a{aid}", type=kind, location="Paris", date="2025-01-01", is_indoor=True)
+            for aid, kind in ((505, "other"), (506, "cultural"), (507, "sports"))
+        ]
+        user = User(id=1, username="u1", activity_preference="either")
+        ranked = get_collaborative_recommendations(
+            user, activities, max_recommendations=3, similar_users=[(User(id=2, username="u2"), 0.5)],
+        )
+        assert [(activity.id, round(score, 3)) for activity, score in ranked] == [(505, 0.333), (506, 0.25)]
+    finally:
+        vote_service.reset_votes()
+
+
+def test_training_script_reads_the_live_log_without_writing_to_it(tmp_path):
+    """The offline job trains on a directory this process is logging to, and leaves it untouched."""
+    vote_service.reset_votes()
+    try:
+        vote_service.add_votes([
+            {"user_id": 1, "activity_id": 501, "score": 2},
+            {"user_id": 2, "activity_id": 501, "score": 8},
+        ])
+        vote_service._LOG.snapshot_now()
+        # Logged after the snapshot, and superseding a vote it holds.
+        vote_service.add_votes([
+            {"user_id": 1, "activity_id": 501, "score": 9},
+            {"user_id": 3, "activity_id": 502, "score": 5},
+        ])
+        directory = vote_service._LOG.directory
+        before = {p.name: p.stat().st_mtime_ns for p in directory.iterdir()}
+
+        model_path = tmp_path / "model.npz"
+        env = {**os.environ, "VOTE_STORAGE_DIR": str(directory), "FACTOR_MODEL_PATH": str(model_path)}
+        result = subprocess.run(
+            [sys.executable, "scripts/train_factor_model.py", "--factors", "2"],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+        )
+        assert result.returncode == 0, result.stderr
+        # The vote store was not opened: no recovery, snapshot or new segment.
+        assert "Recovered" not in result.stdout
+        assert {p.name: p.stat().st_mtime_ns for p in directory.iterdir()} == before
+
+        model = factor_model.FactorModel.load(model_path)
+        assert {1, 2, 3} <= {int(uid) for uid in model.user_ids}
+        assert model.vote_version == vote_service._LOG.last_lsn
+
+        # The live log keeps working and holds everything.
+        vote_service.add_vote({"user_id": 4, "activity_id": 502, "score": 6})
+        _, logged = read_votes(directory)
+        assert logged[-1] == vote_service.list_votes()[-1]
+    finally:
+        vote_service.reset_votes()
+
+
+def test_training_runs_in_separate_processes_count_up(tmp_path):
+    """Each run of the offline job publishes a version above the model file it replaces."""
+    vote_service.reset_votes()
+    try:
+        vote_service.add_votes([
+            {"user_id": 1, "activity_id": 501, "score": 2},
+            {"user_id": 2, "activity_id": 502, "score": 8},
+        ])
+        model_path = tmp_path / "model.npz"
+        env = {**os.environ, "VOTE_STORAGE_DIR": str(vote_service._LOG.directory), "FACTOR_MODEL_PATH": str(model_path)}
+        versions = []
+        for _ in range(2):
+            result = subprocess.run(
+                [sys.executable, "scripts/train_factor_model.py", "--factors", "2", "--iterations", "2"],
+                cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+            )
+            assert result.returncode == 0, result.stderr
+            versions.append(factor_model.FactorModel.load(model_path).version)
+        assert versions == [1, 2]
+    finally:
+        vote_service.reset_votes()
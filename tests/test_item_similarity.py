@@ -0,0 +1,85 @@
+"""
+Tests for the incremental item-item co-vote similarity.
+"""
+import math
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import vote_service
+from app.services.item_similarity import ItemSimilarityMatrix
+
+client = TestClient(app)
+
+
+def _brute_force(ballots, a, b, shrinkage, center):
+    """Similarity recomputed from scratch over the final ballots."""
+    dot = norm_a = norm_b = 0.0
+    co = 0
+    for ballot in ballots.values():
+        if a in ballot:
+            norm_a += (ballot[a] - center) ** 2
+        if b in ballot:
+            norm_b += (ballot[b] - center) ** 2
+        if a in ballot and b in ballot:
+            dot += (ballot[a] - center) * (ballot[b] - center)
+            co += 1
+    if not co or norm_a * norm_b <= 0:
+        return 0.0
+    return dot / math.sqrt(norm_a * norm_b) * co / (co + shrinkage)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_updates_match_recomputation(seed):
+    """Votes and revotes folded in one at a time give the from-scratch similarities."""
+    rng = random.Random(seed)
+    matrix = ItemSimilarityMatrix(top_n=5, shrinkage=2, center=5.5)
+    ballots = {}
+    for _ in range(400):
+        user, activity = rng.randint(1, 30), rng.randint(1, 12)
+        old = ballots.get(user, {})
+        new = {**old, activity: rng.randint(1, 10)}
+        matrix.replace_ballot(old, new)
+        ballots[user] = new
+        if rng.random() < 0.2:
+            matrix.neighbours(rng.randint(1, 12))  # populate the cache mid-stream
+
+    for a in range(1, 13):
+        expected = sorted(
+            ((b, _brute_force(ballots, a, b, 2, 5.5)) for b in range(1, 13) if b != a),
+            key=lambda item: (-item[1], item[0]),
+        )
+        expected = [(b, s) for b, s in expected if s > 1e-12][:5]
+        got = matrix.neighbours(a)
+        assert [b for b, _ in got] == [b for b, _ in expected]
+        assert [s for _, s in got] == pytest.approx([s for _, s in expected])
+
+
+def test_similar_activities_endpoint():
+    """Activities liked by the same users come first; unrelated ones are absent."""
+    vote_service.reset_votes()
+    try:
+        votes = []
+        for user_id in range(1, 6):
+            votes += [
+                {"user_id": user_id, "activity_id": 1, "score": 9},
+                {"user_id": user_id, "activity_id": 2, "score": 8},
+                {"user_id": user_id, "activity_id": 3, "score": 2},
+            ]
+        votes.append({"user_id": 9, "activity_id": 4, "score": 10})
+        vote_service.add_votes(votes)
+
+        response = client.get("/activities/1/similar", params={"limit": 5})
+        assert response.status_code == 200
+        similar = response.json()
+        assert [item["activity_id"] for item in similar] == [2]
+        assert similar[0]["co_votes"] == 5
+        assert 0 < similar[0]["similarity"] <= 1
+
+        vote_service.add_vote({"user_id": 9, "activity_id": 1, "score": 10})
+        assert 4 in [item["activity_id"] for item in client.get("/activities/1/similar").json()]
+        assert client.get("/activities/999/similar").json() == []
+    finally:
+        vote_service.reset_votes()
@@ -0,0 +1,99 @@
+"""
+Tests for the incremental pairwise preference matrix.
+"""
+import random
+
+import numpy as np
+
+from app.services import vote_service
+from app.services.condorcet_engine import schulze_ranking
+from app.services.pairwise_matrix import IncrementalPairwiseMatrix, ranking_positions
+from app.services.vote_service import VoteService
+
+
+def _random_rankings(seed, n_candidates, n_ballots):
+    rng = random.Random(seed)
+    candidates = list(range(1, n_candidates + 1))
+    return [rng.sample(candidates, rng.randint(1, n_candidates)) for _ in range(n_ballots)]
+
+
+def _as_dict(matrix, candidate_ids):
+    return {
+        (a, b): int(matrix[i, j])
+        for i, a in enumerate(candidate_ids)
+        for j, b in enumerate(candidate_ids)
+        if a != b
+    }
+
+
+def test_matches_full_tally():
+    """Counts built ballot by ballot equal VoteService's full re-tally."""
+    rankings = _random_rankings(1, n_candidates=7, n_ballots=30)
+    matrix = IncrementalPairwiseMatrix(initial_capacity=2)
+    for ranking in rankings:
+        matrix.add_ballot(ranking_positions(ranking))
+
+    reference = VoteService()
+    reference.parse([{"user_id": i, "activity_ranking": r} for i, r in enumerate(rankings)])
+    reference.score()
+
+    counts = _as_dict(matrix.pairwise(), matrix.candidate_ids)
+    assert counts == {
+        (a, b): n for a, row in reference.pairwise_counts.items() for b, n in row.items()
+    }
+
+
+def test_retraction_undoes_ballot():
+    """Retracting a ballot restores the counts from before it was added."""
+    rankings = _random_rankings(2, n_candidates=5, n_ballots=10)
+    matrix = IncrementalPairwiseMatrix()
+    for ranking in rankings:
+        matrix.add_ballot(ranking_positions(ranking))
+    before = matrix.pairwise()
+
+    extra = ranking_positions([5, 3, 1])
+    matrix.add_ballot(extra)
+    matrix.retract_ballot(extra)
+
+    assert np.array_equal(matrix.pairwise(), before)
+    assert matrix.ballot_count == len(rankings)
+
+
+def test_new_candidate_loses_to_ranked_candidates():
+    """A candidate added later is beaten on every earlier ballot that ranks others."""
+    matrix = IncrementalPairwiseMatrix(initial_capacity=1)
+    matrix.add_ballot(ranking_positions([1, 2]))
+    matrix.add_ballot(ranking_positions([2]))
+    matrix.add_candidate(3)
+
+    counts = _as_dict(matrix.pairwise(), matrix.candidate_ids)
+    assert counts[(1, 3)] == 1
+    assert counts[(2, 3)] == 2
+    assert counts[(3, 1)] == 0
+
+
+def test_tied_positions_count_for_neither_side():
+    """Equal positions express no preference between the two candidates."""
+    matrix = IncrementalPairwiseMatrix()
+    matrix.add_ballot({1: 0, 2: 0, 3: 1})
+
+    counts = _as_dict(matrix.pairwise(), matrix.candidate_ids)
+    assert counts[(1, 2)] == 0 and counts[(2, 1)] == 0
+    assert counts[(1, 3)] == 1 and counts[(2, 3)] == 1
+
+
+def test_vote_store_keeps_matrix_current():
+    """Score votes update the store's matrix, including when a user re-scores."""
+    vote_service.reset_votes()
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 9})
+    vote_service.add_vote({"user_id": 1, "activity_id": 20, "score": 4})
+    vote_service.add_vote({"user_id": 2, "activity_id": 20, "score": 8})
+    vote_service.add_vote({"user_id": 2, "activity_id": 10, "score": 3})
+    vote_service.add_vote({"user_id": 2, "activity_id": 10, "score": 10})
+
+    ids, matrix = vote_service.get_pairwise_matrix()
+    counts = _as_dict(matrix, ids)
+    assert counts[(10, 20)] == 2
+    assert counts[(20, 10)] == 0
+    assert schulze_ranking(matrix, ids) == [10, 20]
+    vote_service.reset_votes()
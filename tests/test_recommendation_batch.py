@@ -0,0 +1,95 @@
+"""
+Tests for batch recommendations (POST /activities/recommended/batch).
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.db.activity import Activity, ActivityType
+from app.models.db.user import User
+from app.models.response.weather_response import WeatherResponse
+from app.services import activities_service, factor_model, user_service, vote_service
+from app.services.recommendation_cache import get_recommendation_cache
+
+client = TestClient(app)
+
+ACTIVITIES = [
+    Activity(id=8000 + i, name=f"Event {i}", type=ActivityType.cultural, location="Paris", date="2025-01-01", is_indoor=i % 2 == 0)
+    for i in range(6)
+]
+PARAMS = {"city": "Paris", "countryCode": "FR", "date": "2025-01-01"}
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Stub the weather/event APIs with fixed data and count the fetches."""
+    calls = []
+
+    async def fake_fetch(city, countryCode, date):
+        calls.append((city, countryCode, date))
+        weather = WeatherResponse(city=city, date=date, temperature=18.0, condition="Clear", cached=False)
+        return weather, list(ACTIVITIES)
+
+    monkeypatch.setattr(activities_service, "_fetch_weather_and_activities", fake_fetch)
+    user_service.reset_store()
+    vote_service.reset_votes()
+    vote_service.add_votes([
+        {"user_id": uid, "activity_id": a.id, "score": (uid * 7 + a.id) % 10 + 1}
+        for uid in (1, 2) for a in ACTIVITIES
+    ])
+    # Users 1 and 2 are scored by the factor model, the others through similar users.
+    factor_model.train_model(factors=2)
+    get_recommendation_cache().clear()
+    yield calls
+    vote_service.reset_votes()
+    factor_model.reset_model()
+    factor_model._model_path().unlink(missing_ok=True)
+    get_recommendation_cache().clear()
+
+
+def test_batch_matches_single_requests_with_one_fetch(fetches):
+    """Every user gets the same list as a single request; shared inputs are fetched once."""
+    user_ids = [u["id"] for u in user_service.list_users()][:4]
+    response = client.post("/activities/recommended/batch", params=PARAMS, json={"user_ids": user_ids + [999999]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(fetches) == 1
+
+    by_user = {line["user_id"]: line for line in lines}
+    assert by_user[999999] == {"user_id": 999999, "error": "User not found"}
+    assert by_user[1]["activities"]
+
+    get_recommendation_cache().clear()
+    for user_id in user_ids:
+        user = User(**user_service.get_user_by_id(user_id))
+        single = asyncio.run(activities_service.suggest_personalized_activities(user=user, **PARAMS))
+        assert [a["id"] for a in by_user[user_id]["activities"]] == [a.id for a in single]
+
+
+def test_batch_uses_the_result_cache(fetches):
+    """A second batch for the same users is served from the cache without fetching."""
+    body = {"user_ids": [1, 2]}
+    first = client.post("/activities/recommended/batch", params=PARAMS, json=body).text
+    second = client.post("/activities/recommended/batch", params=PARAMS, json=body).text
+    assert len(fetches) == 1
+    assert sorted(first.splitlines()) == sorted(second.splitlines())
+
+    # Another country is another input: fetched again, not served the cached lists.
+    client.post("/activities/recommended/batch", params={**PARAMS, "countryCode": "US"}, json=body)
+    assert len(fetches) == 2
+    # Single requests share the batch's cache keys.
+    user = User(**user_service.get_user_by_id(1))
+    asyncio.run(activities_service.suggest_personalized_activities(user=user, **PARAMS))
+    assert len(fetches) == 2
+
+
+def test_batch_size_limit(monkeypatch):
+    from app.routes import activities
+
+    monkeypatch.setattr(activities, "MAX_BATCH_USERS", 2)
+    response = client.post("/activities/recommended/batch", params=PARAMS, json={"user_ids": [1, 2, 3]})
+    assert response.status_code == 400
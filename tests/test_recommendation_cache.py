@@ -0,0 +1,81 @@
+"""
+Tests for the dependency-tracked recommendation result cache.
+"""
+import asyncio
+
+import pytest
+
+from app.models.db.activity import Activity, ActivityType
+from app.models.db.user import User
+from app.routes.admin import add_activity, admin_activities
+from app.services import activities_service, user_service, vote_service
+from app.services.recommendation_cache import get_recommendation_cache
+
+ACTIVITY = Activity(id=7001, name="Jazz night", type=ActivityType.cultural, location="Paris", date="2025-01-01", is_indoor=True)
+
+
+@pytest.fixture
+def computations(monkeypatch):
+    """Stub the weather/event fetch and count how often recommendations are computed."""
+    calls = []
+
+    async def fake_fetch(**kwargs):
+        calls.append(kwargs)
+        return [ACTIVITY]
+
+    monkeypatch.setattr(activities_service, "fetch_activities_by_weather", fake_fetch)
+    monkeypatch.setattr(
+        activities_service, "get_collaborative_recommendations",
+        lambda user, current_activities, max_recommendations: [(a, 1.0) for a in current_activities],
+    )
+    user_service.reset_store()
+    get_recommendation_cache().clear()
+    yield calls
+    admin_activities[:] = [a for a in admin_activities if a.id != 7002]
+    vote_service.reset_votes()
+    user_service.reset_store()
+    get_recommendation_cache().clear()
+
+
+def _suggest(user, **kwargs):
+    params = {"city": "Paris", "countryCode": "FR", "date": "2025-01-01", "user": user, **kwargs}
+    return asyncio.run(activities_service.suggest_personalized_activities(**params))
+
+
+def test_repeat_requests_are_served_from_cache(computations):
+    """Same key and unchanged inputs: computed once."""
+    user = User(**user_service.get_user_by_id(1))
+    assert _suggest(user) == [ACTIVITY]
+    assert _suggest(user) == [ACTIVITY]
+    assert len(computations) == 1
+
+    _suggest(user, max_results=3)
+    assert len(computations) == 2
+
+    # Same city name in another country: a different list.
+    _suggest(user, countryCode="US")
+    assert len(computations) == 3
+    assert computations[-1]["countryCode"] == "US"
+    _suggest(user, countryCode="US")
+    assert len(computations) == 3
+
+
+def test_changed_inputs_invalidate(computations):
+    """Profile writes, votes and catalog changes each force a recompute."""
+    user = User(**user_service.get_user_by_id(1))
+    _suggest(user)
+
+    user_service.update_user(1, {"city": "Lyon"})
+    _suggest(user)
+    assert len(computations) == 2
+
+    vote_service.add_vote({"user_id": 2, "activity_id": 7001, "score": 8})
+    _suggest(user)
+    assert len(computations) == 3
+
+    add_activity(ACTIVITY.model_copy(update={"id": 7002}))
+    _suggest(user)
+    assert len(computations) == 4
+
+    _suggest(user)
+    assert len(computations) == 4
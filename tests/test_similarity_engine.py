@@ -0,0 +1,174 @@
+"""
+Tests for the vectorized user similarity engine.
+"""
+import random
+from datetime import date
+
+import pytest
+
+from app.models.db.user import User
+from app.services.recommendation_service import calculate_user_similarity, find_similar_users
+from app.services.lsh_index import MinHashLSH
+from app.services.similarity_engine import UserSimilarityIndex
+from app.services.user_features import build_features
+from app.services import similarity_engine, user_service
+
+INTERESTS = ["music", "hiking", "cooking", "art", "sports", "board games", "Music"]
+CITIES = [("Paris", "FR"), ("paris", "FR"), ("Lyon", "FR"), ("Berlin", "DE"), (None, "DE"), ("Lyon", None)]
+
+
+def _random_user(rng, user_id):
+    city, country = rng.choice(CITIES)
+    return User(
+        id=user_id,
+        username=f"user{user_id}",
+        birth_date=rng.choice([None, date(rng.randint(1950, 2010), rng.randint(1, 12), rng.randint(1, 28))]),
+        gender=rng.choice([None, "male", "female", "Female"]),
+        country=country,
+        city=city,
+        interests=rng.sample(INTERESTS, rng.randint(0, 4)),
+        activity_preference=rng.choice([None, "indoor", "outdoor", "either"]),
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_pairwise_similarity(seed):
+    """Vectorized scores equal calculate_user_similarity for every pair."""
+    rng = random.Random(seed)
+    users = [_random_user(rng, uid) for uid in range(1, 61)]
+    index = UserSimilarityIndex([u.model_dump() for u in users])
+
+    for query in users[:10] + [_random_user(rng, 999)]:
+        scores = index.similarities(query)
+        expected = [calculate_user_similarity(query, other) for other in users]
+        assert scores.tolist() == pytest.approx(expected)
+
+
+def test_top_k_order_threshold_and_exclusion():
+    """top_k keeps the k best above the threshold, ties broken by lower id."""
+    rng = random.Random(42)
+    users = [_random_user(rng, uid) for uid in range(1, 201)]
+    index = UserSimilarityIndex([u.model_dump() for u in users])
+    query = users[0]
+
+    top = index.top_k(query, 10, min_similarity=0.2, exclude_id=query.id)
+    ranked = sorted(
+        ((u.id, calculate_user_similarity(query, u)) for u in users[1:]),
+        key=lambda item: (-item[1], item[0]),
+    )
+    expected = [(uid, s) for uid, s in ranked if s >= 0.2][:10]
+    assert [uid for uid, _ in top] == [uid for uid, _ in expected]
+    assert all(uid != query.id for uid, _ in top)
+    assert index.top_k(query, 0) == []
+
+
+def test_find_similar_users_searches_whole_store():
+    """Users beyond the first five are considered."""
+    user_service.reset_store()
+    try:
+        twin = user_service.create_user({
+            "username": "twin", "city": "Paris", "country": "FR", "gender": "male",
+            "birth_date": "2000-01-01", "interests": ["music", "hiking"],
+            "activity_preference": "indoor",
+        })
+        query = User(**user_service.get_user_by_id(1))
+        similar = find_similar_users(query, limit=3)
+        assert twin["id"] in [u.id for u, _ in similar]
+        assert all(u.id != query.id for u, _ in similar)
+    finally:
+        user_service.reset_store()
+
+
+def test_lsh_candidates_share_interests_or_city():
+    """Identical interest sets always collide; the city bucket adds same-city users."""
+    lsh = MinHashLSH(num_perm=32, bands=8)
+    lsh.add(build_features({"id": 1, "interests": ["music", "art", "hiking"], "city": "Lyon"}))
+    lsh.add(build_features({"id": 2, "interests": ["music", "art", "hiking"]}))
+    lsh.add(build_features({"id": 3, "interests": ["sports"], "city": "Lyon"}))
+    lsh.add(build_features({"id": 4, "interests": ["cooking"]}))
+
+    query = build_features({"id": 9, "interests": ["hiking", "art", "music"], "city": "Lyon"})
+    assert lsh.candidates(query) == {1, 2, 3}
+
+    lsh.remove(1)
+    lsh.add(build_features({"id": 2, "interests": ["cooking"]}))
+    assert lsh.candidates(query) == {3}
+    assert len(lsh) == 3
+
+    # Same interests, new city: the interest buckets are kept, the city moves.
+    lsh.add(build_features({"id": 3, "interests": ["sports"], "city": "Nice"}))
+    assert lsh.candidates(query) == set()
+    assert lsh.candidates(build_features({"id": 9, "interests": ["sports"]})) == {3}
+    for user_id in (2, 3, 4):
+        lsh.remove(user_id)
+    assert not any(lsh._buckets) and not lsh._cities
+
+
+def test_lsh_neighbours_are_scored_exactly(monkeypatch):
+    """Above min_users, find_neighbours re-ranks LSH candidates with the exact score."""
+    monkeypatch.setattr(similarity_engine, "LSH_MIN_USERS", 0)
+    user_service.reset_store()
+    try:
+        twin = user_service.create_user({
+            "username": "twin", "city": "Nowhere", "interests": ["music", "hiking", "art"],
+            "activity_preference": "indoor",
+        })
+        query = User(id=0, username="query", city="Nowhere", interests=["art", "music", "hiking"])
+        neighbours = similarity_engine.find_neighbours(query, 5)
+        expected = calculate_user_similarity(query, User(**twin))
+        assert neighbours[0] == (twin["id"], pytest.approx(expected))
+
+        user_service.delete_user(twin["id"])
+        assert twin["id"] not in [uid for uid, _ in similarity_engine.find_neighbours(query, 5)]
+    finally:
+        user_service.reset_store()
+
+
+def test_similarity_matrix_matches_single_queries():
+    """Batch scoring equals one similarities() call per user, and top_k_many equals top_k."""
+    rng = random.Random(7)
+    users = [_random_user(rng, uid) for uid in range(1, 151)]
+    index = UserSimilarityIndex([u.model_dump() for u in users])
+    queries = users[:20] + [_random_user(rng, 999)]
+
+    matrix = index.similarity_matrix(queries)
+    for row, query in zip(matrix, queries):
+        assert row.tolist() == pytest.approx(index.similarities(query).tolist())
+    expected = [index.top_k(q, 5, min_similarity=0.1, exclude_id=q.id) for q in queries]
+    assert index.top_k_many(queries, 5, min_similarity=0.1) == expected
+
+
+def test_view_follows_writes_and_rebuilds_in_the_background(monkeypatch):
+    """Written users are scored from their current profile; the full index is swapped in later."""
+    import time
+
+    user_service.reset_store()
+    try:
+        first = similarity_engine.get_similarity_index()
+        ids = [u["id"] for u in user_service.list_users()]
+        user_service.update_user(ids[0], {"interests": ["board games"], "city": "Oslo"})
+        user_service.delete_user(ids[1])
+        created = user_service.create_user({"username": "new", "interests": ["board games"], "city": "Oslo"})
+
+        view = similarity_engine.get_similarity_index()
+        assert view.base is first.base
+        fresh = UserSimilarityIndex(user_service.list_users())
+        query = User(id=0, username="q", interests=["board games", "art"], city="Oslo")
+        assert view.top_k(query, 10) == fresh.top_k(query, 10)
+        assert view.top_k_many([query], 10) == fresh.top_k_many([query], 10)
+        assert view.top_k(query, 10, candidate_ids=[ids[0], ids[1], created["id"]]) == [
+            pair for pair in fresh.top_k(query, 10) if pair[0] in (ids[0], created["id"])
+        ]
+
+        # Past the threshold the full index is rebuilt off the request path.
+        monkeypatch.setattr(similarity_engine, "_REBUILD_MIN_CHANGES", 0)
+        monkeypatch.setattr(similarity_engine, "_REBUILD_FRACTION", 0.0)
+        assert similarity_engine.get_similarity_index().base is first.base
+        deadline = time.monotonic() + 5
+        while similarity_engine.get_similarity_index().base is first.base and time.monotonic() < deadline:
+            time.sleep(0.01)
+        rebuilt = similarity_engine.get_similarity_index()
+        assert rebuilt.base is not first.base and rebuilt.delta is None
+        assert rebuilt.top_k(query, 10) == fresh.top_k(query, 10)
+    finally:
+        user_service.reset_store()
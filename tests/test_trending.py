@@ -0,0 +1,141 @@
+"""
+Tests for windowed, time-decayed trending counters (GET /vote/trending).
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import vote_service
+from app.services.trending_service import TrendingCounters, parse_window
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture(autouse=True)
+def reset_votes():
+    """Empty vote store (and therefore empty trending counters)."""
+    vote_service.reset_votes()
+    yield
+    vote_service.reset_votes()
+
+
+client = TestClient(app)
+
+
+def test_parse_window():
+    """Windows are given in minutes, hours or days, up to a week."""
+    assert parse_window("15m") == 900
+    assert parse_window("1h") == 3600
+    assert parse_window("7d") == 7 * 86400
+    for invalid in ("", "0h", "1w", "8d", "h1"):
+        with pytest.raises(ValueError):
+            parse_window(invalid)
+
+
+def test_window_excludes_older_votes():
+    """Only votes inside the window are counted."""
+    counters = TrendingCounters()
+    counters.record(1, NOW - 30)
+    counters.record(1, NOW - 2 * 3600)
+    counters.record(2, NOW - 5 * 3600)
+
+    hour = counters.top(3600, now=NOW)
+    assert [(r["activity_id"], r["votes"]) for r in hour] == [(1, 1)]
+
+    day = counters.top(86400, now=NOW)
+    assert {r["activity_id"]: r["votes"] for r in day} == {1: 2, 2: 1}
+
+
+def test_recent_votes_outweigh_older_ones():
+    """With equal counts, the activity voted on more recently trends higher."""
+    counters = TrendingCounters()
+    for _ in range(3):
+        counters.record(1, NOW - 50 * 60)
+        counters.record(2, NOW - 60)
+
+    ranking = counters.top(3600, now=NOW)
+    assert [r["activity_id"] for r in ranking] == [2, 1]
+    assert ranking[0]["votes"] == ranking[1]["votes"] == 3
+    assert ranking[0]["trend_score"] > ranking[1]["trend_score"]
+
+
+def test_ring_slots_are_reused():
+    """A slot from a previous lap of the ring is reset, not accumulated."""
+    counters = TrendingCounters()
+    counters.record(1, NOW - 3600)  # same minute slot, one hour earlier
+    counters.record(1, NOW)
+
+    assert counters.top(3600, now=NOW)[0]["votes"] == 1
+
+
+def test_counters_grow_beyond_initial_capacity():
+    """More activities than the initial capacity are all tracked."""
+    counters = TrendingCounters(initial_capacity=2)
+    for activity_id in range(5):
+        for _ in range(activity_id + 1):
+            counters.record(activity_id, NOW)
+
+    ranking = counters.top(3600, limit=3, now=NOW)
+    assert [r["activity_id"] for r in ranking] == [4, 3, 2]
+
+
+def test_tracked_windows_match_the_ring_scan():
+    """Maintained totals rank like the full scan of the rings, as the window slides."""
+    counters = TrendingCounters()
+    for i in range(400):
+        now = NOW - 9 * 86400 + i * 2000
+        counters.record(i % 37, now - (i * 7919) % 600)
+        if i % 50:
+            continue
+        for window in ("15m", "1h", "24h", "7d"):
+            seconds = parse_window(window)
+            tracked = counters.top(seconds, limit=50, now=now)
+            scanned = counters.scan(seconds, limit=50, now=now)
+            assert {r["activity_id"]: r["votes"] for r in tracked} == {r["activity_id"]: r["votes"] for r in scanned}
+            # The rings weigh a vote at the middle of its bucket, the trackers at its time.
+            expected = {r["activity_id"]: r["trend_score"] for r in scanned}
+            for row in tracked:
+                assert row["trend_score"] == pytest.approx(expected[row["activity_id"]], rel=0.1)
+
+
+def test_expired_activities_leave_the_tracked_ranking():
+    """An activity whose votes all left the window is dropped, not ranked at zero."""
+    counters = TrendingCounters(tracked_windows=["1h"])
+    counters.record(1, NOW - 2 * 3600)
+    assert [r["activity_id"] for r in counters.top(3600, now=NOW - 2 * 3600)] == [1]
+    counters.record(2, NOW - 60)
+    assert [r["activity_id"] for r in counters.top(3600, now=NOW)] == [2]
+    counters.record(1, NOW - 30)
+    assert [(r["activity_id"], r["votes"]) for r in counters.top(3600, now=NOW)] == [(1, 1), (2, 1)]
+    assert counters.top(3600, now=NOW + 2 * 3600) == []
+
+
+def test_untracked_windows_are_scanned():
+    """Windows outside `tracked_windows` are still answered, from the rings."""
+    counters = TrendingCounters(tracked_windows=["1h"])
+    counters.record(1, NOW - 2 * 3600)
+    counters.record(2, NOW - 60)
+    assert {r["activity_id"] for r in counters.top(3 * 3600, now=NOW)} == {1, 2}
+
+
+def test_trending_endpoint_follows_new_votes():
+    """Votes are stamped at ingestion and show up in /vote/trending at once."""
+    vote_service.add_votes([
+        {"user_id": 1, "activity_id": 10, "score": 8},
+        {"user_id": 2, "activity_id": 10, "score": 6},
+        {"user_id": 1, "activity_id": 20, "score": 9},
+    ])
+    assert all("created_at" in v for v in vote_service.list_votes())
+
+    response = client.get("/vote/trending?window=1h")
+    assert response.status_code == 200
+    data = response.json()
+    assert [(r["activity_id"], r["votes"]) for r in data] == [(10, 2), (20, 1)]
+
+    vote_service.reset_votes()
+    assert client.get("/vote/trending").json() == []
+
+
+def test_trending_endpoint_rejects_invalid_window():
+    """An unparseable window is a client error."""
+    response = client.get("/vote/trending?window=forever")
+    assert response.status_code == 400
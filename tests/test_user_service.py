@@ -0,0 +1,276 @@
+"""
+Tests for the sharded, copy-on-write user store.
+"""
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.services import user_service
+
+
+@pytest.fixture(autouse=True)
+def reset_users():
+    """Start every test from the seed users."""
+    user_service.reset_store()
+    yield
+    user_service.reset_store()
+
+
+def test_update_swaps_record_without_touching_earlier_reads():
+    """Readers keep the record they got; updates publish a new one."""
+    user_id = user_service.list_users()[0]["id"]
+    before = user_service.get_user(user_id)
+    user_service.update_user(user_id, {"city": "Testville", "id": 999})
+
+    after = user_service.get_user(user_id)
+    assert after["city"] == "Testville"
+    assert after["id"] == user_id
+    assert before.get("city") != "Testville"
+
+
+def test_delete_and_missing_users():
+    """Deleted users disappear; unknown ids return None/False."""
+    user_id = user_service.create_user({"username": "temp"})["id"]
+    assert user_service.delete_user(user_id) is True
+    assert user_service.get_user_by_id(user_id) is None
+    assert user_service.delete_user(user_id) is False
+    assert user_service.update_user(user_id, {"city": "Nice"}) is None
+
+
+def test_concurrent_creates_and_updates():
+    """Parallel writers get unique ids and no update is lost."""
+    seed_count = len(user_service.list_users())
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        created = list(pool.map(lambda i: user_service.create_user({"username": f"user{i}"}), range(200)))
+    ids = [u["id"] for u in created]
+    assert len(set(ids)) == 200
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda uid: user_service.update_user(uid, {"city": f"City {uid}"}), ids))
+
+    users = user_service.list_users()
+    assert len(users) == seed_count + 200
+    assert [u["id"] for u in users] == sorted(u["id"] for u in users)
+    assert all(user_service.get_user(uid)["city"] == f"City {uid}" for uid in ids)
+
+
+def test_feature_cache_follows_profile_writes():
+    """Features are rebuilt on create/update, dropped on delete, and versioned."""
+    from app.services import user_features
+
+    created = user_service.create_user({"username": "feat", "city": "Paris", "interests": ["Music", "hiking"]})
+    uid = created["id"]
+    features = user_features.get_user_features(uid)
+    assert features.city == "paris"
+    assert features.interests_lower == ("music", "hiking")
+    version = user_features.get_features_version()
+    assert features.version == version
+
+    user_service.get_user_by_id(uid)
+    assert user_features.get_features_version() == version  # reads do not invalidate
+
+    user_service.update_user(uid, {"city": "Lyon"})
+    assert user_features.get_user_features(uid).city == "lyon"
+    assert user_features.get_features_version() > version
+
+    user_service.delete_user(uid)
+    assert user_features.get_user_features(uid) is None
+
+
+def test_similarity_index_is_reused_until_a_write():
+    """A profile write refreshes the similarity view without rebuilding the full index."""
+    from app.services.similarity_engine import get_similarity_index
+
+    first = get_similarity_index()
+    assert get_similarity_index() is first
+    assert len(first) == len(user_service.list_users())
+
+    user_service.create_user({"username": "newcomer"})
+    second = get_similarity_index()
+    assert second is not first
+    assert second.base is first.base
+    assert len(second) == len(first) + 1
+
+
+def test_writes_reach_the_durable_store():
+    """Creates, updates and deletes are written behind to SQLite and survive a reopen."""
+    from app.services.user_store import UserStore
+
+    kept = user_service.create_user({"username": "kept", "city": "Nice"})["id"]
+    gone = user_service.create_user({"username": "gone"})["id"]
+    user_service.update_user(kept, {"city": "Lyon"})
+    user_service.delete_user(gone)
+    assert user_service.flush_store(timeout=5)
+
+    reopened = UserStore(user_service._STORE.path)
+    try:
+        users = {u["id"]: u for u in reopened.load_all()}
+    finally:
+        reopened.close()
+    assert users[kept]["city"] == "Lyon"
+    assert gone not in users
+    assert len(users) == len(user_service.list_users())
+
+    # A restart loads the durable store rather than the JSON seed.
+    user_service._load_initial()
+    assert user_service.get_user(kept)["city"] == "Lyon"
+    assert user_service.get_user(gone) is None
+
+
+def test_find_user_ids_by_indexed_fields():
+    """Username, email, city and interest lookups go through the store's indexes."""
+    alice = user_service.create_user({"username": "Alice", "email": "a@x.io", "city": "Lyon", "interests": ["Chess"]})["id"]
+    bruno = user_service.create_user({"username": "bruno", "city": "lyon", "interests": ["chess", "jazz"]})["id"]
+    user_service.create_user({"username": "carla", "city": "Nice", "interests": ["chess"]})
+
+    assert user_service.find_user_ids(username="ALICE") == [alice]
+    assert user_service.find_user_ids(email="A@X.IO") == [alice]
+    assert user_service.find_user_ids(city="Lyon", interest="CHESS") == [alice, bruno]
+    assert user_service.find_user_ids(city="Lyon", interest="jazz") == [bruno]
+    assert user_service.get_user_by_username("bruno")["id"] == bruno
+    assert user_service.get_user_by_username("nobody") is None
+
+
+def test_user_store_coalesces_pending_writes(tmp_path):
+    """A burst of updates to one user costs one row write."""
+    from app.services.user_store import UserStore
+
+    store = UserStore(tmp_path / "users.db", flush_interval=60)
+    for i in range(100):
+        store.put({"id": 1, "username": "u", "city": f"City {i}"})
+    store.put({"id": 2, "username": "v"})
+    store.delete(2)
+    assert store.flush(timeout=5)
+    assert store.rows_written == 2
+    store.close()
+
+    reopened = UserStore(tmp_path / "users.db")
+    assert reopened.load_all() == [{"id": 1, "username": "u", "city": "City 99"}]
+    reopened.close()
+
+
+def test_failed_batch_is_kept_and_reported(tmp_path):
+    """A batch whose commit fails is retried, behind newer writes, and flush reports the failure."""
+    import sqlite3
+    from app.services.user_store import UserStore
+
+    store = UserStore(tmp_path / "users.db", flush_interval=60)
+    insert = store._insert
+    failures = []
+
+    def failing_once(users):
+        if not failures:
+            failures.append(users)
+            # A write submitted while the failing batch is in flight.
+            store.put({"id": 1, "username": "u", "city": "Nice"})
+            raise sqlite3.OperationalError("disk I/O error")
+        insert(users)
+
+    store._insert = failing_once
+    store.put({"id": 1, "username": "u", "city": "Lyon"})
+    store.put({"id": 2, "username": "v"})
+    with pytest.raises(RuntimeError, match="disk I/O error"):
+        store.flush(timeout=5)
+    assert store.get(2) == {"id": 2, "username": "v"}
+
+    assert store.flush(timeout=5)
+    assert store.load_all() == [{"id": 1, "username": "u", "city": "Nice"}, {"id": 2, "username": "v"}]
+    store.close()
+
+
+def test_user_index_follows_writes_and_intersects():
+    """City and interest postings follow profile writes; queries intersect or unite them."""
+    from app.services.user_index import get_user_index, query_user_ids
+
+    ana = user_service.create_user({"username": "ana", "city": "Paris", "interests": ["Music", "art"]})["id"]
+    ben = user_service.create_user({"username": "ben", "city": " paris ", "interests": ["music"]})["id"]
+    cyd = user_service.create_user({"username": "cyd", "city": "Lyon", "interests": ["music", "art"]})["id"]
+
+    assert query_user_ids(city="PARIS", interests=["music"]) >= {ana, ben}
+    assert cyd not in query_user_ids(city="Paris", interests=["music"])
+    assert {ana, cyd} <= query_user_ids(interests=["music", "art"])
+    assert ben not in query_user_ids(interests=["music", "art"])
+    assert {ana, ben, cyd} <= query_user_ids(interests=["art", "music"], match_all=False)
+    assert query_user_ids(city="Atlantis") == set()
+    assert len(query_user_ids()) == len(user_service.list_users())
+
+    user_service.update_user(ben, {"city": "Lyon"})
+    user_service.delete_user(ana)
+    paris_music = query_user_ids(city="paris", interests=["music"])
+    assert ana not in paris_music and ben not in paris_music
+    assert {ben, cyd} <= query_user_ids(city="lyon")
+    assert [u["id"] for u in user_service.find_users(city="Lyon", interests=["MUSIC"])] == sorted(
+        query_user_ids(city="lyon", interests=["music"])
+    )
+    assert len(get_user_index()) == len(user_service.list_users())
+
+
+def test_bounded_cache_spills_to_the_durable_store(monkeypatch):
+    """Past max_entries users are evicted and loaded back from SQLite on demand."""
+    from app.services.user_cache import UserCache
+
+    monkeypatch.setattr(user_service, "_CACHE", UserCache(max_entries=4, shards=2))
+    ids = [user_service.create_user({"username": f"spill{i}", "interests": ["x"]})["id"] for i in range(12)]
+    assert len(user_service._CACHE) <= 4
+    assert user_service._CACHE.evictions >= 8
+
+    for i, uid in enumerate(ids):
+        assert user_service.get_user(uid)["username"] == f"spill{i}"
+    stats = user_service.get_cache_stats()
+    assert stats["misses"] > 0 and stats["loads"] == stats["misses"]
+    assert stats["entries"] <= 4
+
+    # Writes to evicted users load them first and are not lost.
+    user_service.update_user(ids[0], {"city": "Oslo"})
+    assert user_service.delete_user(ids[1]) is True
+    assert user_service.get_user(ids[0])["city"] == "Oslo"
+    assert user_service.get_user(ids[1]) is None
+    assert user_service.get_user(ids[0])["interests"] == ["x"]
+
+
+def test_compact_records_round_trip():
+    """Packed records share their key tuple and unpack to equal, independent dicts."""
+    from app.services.user_cache import pack, unpack
+
+    a = pack({"id": 1, "username": "a", "interests": ["music"]})
+    b = pack({"id": 2, "username": "b", "interests": []})
+    assert a[0] is b[0]
+    first, second = unpack(a), unpack(a)
+    assert first == {"id": 1, "username": "a", "interests": ["music"]}
+    first["interests"].append("art")
+    assert second["interests"] == ["music"]
+
+
+def test_ndjson_import_creates_valid_lines_and_reports_errors():
+    """Valid lines get consecutive new ids across batches; invalid ones are counted and reported."""
+    from app.services.user_bulk import import_users
+
+    lines = [
+        '{"username": "bulk0", "city": "Lyon", "interests": ["music"]}',
+        "not json",
+        "",
+        '{"email": "nousername@example.com"}',
+        '{"username": "bulk1", "birth_date": "1990-05-01"}',
+        '{"username": "bulk2"}',
+    ]
+    summary = import_users(lines, batch_size=2)
+    assert summary["lines"] == 6
+    assert summary["imported"] == 3 and summary["rejected"] == 2
+    assert [e["line"] for e in summary["errors"]] == [2, 4]
+    ids = list(range(summary["first_id"], summary["last_id"] + 1))
+    assert [user_service.get_user(uid)["username"] for uid in ids] == ["bulk0", "bulk1", "bulk2"]
+    assert user_service.get_user(ids[1])["birth_date"] == "1990-05-01"
+    assert ids[0] in user_service.find_user_ids(city="lyon", interest="Music")
+
+
+def test_ndjson_export_round_trips_from_a_snapshot():
+    """The export is sorted by id and ignores writes made while it is read."""
+    import json
+    from app.services.user_bulk import export_users
+
+    expected = user_service.list_users()
+    lines = export_users()
+    first = json.loads(next(lines))
+    user_service.create_user({"username": "late"})
+    user_service.delete_user(expected[-1]["id"])
+    exported = [first] + [json.loads(line) for line in lines]
+    assert [u["id"] for u in exported] == sorted(u["id"] for u in expected)
+    assert {u["username"] for u in exported} == {u["username"] for u in expected}
@@ -10,7 +10,7 @@ from app.services import vote_service
 def setup_test_activities():
     """Set up test activities before each test."""
     admin_activities.clear()
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
 
     admin_activities.extend(
         [
@@ -56,7 +56,7 @@ def setup_test_activities():
     yield
 
     admin_activities.clear()
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
 
 
 def test_vote_for_activities():
@@ -0,0 +1,99 @@
+"""
+Tests for bulk vote submission (POST /vote/batch).
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routes.admin import admin_activities
+from app.models.db.activity import Activity, ActivityType
+from app.services import vote_service
+
+
+@pytest.fixture(autouse=True)
+def setup_test_activities():
+    """Two known activities and an empty vote store."""
+    admin_activities.clear()
+    vote_service.reset_votes()
+    for activity_id in (5, 3):
+        admin_activities.append(
+            Activity(
+                id=activity_id,
+                name=f"Test Activity {activity_id}",
+                description="Test",
+                date="2024-03-15T14:00:00",
+                location="Test City",
+                type=ActivityType.cultural,
+                is_indoor=True,
+            )
+        )
+    yield
+    admin_activities.clear()
+    vote_service.reset_votes()
+
+
+client = TestClient(app)
+
+
+def test_batch_records_all_valid_votes():
+    """A batch from several users is recorded in one call."""
+    payload = {
+        "votes": [
+            {"user_id": 1, "activity_id": 5, "score": 9},
+            {"user_id": 2, "activity_id": 5, "score": 6},
+            {"user_id": 2, "activity_id": 3, "score": 8},
+        ]
+    }
+    response = client.post("/vote/batch", json=payload)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["votes_recorded"] == 3
+    assert data["votes_rejected"] == 0
+    assert [r["status"] for r in data["results"]] == ["recorded"] * 3
+    assert len(vote_service.get_activity_votes(5)) == 2
+
+
+def test_batch_reports_per_item_errors():
+    """Invalid items are rejected individually while the rest are recorded."""
+    payload = {
+        "votes": [
+            {"user_id": 1, "activity_id": 5, "score": 9},
+            {"user_id": 1, "activity_id": 404, "score": 7},
+            {"user_id": 1, "activity_id": 3, "score": 15},
+            {"user_id": 1, "activity_id": 5, "score": 2},
+            {"user_id": 1, "activity_id": 3, "score": 4},
+        ]
+    }
+    response = client.post("/vote/batch", json=payload)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["votes_recorded"] == 2
+    assert data["votes_rejected"] == 3
+    statuses = [r["status"] for r in data["results"]]
+    assert statuses == ["recorded", "rejected", "rejected", "rejected", "recorded"]
+    assert "404 does not exist" in data["results"][1]["error"]
+    assert "between 1 and 10" in data["results"][2]["error"]
+    assert "same activity" in data["results"][3]["error"]
+    assert len(vote_service.list_votes()) == 2
+
+
+def test_batch_rejects_items_that_are_not_objects():
+    """A non-object item gets its own rejection instead of failing the whole batch."""
+    payload = {"votes": [{"user_id": 1, "activity_id": 5, "score": 9}, 5, None]}
+    response = client.post("/vote/batch", json=payload)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["votes_recorded"] == 1
+    assert data["votes_rejected"] == 2
+    assert [r["status"] for r in data["results"]] == ["recorded", "rejected", "rejected"]
+    assert "valid dictionary" in data["results"][1]["error"]
+    assert len(vote_service.list_votes()) == 1
+
+
+def test_batch_too_large():
+    """Batches above the configured limit are refused."""
+    from app.routes import vote as vote_routes
+
+    payload = {"votes": [{"user_id": i, "activity_id": 5, "score": 5} for i in range(vote_routes.MAX_BATCH_SIZE + 1)]}
+    response = client.post("/vote/batch", json=payload)
+    assert response.status_code == 413
+    assert vote_service.list_votes() == []
@@ -13,7 +13,7 @@ from app.services import vote_service
 def setup_test_data():
     """Set up test data before each test."""
     admin_activities.clear()
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
     
     admin_activities.append(
         Activity(
@@ -33,7 +33,7 @@ def setup_test_data():
     yield
     
     admin_activities.clear()
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
 
 
 client = TestClient(app)
@@ -0,0 +1,136 @@
+"""
+Tests for the vote write-ahead log: group commit, snapshots and recovery.
+"""
+import threading
+
+from app.services.vote_log import VoteLog
+
+
+def _open(directory, **kwargs):
+    """Open a log the way the vote store does: recover first, then start."""
+    log = VoteLog(directory, **kwargs)
+    votes = log.recover()
+    state = {"votes": votes}
+
+    def snapshot_source():
+        return log.checkpoint(), list(state["votes"])
+
+    log.start(snapshot_source)
+    return log, state
+
+
+def _add(log, state, vote):
+    state["votes"].append(vote)
+    lsn = log.append([{"op": "add", "vote": vote}])
+    log.wait_durable(lsn, timeout=5)
+
+
+def test_votes_survive_restart(tmp_path):
+    """Committed records are replayed by a new log instance."""
+    log, state = _open(tmp_path)
+    _add(log, state, {"user_id": 1, "activity_id": 5, "score": 9})
+    _add(log, state, {"user_id": 2, "activity_id": 5, "score": 7})
+    log.close()
+
+    recovered = VoteLog(tmp_path).recover()
+    assert recovered == [
+        {"user_id": 1, "activity_id": 5, "score": 9},
+        {"user_id": 2, "activity_id": 5, "score": 7},
+    ]
+
+
+def test_snapshot_compacts_old_segments(tmp_path):
+    """After a snapshot only the segments written after it remain."""
+    log, state = _open(tmp_path)
+    for user_id in range(5):
+        _add(log, state, {"user_id": user_id, "activity_id": 1, "score": 5})
+    log.snapshot_now()
+    _add(log, state, {"user_id": 9, "activity_id": 2, "score": 8})
+    log.close()
+
+    segments = sorted(p.name for p in tmp_path.glob("votes-*.log"))
+    assert len(segments) == 1
+    assert (tmp_path / "votes.snapshot.json").exists()
+    recovered = VoteLog(tmp_path).recover()
+    assert len(recovered) == 6
+    assert recovered[-1] == {"user_id": 9, "activity_id": 2, "score": 8}
+
+
+def test_snapshot_after_close_does_not_block(tmp_path):
+    """Once the flusher has stopped, a snapshot is still written but keeps the segments."""
+    log, state = _open(tmp_path)
+    _add(log, state, {"user_id": 1, "activity_id": 5, "score": 9})
+    log.close()
+    segments = sorted(p.name for p in tmp_path.glob("*.log"))
+
+    done = []
+    thread = threading.Thread(target=lambda: done.append(log.snapshot_now()), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert done == [1]
+    assert sorted(p.name for p in tmp_path.glob("*.log")) == segments
+    assert VoteLog(tmp_path).recover() == [{"user_id": 1, "activity_id": 5, "score": 9}]
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    """A half-written last line from a crash is dropped on recovery."""
+    log, state = _open(tmp_path)
+    _add(log, state, {"user_id": 1, "activity_id": 5, "score": 9})
+    log.close()
+    segment = sorted(tmp_path.glob("votes-*.log"))[-1]
+    with open(segment, "ab") as f:
+        f.write(b'0badc0de {"lsn":2,"op":"add","vote":{"user_')
+
+    log, state = _open(tmp_path)
+    assert state["votes"] == [{"user_id": 1, "activity_id": 5, "score": 9}]
+    _add(log, state, {"user_id": 3, "activity_id": 6, "score": 4})
+    log.close()
+    assert len(VoteLog(tmp_path).recover()) == 2
+
+
+def test_reset_record_clears_votes(tmp_path):
+    """A reset in the log discards the votes before it."""
+    log, state = _open(tmp_path)
+    _add(log, state, {"user_id": 1, "activity_id": 5, "score": 9})
+    log.wait_durable(log.append([{"op": "reset"}]), timeout=5)
+    log.close()
+    assert VoteLog(tmp_path).recover() == []
+
+
+def test_concurrent_writers_share_commits(tmp_path):
+    """Concurrent writers are batched into fewer fsyncs than records."""
+    log, _ = _open(tmp_path, commit_delay=0.002)
+
+    def writer(user_id):
+        for activity_id in range(20):
+            lsn = log.append([{"op": "add", "vote": {"user_id": user_id, "activity_id": activity_id, "score": 5}}])
+            log.wait_durable(lsn, timeout=5)
+
+    threads = [threading.Thread(target=writer, args=(uid,)) for uid in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.close()
+
+    assert len(VoteLog(tmp_path).recover()) == 160
+    assert log.commits < 160
+
+
+def test_snapshot_state_is_recovered(tmp_path):
+    """Derived state saved with a snapshot comes back with the votes it covers."""
+    log = VoteLog(tmp_path)
+    log.recover()
+    votes = []
+    log.start(lambda: (log.checkpoint(), list(votes), {"profiles": {"1": len(votes)}}))
+    for user_id in range(3):
+        votes.append({"user_id": user_id, "activity_id": 1, "score": 5})
+        log.wait_durable(log.append([{"op": "add", "vote": votes[-1]}]), timeout=5)
+    log.snapshot_now()
+    log.wait_durable(log.append([{"op": "add", "vote": {"user_id": 9, "activity_id": 2, "score": 8}}]), timeout=5)
+    log.close()
+
+    recovered = VoteLog(tmp_path)
+    assert len(recovered.recover()) == 4
+    assert recovered.recovered_state == {"profiles": {"1": 3}}
+    assert recovered.recovered_snapshot_votes == 3
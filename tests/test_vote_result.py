@@ -0,0 +1,84 @@
+"""
+Tests for the cached Condorcet result and GET /vote/result.
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import vote_service
+from app.services.vote_result_service import CondorcetResultCache
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_votes():
+    """Clear votes before each test."""
+    vote_service.reset_votes()
+    yield
+    vote_service.reset_votes()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_result_ranks_condorcet_winner_first():
+    """The activity preferred by a majority of users wins."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 1, "score": 9})
+    vote_service.add_vote({"user_id": 1, "activity_id": 2, "score": 5})
+    vote_service.add_vote({"user_id": 2, "activity_id": 1, "score": 8})
+    vote_service.add_vote({"user_id": 2, "activity_id": 2, "score": 9})
+    vote_service.add_vote({"user_id": 3, "activity_id": 1, "score": 7})
+
+    result = CondorcetResultCache().get()
+    assert result["ranking"] == [1, 2]
+    assert result["version"] == vote_service.get_vote_version()
+    assert result["stale"] is False
+
+
+def test_stale_result_is_served_and_refreshed_in_background():
+    """After a write readers get the old result at once; a refresh follows."""
+    cache = CondorcetResultCache(min_interval=0.0)
+    vote_service.add_vote({"user_id": 1, "activity_id": 1, "score": 9})
+    first = cache.get()
+    assert first["ranking"] == [1]
+
+    vote_service.add_vote({"user_id": 1, "activity_id": 2, "score": 10})
+    stale = cache.get()
+    assert stale["ranking"] == [1]
+    assert stale["stale"] is True
+
+    assert _wait_for(lambda: cache.get()["ranking"] == [2, 1])
+
+
+def test_burst_of_votes_is_debounced():
+    """Many writes inside one interval trigger at most one extra recompute."""
+    cache = CondorcetResultCache(min_interval=0.3)
+    vote_service.add_vote_listener(cache.invalidate)
+    try:
+        cache.refresh()
+        for user_id in range(50):
+            vote_service.add_vote({"user_id": user_id, "activity_id": 7, "score": 5})
+
+        assert _wait_for(lambda: cache.get()["version"] == vote_service.get_vote_version())
+        assert cache.computations <= 3
+    finally:
+        vote_service.remove_vote_listener(cache.invalidate)
+
+
+def test_result_endpoint():
+    """GET /vote/result returns the ranking with its computation timestamp."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 5, "score": 9})
+    response = client.get("/vote/result")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"ranking", "version", "computed_at", "stale"}
+    assert isinstance(data["ranking"], list)
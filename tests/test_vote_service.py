@@ -0,0 +1,242 @@
+"""
+Tests for the in-memory vote store and its secondary indexes.
+"""
+import pytest
+from app.services import vote_service
+from app.services.vote_log import VoteLog
+
+
+@pytest.fixture(autouse=True)
+def reset_votes():
+    """Clear votes before each test."""
+    vote_service.reset_votes()
+    yield
+    vote_service.reset_votes()
+
+
+def test_activity_and_user_indexes_follow_writes():
+    """Votes are reachable through both the activity and user indexes."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 9})
+    vote_service.add_vote({"user_id": 2, "activity_id": 10, "score": 7})
+    vote_service.add_vote({"user_id": 1, "activity_id": 20, "score": 4})
+
+    assert [v["user_id"] for v in vote_service.get_activity_votes(10)] == [1, 2]
+    assert [v["activity_id"] for v in vote_service.get_user_votes(1)] == [10, 20]
+    assert vote_service.get_activity_votes(30) == []
+    assert vote_service.get_user_votes(3) == []
+
+
+def test_reset_clears_indexes():
+    """Resetting the store also empties the indexes."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 9})
+    vote_service.reset_votes()
+
+    assert vote_service.list_votes() == []
+    assert vote_service.get_activity_votes(10) == []
+    assert vote_service.get_user_votes(1) == []
+
+
+def test_snapshot_is_isolated_from_later_writes():
+    """A snapshot keeps its view while writers append and reset."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 9})
+    snapshot = vote_service.get_vote_snapshot()
+
+    vote_service.add_votes([
+        {"user_id": 2, "activity_id": 10, "score": 7},
+        {"user_id": 1, "activity_id": 20, "score": 4},
+    ])
+    vote_service.reset_votes()
+
+    assert len(snapshot) == 1
+    assert snapshot.version < vote_service.get_vote_version()
+    assert [v["user_id"] for v in snapshot.activity_votes(10)] == [1]
+    assert [v["activity_id"] for v in snapshot.user_votes(1)] == [10]
+    assert vote_service.list_votes() == []
+
+
+def test_readers_share_vote_dicts_without_copying():
+    """Reads return the stored dicts; writes copy the caller's dict once."""
+    vote = {"user_id": 1, "activity_id": 10, "score": 9}
+    vote_service.add_vote(vote)
+    vote["score"] = 1
+
+    first = vote_service.get_activity_votes(10)[0]
+    assert first["score"] == 9
+    assert vote_service.list_votes()[0] is first
+
+
+def test_ranking_smooths_small_samples():
+    """One perfect vote does not outrank many high votes."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 10})
+    vote_service.add_votes([
+        {"user_id": uid, "activity_id": 20, "score": 9} for uid in range(2, 52)
+    ])
+    vote_service.add_votes([
+        {"user_id": uid, "activity_id": 30, "score": 4} for uid in range(2, 52)
+    ])
+
+    ranking = vote_service.get_activity_ranking()
+    assert [r["activity_id"] for r in ranking] == [20, 10, 30]
+    assert ranking[1]["average_score"] == 10.0
+    assert ranking[1]["vote_count"] == 1
+
+
+def test_ranking_limit_and_min_votes():
+    """limit keeps the top-K and min_votes drops sparsely voted activities."""
+    for activity_id in range(1, 6):
+        vote_service.add_votes([
+            {"user_id": uid, "activity_id": activity_id, "score": activity_id + 4}
+            for uid in range(activity_id)
+        ])
+
+    top = vote_service.get_activity_ranking(limit=2)
+    assert [r["activity_id"] for r in top] == [5, 4]
+
+    filtered = vote_service.get_activity_ranking(min_votes=4)
+    assert {r["activity_id"] for r in filtered} == {4, 5}
+
+
+def test_ranking_with_explicit_prior():
+    """The configured prior is blended into every activity's score."""
+    vote_service.add_votes([
+        {"user_id": 1, "activity_id": 10, "score": 10},
+        {"user_id": 2, "activity_id": 10, "score": 8},
+    ])
+    ranking = vote_service.get_activity_ranking(prior_weight=2, prior_mean=5)
+    assert ranking[0]["score"] == 7.0
+
+
+def test_concurrent_writers_keep_aggregates_consistent():
+    """Striped writers on many threads lose no votes and keep every index in sync."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def write(user_id):
+        for activity_id in range(20):
+            vote_service.add_vote({"user_id": user_id, "activity_id": activity_id, "score": 1 + user_id % 10})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(16)))
+
+    assert len(vote_service.list_votes()) == 16 * 20
+    assert all(len(vote_service.get_activity_votes(a)) == 16 for a in range(20))
+    ranking = vote_service.get_activity_ranking()
+    assert sum(r["vote_count"] for r in ranking) == 16 * 20
+    candidate_ids, pairwise = vote_service.get_pairwise_matrix()
+    assert sorted(candidate_ids) == list(range(20))
+    # Every user scored all activities equally, so no one prefers any pair.
+    assert not pairwise.any()
+
+
+def test_writers_do_not_wait_for_the_pairwise_matrix():
+    """Ballot changes are queued while the matrix is busy and folded in by the background thread."""
+    import threading
+    import time
+
+    with vote_service._PAIRWISE_LOCK:
+        writer = threading.Thread(target=vote_service.add_votes, args=([
+            {"user_id": 1, "activity_id": 10, "score": 9},
+            {"user_id": 1, "activity_id": 20, "score": 3},
+        ],))
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive()
+        assert len(vote_service._BALLOT_CHANGES) == 2
+
+    deadline = time.monotonic() + 5
+    while vote_service._BALLOT_CHANGES and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not vote_service._BALLOT_CHANGES
+    candidate_ids, pairwise = vote_service.get_pairwise_matrix()
+    assert pairwise[candidate_ids.index(10)][candidate_ids.index(20)] == 1
+
+
+def test_readers_see_queued_ballot_changes(monkeypatch):
+    """A read folds in changes the background thread has not applied yet."""
+    monkeypatch.setattr(vote_service, "_BALLOT_CHANGES_READY", vote_service.Event())
+    for uid in range(3):
+        vote_service.add_vote({"user_id": uid, "activity_id": 10, "score": 9})
+        vote_service.add_vote({"user_id": uid, "activity_id": 20, "score": 8})
+    assert len(vote_service._BALLOT_CHANGES) == 6
+
+    assert vote_service.get_similar_activities(10) == [{"activity_id": 20, "similarity": 0.2308, "co_votes": 3}]
+    assert not vote_service._BALLOT_CHANGES
+
+
+def test_revote_replaces_previous_vote():
+    """A second vote for the same activity is an upsert, not an extra vote."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 2})
+    vote_service.add_vote({"user_id": 2, "activity_id": 10, "score": 6})
+    before = vote_service.get_vote_snapshot()
+    vote_service.add_vote({"user_id": 1, "activity_id": 10, "score": 8})
+
+    assert [v["score"] for v in vote_service.get_activity_votes(10)] == [6, 8]
+    assert [v["score"] for v in vote_service.get_user_votes(1)] == [8]
+    assert vote_service.get_vote(1, 10)["score"] == 8
+    assert vote_service.get_vote(3, 10) is None
+    assert len(vote_service.get_vote_snapshot()) == 2
+
+    ranking = vote_service.get_activity_ranking(prior_weight=0)
+    assert ranking[0]["vote_count"] == 2
+    assert ranking[0]["average_score"] == 7.0
+
+    # Earlier snapshots still see the score they were taken with.
+    assert before.get(1, 10)["score"] == 2
+    assert [v["score"] for v in before.activity_votes(10)] == [2, 6]
+
+
+def test_superseded_votes_are_compacted(monkeypatch):
+    """Memory follows users x activities voted, not the number of submissions."""
+    monkeypatch.setattr(vote_service, "COMPACTION_MIN_SUPERSEDED", 4)
+    for score in range(1, 11):
+        vote_service.add_votes([
+            {"user_id": uid, "activity_id": 10, "score": score} for uid in range(3)
+        ])
+
+    generation = vote_service._GENERATION
+    assert len(generation.votes) <= 2 * 3 + 4
+    assert [v["score"] for v in vote_service.list_votes()] == [10, 10, 10]
+    assert vote_service.get_vote(2, 10)["score"] == 10
+    assert vote_service.get_activity_ranking()[0]["vote_count"] == 3
+
+
+def test_preference_profile_follows_votes(catalog):
+    """Profiles hold normalized scores per activity and per catalog activity type."""
+    vote_service.add_vote({"user_id": 1, "activity_id": 100, "score": 10})  # cultural
+    vote_service.add_vote({"user_id": 1, "activity_id": 101, "score": 1})   # sports
+    vote_service.add_vote({"user_id": 1, "activity_id": 999, "score": 4})   # not in the catalog
+    vote_service.add_vote({"user_id": 1, "activity_id": 101, "score": 7})
+
+    profile = vote_service.get_user_profile(1)
+    assert profile.scores == {100: 1.0, 101: pytest.approx(6 / 9), 999: pytest.approx(3 / 9)}
+    assert profile.type_scores() == {"cultural": 1.0, "sports": pytest.approx(6 / 9)}
+    assert len(vote_service.get_user_profile(2)) == 0
+
+    vote_service.reset_votes()
+    assert len(vote_service.get_user_profile(1)) == 0
+
+
+def test_recovery_restores_saved_profiles(tmp_path, monkeypatch, catalog):
+    """Recovery loads the snapshot's profiles and only replays the votes after it."""
+    log = VoteLog(tmp_path)
+    log.recover()
+    # The saved profile keeps the type recorded at vote time, even though
+    # activity 999 is not in the catalog.
+    saved = {"1": {"scores": {"999": 0.5}, "types": {"999": "cultural"}}}
+    snapshot_vote = {"user_id": 1, "activity_id": 999, "score": 9}
+    log.start(lambda: (log.checkpoint(), [snapshot_vote], {"profiles": saved}))
+    log.wait_durable(log.append([{"op": "add", "vote": snapshot_vote}]), timeout=5)
+    log.snapshot_now()
+    log.wait_durable(log.append([{"op": "add", "vote": {"user_id": 1, "activity_id": 100, "score": 10}}]), timeout=5)
+    log.close()
+
+    recovered = VoteLog(tmp_path)
+    monkeypatch.setattr(vote_service, "_LOG", recovered)
+    try:
+        vote_service._load_votes()
+        profile = vote_service.get_user_profile(1)
+        assert profile.scores == {999: 0.5, 100: 1.0}
+        assert profile.type_scores() == {"cultural": 0.75}
+        assert len(vote_service.list_votes()) == 2
+    finally:
+        vote_service.reset_votes()
+        recovered.close()
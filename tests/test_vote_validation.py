@@ -12,9 +12,9 @@ from app.services import vote_service
 @pytest.fixture(autouse=True)
 def reset_votes():
     """Clear votes before each test."""
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
     yield
-    vote_service._VOTES.clear()
+    vote_service.reset_votes()
 
 
 @pytest.fixture(autouse=True)